@@ -0,0 +1,162 @@
+-- Incremental rollups for data_loss_audit.
+--
+-- get_recent_data_loss_alerts() and the audit scripts rescan data_loss_audit
+-- by time window, which gets slower as the table grows and shows no trends.
+-- refresh_data_loss_audit_rollups() folds only rows past a persisted id
+-- watermark into hourly counters per (client, action, allowed); dashboards
+-- and alerts read the small rollup table instead of the raw log.
+--
+-- Watermark safety: ids are assigned at INSERT but become visible at COMMIT,
+-- so a refresh only takes rows older than p_settle (default 5 min). A row
+-- whose transaction stayed open longer than that could be skipped; audit
+-- inserts are single statements inside the KV write, so that window is
+-- far beyond their lifetime.
+--
+-- Run periodically (cron / heys_data.audit_rollups refresh):
+--   SELECT * FROM refresh_data_loss_audit_rollups();
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.data_loss_audit_rollup_hourly (
+  hour TIMESTAMPTZ NOT NULL,
+  client_id UUID NOT NULL,
+  action TEXT NOT NULL,
+  allowed BOOLEAN NOT NULL,
+  events INT NOT NULL DEFAULT 0,
+  last_event_at TIMESTAMPTZ,
+  PRIMARY KEY (hour, client_id, action, allowed)
+);
+
+CREATE INDEX IF NOT EXISTS idx_data_loss_audit_rollup_client
+  ON public.data_loss_audit_rollup_hourly (client_id, hour DESC);
+
+CREATE TABLE IF NOT EXISTS public.data_loss_audit_rollup_watermark (
+  name TEXT PRIMARY KEY,
+  last_id BIGINT NOT NULL DEFAULT 0,
+  refreshed_at TIMESTAMPTZ
+);
+
+INSERT INTO public.data_loss_audit_rollup_watermark (name, last_id)
+VALUES ('hourly', 0)
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.refresh_data_loss_audit_rollups(
+  p_batch INT DEFAULT 100000,
+  p_settle INTERVAL DEFAULT INTERVAL '5 minutes'
+) RETURNS TABLE (processed INT, last_id BIGINT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $function$
+DECLARE
+  v_from BIGINT;
+  v_to BIGINT;
+  v_count INT;
+BEGIN
+  -- One refresher at a time; a concurrent call waits and then sees the new watermark.
+  SELECT w.last_id INTO v_from
+  FROM data_loss_audit_rollup_watermark w
+  WHERE w.name = 'hourly'
+  FOR UPDATE;
+
+  SELECT max(a.id), count(*) INTO v_to, v_count
+  FROM (
+    SELECT id
+    FROM data_loss_audit
+    WHERE id > v_from
+      AND created_at < now() - p_settle
+    ORDER BY id
+    LIMIT p_batch
+  ) a;
+
+  IF v_count = 0 THEN
+    UPDATE data_loss_audit_rollup_watermark SET refreshed_at = now() WHERE name = 'hourly';
+    RETURN QUERY SELECT 0, v_from;
+    RETURN;
+  END IF;
+
+  INSERT INTO data_loss_audit_rollup_hourly AS r (hour, client_id, action, allowed, events, last_event_at)
+  SELECT date_trunc('hour', a.created_at), a.client_id, a.action, a.allowed, count(*), max(a.created_at)
+  FROM data_loss_audit a
+  WHERE a.id > v_from AND a.id <= v_to
+  GROUP BY 1, 2, 3, 4
+  ON CONFLICT (hour, client_id, action, allowed) DO UPDATE SET
+    events = r.events + EXCLUDED.events,
+    last_event_at = GREATEST(r.last_event_at, EXCLUDED.last_event_at);
+
+  UPDATE data_loss_audit_rollup_watermark
+  SET last_id = v_to, refreshed_at = now()
+  WHERE name = 'hourly';
+
+  RETURN QUERY SELECT v_count, v_to;
+END;
+$function$;
+
+-- Per-client alert summary for the last p_hours (from rollups only).
+CREATE OR REPLACE FUNCTION public.get_data_loss_alert_summary(
+  p_hours INT DEFAULT 24
+) RETURNS TABLE (
+  client_id UUID,
+  blocked BIGINT,
+  allowed BIGINT,
+  actions TEXT[],
+  last_event_at TIMESTAMPTZ
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $function$
+  SELECT
+    r.client_id,
+    sum(r.events) FILTER (WHERE NOT r.allowed),
+    COALESCE(sum(r.events) FILTER (WHERE r.allowed), 0),
+    array_agg(DISTINCT r.action ORDER BY r.action),
+    max(r.last_event_at)
+  FROM data_loss_audit_rollup_hourly r
+  WHERE r.hour >= date_trunc('hour', now() - make_interval(hours => p_hours))
+  GROUP BY r.client_id
+  HAVING sum(r.events) FILTER (WHERE NOT r.allowed) > 0
+  ORDER BY 2 DESC, 5 DESC;
+$function$;
+
+-- Fleet trend: blocked/allowed per hour and action.
+CREATE OR REPLACE FUNCTION public.get_data_loss_hourly_trend(
+  p_hours INT DEFAULT 48
+) RETURNS TABLE (
+  hour TIMESTAMPTZ,
+  action TEXT,
+  blocked BIGINT,
+  allowed BIGINT,
+  clients BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $function$
+  SELECT
+    r.hour,
+    r.action,
+    COALESCE(sum(r.events) FILTER (WHERE NOT r.allowed), 0),
+    COALESCE(sum(r.events) FILTER (WHERE r.allowed), 0),
+    count(DISTINCT r.client_id)
+  FROM data_loss_audit_rollup_hourly r
+  WHERE r.hour >= date_trunc('hour', now() - make_interval(hours => p_hours))
+  GROUP BY r.hour, r.action
+  ORDER BY r.hour, r.action;
+$function$;
+
+REVOKE ALL ON FUNCTION public.refresh_data_loss_audit_rollups(INT, INTERVAL) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.refresh_data_loss_audit_rollups(INT, INTERVAL) TO heys_admin;
+GRANT EXECUTE ON FUNCTION public.get_data_loss_alert_summary(INT) TO heys_admin;
+GRANT EXECUTE ON FUNCTION public.get_data_loss_hourly_trend(INT) TO heys_admin;
+GRANT SELECT ON public.data_loss_audit_rollup_hourly TO heys_admin;
+GRANT SELECT ON public.data_loss_audit_rollup_watermark TO heys_admin;
+
+COMMENT ON TABLE public.data_loss_audit_rollup_hourly IS
+  'Hourly data_loss_audit counters per client/action/allowed, maintained incrementally by refresh_data_loss_audit_rollups().';
+COMMENT ON FUNCTION public.refresh_data_loss_audit_rollups(INT, INTERVAL) IS
+  'Fold data_loss_audit rows past the persisted id watermark into hourly rollups; returns rows processed and the new watermark.';
+
+COMMIT;
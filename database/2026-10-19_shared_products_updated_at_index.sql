@@ -0,0 +1,11 @@
+\set ON_ERROR_STOP on
+
+-- Delta exports of the catalog (scripts/heys_data/catalog_delta.py) read
+-- rows with updated_at past the previous export's watermark every night.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_shared_products_updated_at
+  ON public.shared_products (updated_at);
+
+COMMIT;
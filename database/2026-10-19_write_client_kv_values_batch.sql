@@ -0,0 +1,138 @@
+-- Set-based protected KV writer for bulk tooling (restore scripts).
+--
+-- write_client_kv_value() is the protected single-key path (non-client key
+-- rejection, check_day_overwrite_allowed, health-key encryption), but called
+-- once per key it is an order of magnitude slower than a batched upsert, so
+-- restore scripts bypassed it. write_client_kv_values() applies the same
+-- rules to many keys in one call:
+--
+--   * existing rows are looked up with ONE join for the whole batch;
+--   * day overwrite rule as in check_day_overwrite_allowed(): a day with meals
+--     is not replaced by a day without meals unless the new updatedAt is more
+--     than 1h newer (allowed and blocked cases are logged to data_loss_audit);
+--   * health keys are encrypted when heys.encryption_key is set and
+--     heys.encryption_disabled != '1'; an empty value never replaces ciphertext;
+--   * auth/session/non-client keys are rejected and audited.
+--
+-- p_items: [{"k": "heys_dayv2_2026-01-17", "v": {...}}, ...]; for a repeated
+-- key the last item wins. Returns one row per key:
+--   inserted | updated | blocked_data_loss | kept_encrypted | non_client_key
+--
+-- Unlike check_day_overwrite_allowed(), a non-array `meals` or non-numeric
+-- `updatedAt` counts as 0 instead of aborting the whole batch.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.write_client_kv_values(
+  p_client_id uuid,
+  p_items jsonb
+) RETURNS TABLE (k text, status text)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $function$
+  WITH items AS (
+    SELECT DISTINCT ON (e.item->>'k') e.item->>'k' AS k, e.item->'v' AS v
+    FROM jsonb_array_elements(p_items) WITH ORDINALITY AS e(item, ord)
+    WHERE e.item->>'k' IS NOT NULL
+    ORDER BY e.item->>'k', e.ord DESC
+  ),
+  settings AS (
+    SELECT COALESCE(length(current_setting('heys.encryption_key', true)) >= 32, false)
+           AND COALESCE(current_setting('heys.encryption_disabled', true), '') <> '1' AS can_encrypt
+  ),
+  existing AS (
+    SELECT
+      i.k,
+      i.v,
+      s.k IS NOT NULL AS has_existing,
+      s.v_encrypted IS NOT NULL AS existing_encrypted,
+      CASE WHEN jsonb_typeof(s.v->'meals') = 'array' THEN jsonb_array_length(s.v->'meals') ELSE 0 END
+        AS existing_meals,
+      CASE WHEN jsonb_typeof(i.v->'meals') = 'array' THEN jsonb_array_length(i.v->'meals') ELSE 0 END
+        AS new_meals,
+      CASE WHEN jsonb_typeof(s.v->'updatedAt') = 'number' THEN (s.v->>'updatedAt')::numeric::bigint ELSE 0 END
+        AS existing_updated,
+      CASE WHEN jsonb_typeof(i.v->'updatedAt') = 'number' THEN (i.v->>'updatedAt')::numeric::bigint ELSE 0 END
+        AS new_updated
+    FROM items i
+    LEFT JOIN public.client_kv_store s
+      ON s.client_id = p_client_id AND s.k = i.k
+  ),
+  classified AS (
+    SELECT
+      e.*,
+      -- the critical case of check_day_overwrite_allowed(): meals -> no meals
+      e.k LIKE 'heys_dayv2_%' AND e.has_existing AND e.existing_meals > 0 AND e.new_meals = 0
+        AS losing_meals,
+      public.is_health_key(e.k) AND (SELECT can_encrypt FROM settings) AS encrypt,
+      CASE
+        WHEN public.is_client_kv_non_client_key(e.k) THEN 'non_client_key'
+        WHEN e.k LIKE 'heys_dayv2_%' AND e.has_existing AND e.existing_meals > 0 AND e.new_meals = 0
+             AND e.new_updated <= e.existing_updated + 3600000 THEN 'blocked_data_loss'
+        WHEN public.is_health_key(e.k) AND e.existing_encrypted
+             AND (e.v IS NULL OR e.v = '{}'::jsonb) THEN 'kept_encrypted'
+        ELSE 'write'
+      END AS decision
+    FROM existing e
+  ),
+  audit AS (
+    INSERT INTO public.data_loss_audit (
+      client_id, key, action, existing_meals, new_meals,
+      existing_updated, new_updated, allowed, reason
+    )
+    SELECT
+      p_client_id, c.k,
+      CASE c.decision
+        WHEN 'non_client_key' THEN 'non_client_data_rejected'
+        WHEN 'blocked_data_loss' THEN 'overwrite_blocked'
+        ELSE 'overwrite_check'
+      END,
+      c.existing_meals, c.new_meals, c.existing_updated, c.new_updated,
+      c.decision = 'write',
+      CASE c.decision
+        WHEN 'non_client_key' THEN 'write_client_kv_values_blacklist'
+        WHEN 'blocked_data_loss' THEN 'would_lose_meals'
+        ELSE 'new_data_much_fresher'
+      END
+    FROM classified c
+    WHERE c.decision IN ('non_client_key', 'blocked_data_loss')
+       OR (c.decision = 'write' AND c.losing_meals)
+  ),
+  written AS (
+    INSERT INTO public.client_kv_store (client_id, k, v, v_encrypted, key_version, updated_at)
+    SELECT
+      p_client_id,
+      c.k,
+      CASE WHEN c.encrypt THEN '{}'::jsonb ELSE c.v END,
+      CASE WHEN c.encrypt THEN public.encrypt_health_data(c.v) END,
+      CASE WHEN c.encrypt THEN 1 END,
+      now()
+    FROM classified c
+    WHERE c.decision = 'write'
+    ON CONFLICT (client_id, k) DO UPDATE SET
+      v = EXCLUDED.v,
+      v_encrypted = EXCLUDED.v_encrypted,
+      key_version = EXCLUDED.key_version,
+      updated_at = now()
+    RETURNING client_kv_store.k, (xmax = 0) AS inserted
+  )
+  SELECT
+    c.k,
+    CASE
+      WHEN c.decision <> 'write' THEN c.decision
+      WHEN w.inserted THEN 'inserted'
+      ELSE 'updated'
+    END
+  FROM classified c
+  LEFT JOIN written w ON w.k = c.k
+  ORDER BY c.k;
+$function$;
+
+REVOKE ALL ON FUNCTION public.write_client_kv_values(uuid, jsonb) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.write_client_kv_values(uuid, jsonb) TO heys_admin;
+
+COMMENT ON FUNCTION public.write_client_kv_values(uuid, jsonb) IS
+  'Set-based write_client_kv_value(): data-loss protection, health encryption and non-client key rejection for a batch of {k, v} items in one call.';
+
+COMMIT;
@@ -1,15 +1,7 @@
 #!/usr/bin/env python3
-import psycopg2
+from heys_data import audit_rollups, db
 
-conn = psycopg2.connect(
-    host="rc1b-obkgs83tnrd6a2m3.mdb.yandexcloud.net",
-    port=6432,
-    dbname="heys_production",
-    user="heys_admin",
-    password="heys007670",
-    sslmode="verify-full",
-    sslrootcert="/Users/poplavskijanton/.postgresql/root.crt"
-)
+conn = db.connect()
 cur = conn.cursor()
 
 print("=== FINAL STATE CHECK ===\n")
@@ -29,14 +21,11 @@ for date in dates:
     else:
         print(f"{date}: NOT FOUND")
 
-print("\n=== AUDIT LOG ===")
-cur.execute("""
-    SELECT action, existing_meals, new_meals, allowed, reason
-    FROM data_loss_audit
-    ORDER BY created_at DESC LIMIT 5
-""")
-for row in cur.fetchall():
-    print(f"  {row[0]}: {row[1]} -> {row[2]} meals, allowed={row[3]}, reason={row[4]}")
+# Audit from rollups plus the not yet rolled-up tail (see heys_data/audit_rollups.py):
+# read-only, and includes the events of the last minutes this check is run for.
+print("\n=== AUDIT (last 24h, hourly) ===")
+for hour, action, allowed, events in audit_rollups.client_hourly(cur, 'ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a'):
+    print(f"  {hour:%Y-%m-%d %H:00}  {action}: {events} event(s), allowed={allowed}")
 
 cur.close()
 conn.close()
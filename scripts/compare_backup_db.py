@@ -1,61 +1,121 @@
 # -*- coding: utf-8 -*-
+"""
+Compare hand-exported client backups with client_kv_store.
+
+Usage:
+    python3 scripts/compare_backup_db.py heys-backup-ccfe6ea3-2026-01-24.json --since 2026-01-01
+    python3 scripts/compare_backup_db.py <client_id>=backup1.json <client_id>=backup2.json --json
+    python3 scripts/compare_backup_db.py --snapshots s3://heys-backups/client-daily \
+        --client <client_id> --client <client_id> --snapshot-date 2026-03-29
+
+A bare path uses the backup's own ``clientId`` (schema v3) or ``--client``.
+With ``--snapshots`` the daily server snapshots (local mirror or S3) are read
+directly; without ``--snapshot-date`` the latest snapshot per client is used.
+All DB meal counts are fetched in one streamed query, see heys_data.compare.
+"""
+import argparse
 import json
-import psycopg2
-
-# Read backup
-with open('/Users/poplavskijanton/Documents/heys-backup-ccfe6ea3-2026-01-24.json', 'r') as f:
-    backup = json.load(f)
-
-# Connect to DB
-conn = psycopg2.connect(
-    host="rc1b-obkgs83tnrd6a2m3.mdb.yandexcloud.net",
-    port=6432,
-    dbname="heys_production",
-    user="heys_admin",
-    password="heys007670",
-    sslmode="verify-full",
-    sslrootcert="/Users/poplavskijanton/.postgresql/root.crt"
-)
-cur = conn.cursor()
-
-client_id = 'ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a'
-
-print("Comparing backup vs DB for January 2026:\n")
-print(f"{'Date':<12} {'Backup':<10} {'DB':<10} {'Status'}")
-print("-" * 45)
-
-mismatches = []
-
-for date in sorted([d for d in backup['days'].keys() if d.startswith('2026-01')]):
-    backup_meals = len(backup['days'][date].get('meals', []))
-    key = f'heys_dayv2_{date}'
-    
-    cur.execute("""
-        SELECT jsonb_array_length(COALESCE(v->'meals', '[]'::jsonb))
-        FROM client_kv_store 
-        WHERE client_id = %s AND k = %s
-    """, (client_id, key))
-    
-    row = cur.fetchone()
-    db_meals = row[0] if row else -1
-    
-    if db_meals == -1:
-        status = "MISSING!"
-        mismatches.append(date)
-    elif backup_meals != db_meals:
-        status = "MISMATCH!"
-        mismatches.append(date)
-    elif backup_meals == 0:
-        status = "empty"
+import sys
+
+from heys_data import backup_stream, compare, db, snapshots
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backups", nargs="*", help="backup path or <client_id>=<path>")
+    parser.add_argument("--client", action="append", default=[],
+                        help="client_id (single backup without clientId, or --snapshots; repeatable)")
+    parser.add_argument("--snapshots", metavar="URI",
+                        help="daily snapshot source: local mirror dir or s3://bucket/prefix")
+    parser.add_argument("--snapshot-date", help="snapshot businessDate (default: latest)")
+    parser.add_argument("--since", help="first date to compare (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last date to compare (YYYY-MM-DD)")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    return parser.parse_args(argv)
+
+
+def load_backup_counts(spec, default_client, since, until):
+    client_id, sep, path = spec.partition("=")
+    if not sep:
+        client_id, path = None, spec
+    file_client, counts = None, {}
+    # Stream the backup: only one day is materialised at a time.
+    with backup_stream.open_backup(path) as fp:
+        for key, value in backup_stream.stream_object(fp):
+            if key == "clientId":
+                file_client = value.load()
+            elif key == "days":
+                days = ((k, day.load()) for k, day in value.members())
+                counts = compare.backup_meal_counts(days, since, until)
+    client_id = client_id or file_client or default_client
+    if not client_id:
+        raise SystemExit(f"{path}: no clientId in backup, pass --client or <client_id>=<path>")
+    return client_id.lower(), counts
+
+
+def load_snapshot_counts(source, client_id, snapshot_date, since, until):
+    business_date = snapshots.resolve_date(source, client_id, snapshot_date)
+    with snapshots.open_snapshot(source, business_date, client_id) as fp:
+        counts = compare.backup_meal_counts(snapshots.iter_days(fp), since, until)
+    print(f"{client_id}: snapshot {business_date}", file=sys.stderr)
+    return client_id.lower(), counts
+
+
+def print_table(diff):
+    statuses = {d: "OK" for d in diff.matched}
+    statuses.update({d: "empty" for d in diff.empty})
+    statuses.update({d: "MISSING!" for d in diff.missing_in_db})
+    statuses.update({d: "EXTRA!" for d in diff.missing_in_backup})
+    statuses.update({d: "MISMATCH!" for d, _, _ in diff.mismatched})
+
+    print(f"\nClient {diff.client_id}:\n")
+    print(f"{'Date':<12} {'Backup':<10} {'DB':<10} {'Status'}")
+    print("-" * 45)
+    for date in sorted(statuses):
+        backup_meals, db_meals = diff.counts[date]
+        backup_str = "MISSING" if backup_meals is None else str(backup_meals)
+        db_str = "MISSING" if db_meals is None else str(db_meals)
+        print(f"{date:<12} {backup_str:<10} {db_str:<10} {statuses[date]}")
+
+    print(f"\nMissing in DB: {len(diff.missing_in_db)}, "
+          f"extra in DB: {len(diff.missing_in_backup)}, mismatched: {len(diff.mismatched)}")
+    if diff.dates_to_fix:
+        print("Dates to fix:", diff.dates_to_fix)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.snapshots:
+        if args.backups or not args.client:
+            raise SystemExit("--snapshots takes clients via --client, not backup paths")
+        source = snapshots.source_from_uri(args.snapshots)
+        backups = dict(
+            load_snapshot_counts(source, cid, args.snapshot_date, args.since, args.until)
+            for cid in args.client
+        )
     else:
-        status = "OK"
-    
-    db_str = str(db_meals) if db_meals >= 0 else "MISSING"
-    print(f"{date:<12} {backup_meals:<10} {db_str:<10} {status}")
+        if not args.backups or len(args.client) > 1 or (args.client and len(args.backups) > 1):
+            raise SystemExit("pass backup paths; --client only applies to a single backup")
+        default_client = args.client[0] if args.client else None
+        backups = dict(
+            load_backup_counts(spec, default_client, args.since, args.until) for spec in args.backups
+        )
+
+    conn = db.connect()
+    try:
+        diffs = list(compare.compare_clients(conn, backups, args.since, args.until))
+    finally:
+        conn.close()
+
+    if args.json:
+        json.dump([d.as_dict() for d in diffs], sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for diff in diffs:
+            print_table(diff)
+
+    return 0 if all(d.ok for d in diffs) else 1
 
-print(f"\nMismatches: {len(mismatches)}")
-if mismatches:
-    print("Dates to fix:", mismatches)
 
-cur.close()
-conn.close()
+if __name__ == "__main__":
+    sys.exit(main())
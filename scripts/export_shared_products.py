@@ -1,72 +1,147 @@
 # -*- coding: utf-8 -*-
-import json
+"""
+Export the shared product catalog for review/correction, straight from Postgres.
+
+Usage:
+    python3 scripts/export_shared_products.py                              # heys_shared_products_export.json
+    python3 scripts/export_shared_products.py -o catalog.jsonl.gz          # JSON Lines, gzip
+    python3 scripts/export_shared_products.py --columns id,name,protein100,category
+    python3 scripts/export_shared_products.py --columns +updated_at,+brand  # defaults plus extras
+    python3 scripts/export_shared_products.py -o catalog.npz               # typed columns (numpy)
+    python3 scripts/export_shared_products.py -o catalog.bundle.gz         # binary bundle for clients
+    python3 scripts/export_shared_products.py --chain ./catalog-chain      # nightly: delta since last export
+    python3 scripts/export_shared_products.py --workers 8 --shards -o catalog.jsonl.gz  # id-range shards
+
+``shared_products`` is read through a server-side cursor in one read-only
+snapshot and products are written as they arrive (see heys_data.catalog), so
+memory stays flat. ``--format`` and ``--gzip`` default from the file name
+(``.jsonl``, ``.npz``, ``.bundle``, ``.gz``); ``npz`` is the column-oriented
+export for analysis (heys_data.catalog_matrix; ``--gzip`` compresses its
+members), ``bundle`` the compact binary catalog for clients
+(heys_data.catalog_bundle, with delta patches between bundles).
+``--chain DIR`` keeps a base export plus deltas (changed rows and tombstones
+since the previous watermark) with chained manifests; rebuild the catalog with
+``python3 -m heys_data.catalog_delta DIR materialize -o catalog.json``.
+``--workers N`` (json/jsonl) serializes N id ranges in parallel processes
+over one shared snapshot, then joins them into ``--output`` or, with
+``--shards``, keeps one file per range plus a manifest (heys_data.catalog_shards).
+Connection settings: heys_data/db.py.
+"""
+import argparse
 import sys
 
-# Загружаем сырые данные
-with open('/tmp/heys_shared_products_raw.json', 'r', encoding='utf-8') as f:
-    products = json.load(f)
-
-# Словарь с описаниями полей
-field_descriptions = {
-    "id": "Уникальный идентификатор продукта (UUID)",
-    "name": "Название продукта",
-    
-    "simple100": "Простые углеводы (сахара) на 100г, граммы",
-    "complex100": "Сложные углеводы на 100г, граммы",
-    "protein100": "Белок на 100г, граммы",
-    "badFat100": "Насыщенные (вредные) жиры на 100г, граммы",
-    "goodFat100": "Ненасыщенные (полезные) жиры на 100г, граммы",
-    "trans100": "Транс-жиры на 100г, граммы (самые вредные)",
-    "fiber100": "Клетчатка на 100г, граммы",
-    "gi": "Гликемический индекс (0-100). Низкий <55, средний 55-70, высокий >70",
-    "harm": "Индекс вредности (0-10). 0=суперполезный, 10=супервредный. Формула учитывает транс-жиры, сахар, насыщенные жиры vs клетчатку, белок",
-    "category": "Категория продукта (молочные, мясо, овощи и т.д.)",
-    "portions": "Порции продукта в формате JSON [{name: '1 шт', grams: 50}]",
-    
-    "sodium100": "Натрий (соль) на 100г, миллиграммы. Норма <2000мг/день. Избыток вызывает гипертензию",
-    "nova_group": "NOVA классификация переработки (1-4). 1=натуральный, 2=кулинарный ингредиент, 3=переработанный, 4=ультрапереработанный (вредно!)",
-    
-    "vitamin_a": "Витамин A, % от суточной нормы. Зрение, иммунитет",
-    "vitamin_c": "Витамин C, % от суточной нормы. Иммунитет, антиоксидант",
-    "vitamin_d": "Витамин D, % от суточной нормы. Кости, иммунитет",
-    "vitamin_e": "Витамин E, % от суточной нормы. Антиоксидант",
-    "vitamin_k": "Витамин K, % от суточной нормы. Свёртываемость крови",
-    "vitamin_b1": "Витамин B1 (тиамин), % от суточной нормы. Энергетический метаболизм",
-    "vitamin_b2": "Витамин B2 (рибофлавин), % от суточной нормы. Метаболизм",
-    "vitamin_b3": "Витамин B3 (ниацин), % от суточной нормы. Энергия, нервная система",
-    "vitamin_b6": "Витамин B6 (пиридоксин), % от суточной нормы. Белковый метаболизм",
-    "vitamin_b9": "Витамин B9 (фолат), % от суточной нормы. Кроветворение, беременность",
-    "vitamin_b12": "Витамин B12 (кобаламин), % от суточной нормы. Нервная система, кровь",
-    
-    "calcium": "Кальций, % от суточной нормы. Кости, зубы",
-    "iron": "Железо, % от суточной нормы. Кровь, энергия",
-    "magnesium": "Магний, % от суточной нормы. Мышцы, нервы, сон",
-    "phosphorus": "Фосфор, % от суточной нормы. Кости, энергия",
-    "potassium": "Калий, % от суточной нормы. Сердце, давление",
-    "zinc": "Цинк, % от суточной нормы. Иммунитет, кожа",
-    "selenium": "Селен, % от суточной нормы. Антиоксидант, щитовидка",
-    "iodine": "Йод, % от суточной нормы. Щитовидная железа",
-    
-    "is_organic": "Органический продукт (true/false). Без пестицидов и ГМО",
-    "is_whole_grain": "Цельнозерновой (true/false). Из цельного зерна, больше клетчатки",
-    "is_fermented": "Ферментированный (true/false). Квашеный, содержит пробиотики",
-    "is_raw": "Сырой/необработанный термически (true/false)"
-}
-
-# Формируем итоговую структуру
-output = {
-    "_meta": {
-        "description": "Экспорт продуктов из общей базы HEYS для проверки и корректировки ИИ",
-        "total_products": len(products),
-        "export_date": "2026-01-18",
-        "field_descriptions": field_descriptions
-    },
-    "products": products
-}
-
-# Сохраняем с форматированием
-output_path = '/Users/poplavskijanton/HEYS-v2/heys_shared_products_export.json'
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(output, f, ensure_ascii=False, indent=2)
-
-print(f"Exported {len(products)} products to {output_path}")
+from heys_data import catalog, db
+
+DEFAULT_OUTPUT = "heys_shared_products_export.json"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--format", choices=["json", "jsonl", "npz", "bundle"], help="default: from --output")
+    parser.add_argument("--gzip", action="store_true", help="compress (default: if --output ends with .gz)")
+    parser.add_argument("--columns", help="comma-separated fields; '+field' adds to the defaults")
+    parser.add_argument("--indent", type=int, default=2, help="json: 0 for compact")
+    parser.add_argument("--chain", metavar="DIR", help="append a delta (or the first full export) to this chain")
+    parser.add_argument("--full", action="store_true", help="--chain: start a new base instead of a delta")
+    parser.add_argument("--curator", help="--chain: leave out (tombstone) products this curator blocklisted")
+    parser.add_argument("--workers", type=int, default=1, help="json/jsonl: export N id ranges in parallel")
+    parser.add_argument("--shards", action="store_true", help="--workers: keep shard files + manifest")
+    parser.add_argument("--itersize", type=int, default=catalog.ITERSIZE, help="rows per cursor fetch")
+    args = parser.parse_args(argv)
+    try:
+        args.fields = catalog.parse_fields(args.columns)
+    except ValueError as err:
+        parser.error(str(err))
+    name = args.output[:-3] if args.output.endswith(".gz") else args.output
+    args.format = args.format or next(
+        (fmt for fmt in ("jsonl", "npz", "bundle") if name.endswith("." + fmt)), "json"
+    )
+    args.gzip = args.gzip or args.output.endswith(".gz")
+    if args.format == "npz" and args.output.endswith(".gz"):
+        parser.error("npz: use --gzip with a .npz name (members are compressed inside the zip)")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.shards and args.workers == 1:
+        parser.error("--shards needs --workers N > 1")
+    if args.workers > 1 and (args.chain or args.format not in ("json", "jsonl")):
+        parser.error("--workers: json or jsonl exports only, without --chain")
+    if args.format == "bundle":
+        from heys_data import catalog_bundle
+
+        try:
+            for field in args.fields[1:]:
+                catalog_bundle.field_kind(field)
+        except ValueError as err:
+            parser.error(f"bundle: {err}")
+    return args
+
+
+def write_text(args, meta, products):
+    with catalog.open_output(args.output, args.gzip) as fp:
+        if args.format == "jsonl":
+            return catalog.write_jsonl(fp, meta, products)
+        return catalog.write_json(fp, meta, products, args.indent)
+
+
+def export_chain(args):
+    from heys_data import catalog_delta
+
+    conn = db.connect()
+    try:
+        manifest = catalog_delta.export(conn, args.chain, args.fields if args.columns else None,
+                                        args.full, args.curator, args.itersize)
+    except catalog_delta.ChainError as err:
+        print(f"chain error: {err}", file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
+    print(f"Exported {manifest['kind']} {manifest['name']}: {manifest['products']} products, "
+          f"{manifest['tombstones']} tombstones ({manifest['total_products']} in catalog) to {args.chain}")
+    return 0
+
+
+def export_parallel(args):
+    from heys_data import catalog_shards
+
+    conn = db.connect()
+    try:
+        count, manifest = catalog_shards.export(conn, args.output, args.fields, args.format, args.workers,
+                                                args.shards, args.gzip, args.indent, args.itersize)
+    finally:
+        conn.close()
+    print(f"Exported {count} products with {args.workers} workers to {manifest or args.output}")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.chain:
+        return export_chain(args)
+    if args.workers > 1:
+        return export_parallel(args)
+    conn = db.connect()
+    try:
+        total = catalog.begin_snapshot(conn)
+        meta = catalog.make_meta(total, args.fields)
+        products = catalog.iter_products(conn, args.fields, args.itersize)
+        if args.format == "npz":
+            from heys_data import catalog_matrix
+
+            count = catalog_matrix.write_npz(args.output, meta, products, total, args.fields, args.gzip)
+        elif args.format == "bundle":
+            from heys_data import catalog_bundle
+
+            count = catalog_bundle.write_bundle(args.output, meta, products, args.fields, args.gzip)
+        else:
+            count = write_text(args, meta, products)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    print(f"Exported {count} products to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,67 +1,65 @@
 # -*- coding: utf-8 -*-
-import json
-import psycopg2
+import os
 import time
 
+from heys_data import db, restore
+
 # Dates to fix (с данными в бэкапе)
 dates_to_fix = ['2026-01-08', '2026-01-09', '2026-01-10', '2026-01-11', '2026-01-13', '2026-01-15', '2026-01-16', '2026-01-17', '2026-01-24']
 
-# Read backup
-with open('/Users/poplavskijanton/Documents/heys-backup-ccfe6ea3-2026-01-24.json', 'r') as f:
-    backup = json.load(f)
+backup_path = os.environ.get(
+    'HEYS_RESTORE_BACKUP_PATH',
+    '/Users/poplavskijanton/Documents/heys-backup-ccfe6ea3-2026-01-24.json',
+)
+client_id = os.environ.get('HEYS_RESTORE_CLIENT_ID', 'ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a')
+dry_run = os.environ.get('HEYS_RESTORE_DRY_RUN') == '1'
 
 # Connect to DB
-conn = psycopg2.connect(
-    host="rc1b-obkgs83tnrd6a2m3.mdb.yandexcloud.net",
-    port=6432,
-    dbname="heys_production",
-    user="heys_admin",
-    password="heys007670",
-    sslmode="verify-full",
-    sslrootcert="/Users/poplavskijanton/.postgresql/root.crt"
-)
+conn = db.connect()
 cur = conn.cursor()
 
-client_id = 'ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a'
-
 # CRITICAL: Set updatedAt to NOW (very fresh) so merge logic prefers this data!
 now_timestamp = int(time.time() * 1000)  # JavaScript timestamp (ms)
 
-print(f"Fixing {len(dates_to_fix)} days with updatedAt = {now_timestamp}...\n")
+print(f"Fixing {len(dates_to_fix)} days with updatedAt = {now_timestamp}..." + (" [DRY RUN]" if dry_run else "") + "\n")
+
+# 1. Restore content only where the DB differs from the backup (md5 compare),
+#    stamped with the fresh updatedAt: the write is then newer than what devices
+#    hold, and with HEYS_ENCRYPTION_KEY set it is encrypted with the stamp inside.
+rows = [
+    row for row in restore.rows_from_backup(backup_path, min(dates_to_fix), max(dates_to_fix))
+    if row.date in dates_to_fix
+]
+for date in sorted(set(dates_to_fix) - {row.date for row in rows}):
+    print(f"  {date}: NOT IN BACKUP - skipping")
+hashes = restore.fetch_day_hashes(cur, client_id, min(dates_to_fix), max(dates_to_fix))
+result = restore.RestoreResult(client_id, dry_run=dry_run)
+changed = list(restore.changed_rows(rows, hashes, result))
+stamped = [restore.DayRow(row.date, value={**row.value, 'updatedAt': now_timestamp}) for row in changed]
+if dry_run:
+    print(f"  content: {len(stamped)} day(s) would be written, unchanged={result.unchanged}")
+else:
+    restore.write_days_protected(cur, client_id, stamped, result)
+    print(f"  content: inserted={result.inserted} updated={result.updated} unchanged={result.unchanged} blocked={result.blocked}")
 
-for date in dates_to_fix:
-    day_data = backup['days'].get(date)
-    if not day_data:
-        print(f"  {date}: NOT IN BACKUP - skipping")
-        continue
-    
-    meals = len(day_data.get('meals', []))
-    
-    # SET FRESH updatedAt so sync logic keeps this data!
-    day_data['updatedAt'] = now_timestamp
-    
-    key = f'heys_dayv2_{date}'
-    
-    cur.execute("""
-        UPDATE client_kv_store 
-        SET v = %s, updated_at = NOW()
-        WHERE client_id = %s AND k = %s
-        RETURNING k
-    """, (json.dumps(day_data), client_id, key))
-    
-    result = cur.fetchone()
-    if result:
-        print(f"  {date}: UPDATED ({meals} meals, updatedAt={now_timestamp})")
-    else:
-        cur.execute("""
-            INSERT INTO client_kv_store (client_id, k, v, updated_at)
-            VALUES (%s, %s, %s, NOW())
-        """, (client_id, key, json.dumps(day_data)))
-        print(f"  {date}: INSERTED ({meals} meals)")
+# 2. Days whose content was already right were not rewritten: SET FRESH
+#    updatedAt on them server-side (jsonb_set) so sync logic keeps this data!
+written = {row.date for row in changed}
+touched = restore.touch_days(cur, [(client_id, row.date) for row in rows if row.date not in written],
+                             now_timestamp, dry_run)
+for _, key, previous in touched.touched:
+    print(f"  {key}: updatedAt {previous} -> {now_timestamp}")
+for status in ("missing", "encrypted", "not_object"):
+    for _, key in getattr(touched, status):
+        print(f"  {key}: NOT TOUCHED ({status})")
 
-conn.commit()
+if dry_run:
+    conn.rollback()
+else:
+    conn.commit()
 cur.close()
 conn.close()
 
-print(f"\n✅ Done! updatedAt set to {now_timestamp}")
+fresh = len(touched.touched) + (0 if dry_run else result.written)
+print(f"\n✅ Done! updatedAt set to {now_timestamp} on {fresh} day(s)")
 print("⚠️ ВАЖНО: Закрой ВСЕ вкладки приложения, открой НОВОЕ инкогнито окно!")
@@ -1,58 +1,37 @@
 # -*- coding: utf-8 -*-
-import json
-import psycopg2
+import os
+
+from heys_data import db, restore
 
 # Dates to fix
 dates_to_fix = ['2026-01-08', '2026-01-09', '2026-01-10', '2026-01-11', '2026-01-13', '2026-01-15', '2026-01-16', '2026-01-17', '2026-01-24']
 
-# Read backup
-with open('/Users/poplavskijanton/Documents/heys-backup-ccfe6ea3-2026-01-24.json', 'r') as f:
-    backup = json.load(f)
-
-# Connect to DB
-conn = psycopg2.connect(
-    host="rc1b-obkgs83tnrd6a2m3.mdb.yandexcloud.net",
-    port=6432,
-    dbname="heys_production",
-    user="heys_admin",
-    password="heys007670",
-    sslmode="verify-full",
-    sslrootcert="/Users/poplavskijanton/.postgresql/root.crt"
+# Stream only the requested days out of the backup
+backup_path = os.environ.get(
+    'HEYS_RESTORE_BACKUP_PATH',
+    '/Users/poplavskijanton/Documents/heys-backup-ccfe6ea3-2026-01-24.json',
 )
+rows = [
+    row for row in restore.rows_from_backup(backup_path, min(dates_to_fix), max(dates_to_fix))
+    if row.date in dates_to_fix
+]
+for date in sorted(set(dates_to_fix) - {row.date for row in rows}):
+    print(f"  {date}: NOT IN BACKUP - skipping")
+
+client_id = os.environ.get('HEYS_RESTORE_CLIENT_ID', 'ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a')
+
+conn = db.connect()
 cur = conn.cursor()
 
-client_id = 'ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a'
-
-print(f"Fixing {len(dates_to_fix)} days...\n")
-
-for date in dates_to_fix:
-    day_data = backup['days'].get(date)
-    if not day_data:
-        print(f"  {date}: NOT IN BACKUP - skipping")
-        continue
-    
-    meals = len(day_data.get('meals', []))
-    key = f'heys_dayv2_{date}'
-    
-    cur.execute("""
-        UPDATE client_kv_store 
-        SET v = %s, updated_at = NOW()
-        WHERE client_id = %s AND k = %s
-        RETURNING k
-    """, (json.dumps(day_data), client_id, key))
-    
-    result = cur.fetchone()
-    if result:
-        print(f"  {date}: UPDATED ({meals} meals)")
-    else:
-        cur.execute("""
-            INSERT INTO client_kv_store (client_id, k, v, updated_at)
-            VALUES (%s, %s, %s, NOW())
-        """, (client_id, key, json.dumps(day_data)))
-        print(f"  {date}: INSERTED ({meals} meals)")
+print(f"Fixing {len(rows)} days...\n")
+
+# Set-based protected write; days the DB already holds unchanged are skipped.
+hashes = restore.fetch_day_hashes(cur, client_id, min(dates_to_fix), max(dates_to_fix))
+result = restore.write_days_protected(cur, client_id, rows, server_hashes=hashes)
 
 conn.commit()
 cur.close()
 conn.close()
 
-print("\nDone! Reload the app in incognito to see changes.")
+print(f"\nDone! Updated: {result.updated}, Inserted: {result.inserted}, Unchanged: {result.unchanged}, Blocked by protection: {result.blocked}")
+print("Reload the app in incognito to see changes.")
@@ -0,0 +1,7 @@
+"""
+HEYS data tooling — shared helpers for the Python restore/compare scripts.
+
+Modules are imported directly (``from heys_data import compare``); nothing is
+re-exported here so that importing one tool never pulls in psycopg2 or other
+optional dependencies of another.
+"""
@@ -0,0 +1,142 @@
+"""
+data_loss_audit analytics served from incremental rollups.
+
+Rollups live in ``data_loss_audit_rollup_hourly`` and are advanced by
+``refresh_data_loss_audit_rollups()`` past a persisted id watermark
+(migration ``2026-10-19_data_loss_audit_rollups.sql``) — each refresh reads
+only audit rows it has not seen, however large the table gets.
+
+    cd scripts
+    python3 -m heys_data.audit_rollups refresh             # cron, e.g. every 5 min
+    python3 -m heys_data.audit_rollups summary --hours 24  # blocked writes per client
+    python3 -m heys_data.audit_rollups trend --hours 48    # per hour and action
+    python3 -m heys_data.audit_rollups alert --hours 1 --threshold 10   # exit 1 above threshold
+"""
+import argparse
+import json
+import sys
+
+from heys_data import db
+
+REFRESH_BATCH = 100000
+
+REFRESH_SQL = "SELECT processed, last_id FROM refresh_data_loss_audit_rollups(%s)"
+SUMMARY_SQL = """
+    SELECT client_id::text, blocked, allowed, actions, last_event_at
+    FROM get_data_loss_alert_summary(%s)
+"""
+TREND_SQL = "SELECT hour, action, blocked, allowed, clients FROM get_data_loss_hourly_trend(%s)"
+# Rollups plus the audit rows past the watermark (not rolled up yet: the last
+# few minutes, or everything since the last refresh). Read-only.
+CLIENT_HOURLY_SQL = """
+    WITH w AS (SELECT last_id FROM data_loss_audit_rollup_watermark WHERE name = 'hourly')
+    SELECT hour, action, allowed, sum(events)::int
+    FROM (
+        SELECT hour, action, allowed, events
+        FROM data_loss_audit_rollup_hourly
+        WHERE client_id = %(client_id)s::uuid
+          AND hour >= date_trunc('hour', NOW() - make_interval(hours => %(hours)s))
+        UNION ALL
+        SELECT date_trunc('hour', a.created_at), a.action, a.allowed, 1
+        FROM data_loss_audit a
+        WHERE a.id > COALESCE((SELECT last_id FROM w), 0)
+          AND a.client_id = %(client_id)s::uuid
+          AND a.created_at >= date_trunc('hour', NOW() - make_interval(hours => %(hours)s))
+    ) events
+    GROUP BY hour, action, allowed
+    ORDER BY hour DESC, action
+"""
+
+
+def refresh(conn, batch=REFRESH_BATCH):
+    """Advance the rollups to the newest settled audit row; one commit per batch."""
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(REFRESH_SQL, (batch,))
+            processed, last_id = cur.fetchone()
+        conn.commit()
+        total += processed
+        if processed < batch:
+            return total, last_id
+
+
+def summary(cur, hours=24):
+    cur.execute(SUMMARY_SQL, (hours,))
+    return [
+        {
+            "client_id": client_id,
+            "blocked": int(blocked),
+            "allowed": int(allowed),
+            "actions": list(actions),
+            "last_event_at": last_event_at.isoformat() if last_event_at else None,
+        }
+        for client_id, blocked, allowed, actions, last_event_at in cur.fetchall()
+    ]
+
+
+def client_hourly(cur, client_id, hours=24):
+    """``(hour, action, allowed, events)`` for one client, up to the newest audit row; no refresh."""
+    cur.execute(CLIENT_HOURLY_SQL, {"client_id": client_id, "hours": hours})
+    return cur.fetchall()
+
+
+def trend(cur, hours=48):
+    cur.execute(TREND_SQL, (hours,))
+    return [
+        {"hour": hour.isoformat(), "action": action, "blocked": int(blocked),
+         "allowed": int(allowed), "clients": int(clients)}
+        for hour, action, blocked, allowed, clients in cur.fetchall()
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["refresh", "summary", "trend", "alert"])
+    parser.add_argument("--hours", type=int, help="window (default: 24, trend: 48)")
+    parser.add_argument("--threshold", type=int, default=0, help="alert: blocked writes allowed in window")
+    parser.add_argument("--no-refresh", action="store_true", help="read rollups as they are")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    conn = db.connect()
+    try:
+        if args.command == "refresh" or not args.no_refresh:
+            processed, last_id = refresh(conn)
+            if args.command == "refresh":
+                print(f"Rolled up {processed} audit row(s), watermark id={last_id}")
+                return 0
+        with conn.cursor() as cur:
+            if args.command == "trend":
+                rows = trend(cur, args.hours or 48)
+            else:
+                rows = summary(cur, args.hours or 24)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if args.json:
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.command == "trend":
+        for row in rows:
+            print(f"{row['hour']}  {row['action']:<28} blocked={row['blocked']:<5} "
+                  f"allowed={row['allowed']:<5} clients={row['clients']}")
+    else:
+        for row in rows:
+            print(f"{row['client_id']}  blocked={row['blocked']:<5} allowed={row['allowed']:<5} "
+                  f"{','.join(row['actions'])}  last={row['last_event_at']}")
+
+    if args.command == "alert":
+        blocked = sum(row["blocked"] for row in rows)
+        if blocked > args.threshold:
+            print(f"ALERT: {blocked} blocked write(s) in {args.hours or 24}h "
+                  f"across {len(rows)} client(s)", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Streaming reader for client backup files.
+
+``json.load`` of ``heys-backup-<client>.json`` builds the whole file as Python
+objects before the first day can be touched. This module walks the top-level
+object incrementally instead: only the member currently being looked at is in
+memory, everything the caller ignores is skipped with a regex scanner, so
+restore/compare run with flat memory and can start writing immediately.
+
+    with open_backup(path) as fp:
+        for key, value in stream_object(fp):
+            if key == "clientId":
+                client_id = value.load()
+            elif key == "days":
+                for date, day in value.members():
+                    restore(date, day.load())
+
+Values are :class:`LazyValue` handles: ``load()`` materialises one value,
+``members()`` / ``elements()`` stream an object / array one level deeper, and a
+handle that is never touched is skipped when iteration moves on. Handles are
+only valid until the parent iterator advances — it is a single forward pass.
+
+Stdlib only (``json.JSONDecoder.raw_decode`` per value), gzip is detected by
+magic bytes so ``.json.gz`` exports work the same way.
+"""
+import gzip
+import io
+import json
+import re
+from json.decoder import scanstring
+
+from heys_data.days import day_date
+
+CHUNK_SIZE = 1 << 16
+
+_WS = re.compile(r"[ \t\n\r]*")
+_STRUCT = re.compile(r'[\[\]{}"]')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_DELIMITERS = ",]} \t\n\r"
+
+
+class BackupFormatError(ValueError):
+    """Raised when the stream is not the JSON shape the caller asked for."""
+
+
+def open_backup(path_or_fp):
+    """Open a backup as a UTF-8 text stream; transparently gunzips ``.json.gz``."""
+    if hasattr(path_or_fp, "read"):
+        return path_or_fp
+    raw = open(path_or_fp, "rb")
+    magic = raw.peek(2)[:2] if hasattr(raw, "peek") else b""
+    if magic == b"\x1f\x8b":
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding="utf-8")
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+class _Stream:
+    """Sliding-window buffer over a text stream plus the primitive scanners."""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE, parse_float=None):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder(parse_float=parse_float)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_size=0):
+        """Append the next chunk; drops the consumed prefix first. False at EOF."""
+        if self.eof:
+            return False
+        if self.chunk_size < self.pos <= len(self.buf):
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.fp.read(max(self.chunk_size, min_size))
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def skip_ws(self):
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_ws()
+        if self.pos >= len(self.buf):
+            raise BackupFormatError("unexpected end of JSON stream")
+        return self.buf[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise BackupFormatError(
+                f"expected {char!r} at offset {self.pos}, got {self.buf[self.pos]!r}"
+            )
+        self.pos += 1
+
+    def read_string(self):
+        self.expect('"')
+        while True:
+            try:
+                value, end = scanstring(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+    def decode_value(self):
+        """raw_decode the value at ``pos``, growing the window until it is complete."""
+        self.skip_ws()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Double the read size on every retry: a large value is
+                # re-scanned O(log n) times, not once per chunk.
+                if self.fill(len(self.buf) - self.pos):
+                    continue
+                raise
+            # A number cut by the window edge may continue in the next chunk
+            # ("12" + "34", "72." + "4"): accept a scalar only when a
+            # delimiter follows it or the stream is exhausted.
+            scalar = self.buf[self.pos] not in '{["'
+            if scalar and (end == len(self.buf) or self.buf[end] not in _DELIMITERS) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        """Advance past the value at ``pos`` without building Python objects."""
+        char = self.peek()
+        if char == '"':
+            self._skip_string()
+        elif char in "{[":
+            self._skip_container()
+        else:
+            self.decode_value()
+
+    def _skip_string(self):
+        match = _STRING.match(self.buf, self.pos)
+        if match:  # fast path: the whole string is already in the window
+            self.pos = match.end()
+            return
+        # Slow path: ``pos`` walks through the string itself, so the window
+        # can be compacted while skipping a multi-megabyte value (photos).
+        self.pos += 1
+        while True:
+            self.pos = _STRING_BODY.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) and self.buf[self.pos] == '"':
+                self.pos += 1
+                return
+            # Window ends inside the string (or right after a backslash).
+            if not self.fill():
+                raise BackupFormatError("unterminated string in JSON stream")
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            match = _STRUCT.search(self.buf, self.pos)
+            if not match:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise BackupFormatError("unterminated container in JSON stream")
+                continue
+            self.pos = match.start()
+            char = match.group()
+            if char == '"':
+                self._skip_string()
+                continue
+            self.pos += 1
+            depth += 1 if char in "{[" else -1
+            if depth == 0:
+                return
+
+
+class LazyValue:
+    """Handle to a not-yet-read JSON value in the stream."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._consumed = False
+        self._iter = None
+
+    @property
+    def kind(self):
+        """'object', 'array', 'string' or 'scalar' — peeks, does not consume."""
+        char = self._stream.peek()
+        return {"{": "object", "[": "array", '"': "string"}.get(char, "scalar")
+
+    def load(self):
+        """Materialise this value (and only this value)."""
+        self._take()
+        return self._stream.decode_value()
+
+    def members(self):
+        """Stream ``(key, LazyValue)`` pairs of an object value."""
+        self._take()
+        self._iter = _MemberIter(self._stream)
+        return self._iter
+
+    def elements(self):
+        """Stream ``LazyValue`` items of an array value."""
+        self._take()
+        self._iter = _ElementIter(self._stream)
+        return self._iter
+
+    def _take(self):
+        if self._consumed:
+            raise BackupFormatError("value already consumed (stream is forward-only)")
+        self._consumed = True
+
+    def _finish(self):
+        if not self._consumed:
+            self._consumed = True
+            self._stream.skip_value()
+        elif self._iter is not None:
+            self._iter.drain()
+
+
+class _ContainerIter:
+    open_char = close_char = None
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._stream.expect(self.open_char)
+        self._first = True
+        self._done = False
+        self._current = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        if self._current is not None:
+            self._current._finish()
+            self._current = None
+        stream = self._stream
+        if stream.peek() == self.close_char:
+            stream.pos += 1
+            self._done = True
+            raise StopIteration
+        if not self._first:
+            stream.expect(",")
+        self._first = False
+        return self._next_item()
+
+    def drain(self):
+        for _ in self:
+            pass
+
+
+class _MemberIter(_ContainerIter):
+    open_char, close_char = "{", "}"
+
+    def _next_item(self):
+        key = self._stream.read_string()
+        self._stream.expect(":")
+        self._current = LazyValue(self._stream)
+        return key, self._current
+
+
+class _ElementIter(_ContainerIter):
+    open_char, close_char = "[", "]"
+
+    def _next_item(self):
+        self._current = LazyValue(self._stream)
+        return self._current
+
+
+def stream_object(fp, chunk_size=CHUNK_SIZE, parse_float=None):
+    """Iterate ``(key, LazyValue)`` over the top-level object of ``fp``."""
+    return LazyValue(_Stream(fp, chunk_size, parse_float)).members()
+
+
+def load_sections(path_or_fp, names, parse_float=None):
+    """Materialise only the named top-level sections; everything else is skipped."""
+    wanted = set(names)
+    found = {}
+    with open_backup(path_or_fp) as fp:
+        for key, value in stream_object(fp, parse_float=parse_float):
+            if key in wanted:
+                found[key] = value.load()
+                if len(found) == len(wanted):
+                    break
+    return found
+
+
+def iter_days(path_or_fp, since=None, until=None, parse_float=None):
+    """
+    Lazily yield ``(date, day_data)`` from the ``days`` section of a backup.
+
+    Accepts both bare-date and ``heys_dayv2_<date>`` keys; dates outside
+    ``[since, until]`` are skipped without being parsed.
+    """
+    with open_backup(path_or_fp) as fp:
+        for key, value in stream_object(fp, parse_float=parse_float):
+            if key != "days":
+                continue
+            for raw_key, day in value.members():
+                date = day_date(raw_key)
+                if date is None or (since and date < since) or (until and date > until):
+                    continue
+                yield date, day.load()
+            return
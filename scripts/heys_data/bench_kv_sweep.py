@@ -0,0 +1,266 @@
+"""
+Batch-size / payload / concurrency sweep for batch_upsert_client_kv_by_session.
+
+    cd scripts
+    HEYS_PG_DSN="dbname=postgres" python3 -m heys_data.bench_kv_sweep \\
+        --batch-sizes 1,5,10,25,50 --payloads 1,3,6 --sessions 1,4,8,16 \\
+        --pool-size 3 --csv sweep.csv --json sweep.json
+
+Every cell of the grid gets a fresh clone of a seeded template database
+(:mod:`heys_data.bench_kv_writes`) and ``--duration`` seconds of load:
+
+    batch     days per batch_upsert_client_kv_by_session call
+    payload   items per meal in the written day documents (document size)
+    sessions  concurrent client sessions
+
+``--pool-size N`` stands in for pgbouncer / the serverless pg pool: the
+sessions share N server connections, borrowed per call, and the time spent
+waiting for one is reported as ``acquire_p95_ms`` (``0``: one connection per
+session). While a cell runs, :class:`ServerProbe` samples ``pg_stat_activity``
+for backends waiting on locks and reads the CPU time of the benchmark's
+server backends from ``/proc`` (same host only; empty otherwise).
+
+Outputs a flat CSV (one row per cell) and a chart-ready JSON with one series
+per (payload, sessions) over batch size, the best cell within
+``--p95-budget-ms`` and the pool size it implies by the formula in
+``yandex-cloud-functions/POOL_TUNING_GUIDE.md``.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+from heys_data import bench_kv_writes as bench
+from heys_data import localpg
+
+CSV_FIELDS = [
+    "batch", "payload", "sessions", "pool_size", "protection",
+    "calls", "items", "calls_per_sec", "items_per_sec",
+    "p50_ms", "p95_ms", "p99_ms", "max_ms", "mean_ms",
+    "acquire_p95_ms", "lock_waits_mean", "lock_waits_max", "lock_wait_ratio", "deadlocks",
+    "server_cpu_sec", "server_cpu_pct", "skipped", "failed", "errors",
+]
+PROBE_SQL = """
+    SELECT count(*) FILTER (WHERE wait_event_type = 'Lock'),
+           count(*) FILTER (WHERE state = 'active')
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid()
+"""
+DEADLOCKS_SQL = "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+SERIES_METRICS = ("items_per_sec", "p50_ms", "p95_ms", "p99_ms", "acquire_p95_ms",
+                  "lock_waits_mean", "server_cpu_pct")
+
+
+def proc_cpu_seconds(pid):
+    """utime + stime of a local process in seconds, or None if not readable."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class ServerProbe:
+    """Lock waits and backend CPU for one measured window (see module docstring)."""
+
+    def __init__(self, dsn, interval=0.1, connect=None, cpu_reader=proc_cpu_seconds):
+        if connect is None:
+            import psycopg2
+
+            connect = psycopg2.connect
+        self.conn = connect(dsn)
+        self.conn.autocommit = True
+        self.interval = interval
+        self.cpu_reader = cpu_reader
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _query(self, sql):
+        with self.conn.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchone()
+
+    def _cpu(self):
+        readings = [self.cpu_reader(pid) for pid in self.pids]
+        return None if any(r is None for r in readings) else sum(readings)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(self._query(PROBE_SQL))
+
+    def start(self, pids):
+        self.pids = list(pids)
+        self.cpu_start = self._cpu()
+        self.deadlocks_start = self._query(DEADLOCKS_SQL)[0]
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop sampling and close the connection; safe before :meth:`start` and after :meth:`stop`."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.conn.closed:
+            self.conn.close()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.perf_counter() - self.started
+        cpu_end = self._cpu()
+        deadlocks = self._query(DEADLOCKS_SQL)[0] - self.deadlocks_start
+        self.close()
+        waits = [waiting for waiting, _ in self.samples]
+        cpu = cpu_end - self.cpu_start if cpu_end is not None and self.cpu_start is not None else None
+        return {
+            "lock_waits_mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "lock_waits_max": max(waits, default=0),
+            "lock_wait_ratio": round(sum(1 for w in waits if w) / len(waits), 3) if waits else 0.0,
+            "deadlocks": deadlocks,
+            "server_cpu_sec": round(cpu, 2) if cpu is not None else None,
+            # Per core: 250 means two and a half cores busy.
+            "server_cpu_pct": round(cpu / elapsed * 100, 1) if cpu is not None and elapsed else None,
+        }
+
+
+def int_list(text):
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def grid(batch_sizes, payloads, sessions):
+    return [(b, p, s) for p in payloads for s in sessions for b in batch_sizes]
+
+
+def series(rows):
+    """Chart-ready: one series per (payload, sessions), batch size on x, sorted."""
+    groups = {}
+    for row in sorted(rows, key=lambda r: (r["payload"], r["sessions"], r["batch"])):
+        group = groups.setdefault((row["payload"], row["sessions"]), {
+            "name": f"payload={row['payload']} sessions={row['sessions']}",
+            "payload": row["payload"],
+            "sessions": row["sessions"],
+            "batch": [],
+            **{metric: [] for metric in SERIES_METRICS},
+        })
+        group["batch"].append(row["batch"])
+        for metric in SERIES_METRICS:
+            group[metric].append(row.get(metric))
+    return list(groups.values())
+
+
+def best_cell(rows, p95_budget_ms):
+    """Highest items/s among error-free cells whose p95 fits the budget."""
+    fitting = [r for r in rows if r["p95_ms"] is not None and r["p95_ms"] <= p95_budget_ms
+               and not r["errors"] and not r["failed"]]
+    return max(fitting, key=lambda r: (r["items_per_sec"], -r["p95_ms"]), default=None)
+
+
+def pool_hint(row, headroom=1.2):
+    """POOL_TUNING_GUIDE.md: pool = concurrent requests x avg query ms / 1000, +20%."""
+    if not row or not row["mean_ms"]:
+        return None
+    needed = row["calls_per_sec"] * row["mean_ms"] / 1000
+    return {
+        "calls_per_sec": row["calls_per_sec"],
+        "mean_ms": row["mean_ms"],
+        "connections_busy": round(needed, 2),
+        "pool_size": max(1, math.ceil(needed * headroom)),
+    }
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batch-sizes", type=int_list, default=[1, 5, 10, 25, 50])
+    parser.add_argument("--payloads", type=int_list, default=[1, 3, 6], help="items per meal")
+    parser.add_argument("--sessions", type=int_list, default=[1, 4, 8, 16])
+    parser.add_argument("--pool-size", type=int, default=3, help="shared server connections; 0 = one per session")
+    parser.add_argument("--protection", choices=["on", "off"], default="off",
+                        help="check_day_overwrite_allowed trigger (see bench_kv_writes)")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per cell")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--empty-ratio", type=float, default=0.0)
+    parser.add_argument("--p95-budget-ms", type=float, default=500.0)
+    parser.add_argument("--db-prefix", default="heys_sweep")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch databases")
+    parser.add_argument("--csv", help="write one row per cell")
+    parser.add_argument("--json", help="write chart-ready series")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    template, scratch = f"{args.db_prefix}_template", f"{args.db_prefix}_run"
+    cells = grid(args.batch_sizes, args.payloads, args.sessions)
+
+    print(f"Seeding {args.clients} clients x {args.days} days ...", file=sys.stderr)
+    client_ids, dates = bench.prepare_template(template, args.clients, args.days, 3)
+    rows = []
+    try:
+        for n, (batch, payload, sessions) in enumerate(cells, 1):
+            dsn = bench.clone(template, scratch, args.protection)
+            workloads = [
+                bench.Workload(client_ids, dates, batch, items_per_meal=payload,
+                               empty_ratio=args.empty_ratio, seed_value=i)
+                for i in range(sessions)
+            ]
+            pool_size = min(args.pool_size, sessions) if args.pool_size else None
+            probe = ServerProbe(dsn)
+            try:
+                result = bench.run_load(dsn, "batch", workloads, args.duration, args.warmup,
+                                        pool_size=pool_size, probe=probe)
+            finally:
+                probe.close()  # no-op after a normal stop(); frees the probe if run_load failed
+            row = {"batch": batch, "payload": payload, "sessions": sessions,
+                   "pool_size": pool_size or sessions, "protection": args.protection, **result}
+            rows.append(row)
+            print(f"[{n}/{len(cells)}] batch={batch:<4} payload={payload:<3} sessions={sessions:<4} "
+                  f"{row['items_per_sec']:>9} items/s  p95={row['p95_ms']} ms  "
+                  f"acquire_p95={row.get('acquire_p95_ms')} ms  locks={row['lock_waits_mean']}  "
+                  f"cpu={row['server_cpu_pct']}%", file=sys.stderr)
+    finally:
+        if not args.keep:
+            localpg.drop_database(scratch)
+            localpg.drop_database(template)
+
+    best = best_cell(rows, args.p95_budget_ms)
+    if args.csv:
+        write_csv(args.csv, rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if k not in ("csv", "json")},
+                "x": "batch",
+                "series": series(rows),
+                "best": best,
+                "pool_hint": pool_hint(best),
+            }, f, ensure_ascii=False, indent=2)
+    if best:
+        hint = pool_hint(best)
+        print(f"Best within p95 <= {args.p95_budget_ms} ms: batch={best['batch']} payload={best['payload']} "
+              f"sessions={best['sessions']} -> {best['items_per_sec']} items/s, p95 {best['p95_ms']} ms; "
+              f"pool hint {hint['pool_size']} connection(s)")
+    else:
+        print(f"No cell met p95 <= {args.p95_budget_ms} ms without errors")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Latency benchmark for the client_kv_store write paths, protection on vs off.
+
+    cd scripts
+    HEYS_PG_DSN="dbname=postgres" python3 -m heys_data.bench_kv_writes \\
+        --clients 200 --days 60 --workers 8 --duration 20 --report bench.json
+
+Provisions a scratch database on a local Postgres (:mod:`heys_data.localpg`:
+real migrations from ``database/``), seeds realistic day documents and
+clones a fresh copy from it for every run (``CREATE DATABASE ... TEMPLATE``),
+so each run starts from identical data. ``--workers`` threads, each with its own
+autocommit connection like heys-api-rpc, drive for ``--duration`` seconds:
+
+    session   upsert_client_kv_by_session, one day per call
+    batch     batch_upsert_client_kv_by_session, ``--batch`` days per call
+    writer    write_client_kv_value directly (protection is inline, always on)
+
+Protection: the session functions as of 2026-06-21 upsert without
+``check_day_overwrite_allowed``. "on" attaches it as a BEFORE INSERT trigger
+(one check per write, the existing row is re-read and its meals counted;
+a blocked write comes back as ``write_skipped``), "off" runs them as migrated.
+``--empty-ratio`` of the writes are empty days from a stale device, the case
+the check blocks. ``--encrypt`` sets ``heys.encryption_key`` so the writer also
+pays for health-key encryption and the extra ciphertext SELECT.
+
+Reports calls/s, items/s and p50/p95/p99/max latency per (target, protection),
+plus the p50/p95 overhead of protection per target.
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from heys_data import localpg
+
+TARGETS = ("session", "batch", "writer")
+
+PROTECTION_ON_SQL = """
+    CREATE OR REPLACE FUNCTION public.bench_check_day_overwrite()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    SET search_path TO 'public', 'pg_temp'
+    AS $function$
+    BEGIN
+      IF NOT check_day_overwrite_allowed(NEW.client_id, NEW.k, NEW.v) THEN
+        RETURN NULL;
+      END IF;
+      RETURN NEW;
+    END;
+    $function$;
+
+    DROP TRIGGER IF EXISTS trg_bench_check_day_overwrite ON public.client_kv_store;
+    CREATE TRIGGER trg_bench_check_day_overwrite
+    BEFORE INSERT ON public.client_kv_store
+    FOR EACH ROW EXECUTE FUNCTION public.bench_check_day_overwrite();
+"""
+
+SESSION_SQL = "SELECT upsert_client_kv_by_session(%s, %s, %s::jsonb)"
+BATCH_SQL = "SELECT batch_upsert_client_kv_by_session(%s, %s::jsonb)"
+WRITER_SQL = "SELECT write_client_kv_value(%s::uuid, %s, %s::jsonb)"
+STALE_MS = 6 * 3600 * 1000
+
+
+class Workload:
+    """Random day writes over the seeded clients; one instance per worker thread."""
+
+    def __init__(self, client_ids, dates, batch=1, meals=(2, 5), items_per_meal=3,
+                 empty_ratio=0.05, seed_value=None):
+        self.client_ids = client_ids
+        self.dates = dates
+        self.batch = batch
+        self.meals = meals
+        self.items_per_meal = items_per_meal
+        self.empty_ratio = empty_ratio
+        self.rng = random.Random(seed_value)
+
+    def client(self):
+        n = self.rng.randrange(len(self.client_ids))
+        return n, self.client_ids[n]
+
+    def day(self):
+        date = self.rng.choice(self.dates)
+        now = int(time.time() * 1000)
+        if self.rng.random() < self.empty_ratio:
+            doc = localpg.day_document(date, 0, updated_ms=now - STALE_MS, rng=self.rng)
+        else:
+            doc = localpg.day_document(date, self.rng.randint(*self.meals), self.items_per_meal, now, self.rng)
+        return f"heys_dayv2_{date}", doc
+
+    def items(self):
+        days = dict(self.day() for _ in range(self.batch))
+        return [{"k": k, "v": v} for k, v in days.items()]
+
+
+def make_call(target, workload):
+    """``() -> (sql, params, items)`` for one call of ``target``."""
+    def session():
+        n, _ = workload.client()
+        key, doc = workload.day()
+        return SESSION_SQL, (localpg.session_token(n), key, json.dumps(doc)), 1
+
+    def batch():
+        n, _ = workload.client()
+        items = workload.items()
+        return BATCH_SQL, (localpg.session_token(n), json.dumps(items)), len(items)
+
+    def writer():
+        _, client_id = workload.client()
+        key, doc = workload.day()
+        return WRITER_SQL, (client_id, key, json.dumps(doc)), 1
+
+    return {"session": session, "batch": batch, "writer": writer}[target]
+
+
+def outcome(target, response):
+    """Classify one response: ``(written, skipped, failed)`` item counts."""
+    if target == "writer":
+        return 1, 0, 0  # void; a blocked write is indistinguishable from the outside
+    if target == "session":
+        if response.get("success"):
+            return 1, 0, 0
+        return (0, 1, 0) if response.get("error") == "write_skipped" else (0, 0, 1)
+    skipped = sum(1 for item in response.get("rejected_items", []) if item.get("reason") == "write_skipped")
+    failed = int(response.get("rejected", 0)) - skipped
+    if response.get("success") is False and "saved" not in response:
+        failed += 1
+    return int(response.get("saved", 0)), skipped, failed
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, duration, items, skipped, failed, errors=0):
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "calls": len(latencies),
+        "items": items,
+        "skipped": skipped,
+        "failed": failed,
+        "errors": errors,
+        "duration_sec": round(duration, 3),
+        "calls_per_sec": round(len(latencies) / duration, 1) if duration else 0.0,
+        "items_per_sec": round(items / duration, 1) if duration else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "mean_ms": ms(sum(latencies) / len(latencies) if latencies else None),
+    }
+
+
+def run_load(dsn, target, workloads, duration, warmup=1.0, encryption_key=None, connect=None,
+             pool_size=None, probe=None):
+    """
+    Drive ``target`` from one thread per workload for ``duration`` seconds
+    (after ``warmup``) and return :func:`summarize` of the measured window.
+
+    By default each thread owns a connection. With ``pool_size`` the threads
+    are client sessions sharing that many server connections, borrowed per call
+    like pgbouncer in transaction mode; latency then includes the wait for a
+    connection, reported separately as ``acquire_*``. ``probe`` (see
+    :class:`heys_data.bench_kv_sweep.ServerProbe`) gets ``start(pids)`` when
+    the measured window opens and its ``stop()`` dict is merged into the result.
+    ``connect(dsn)`` defaults to psycopg2.connect.
+    """
+    if connect is None:
+        import psycopg2
+
+        connect = psycopg2.connect
+    start = threading.Barrier(len(workloads) + 1)
+    lock = threading.Lock()
+    totals = {"latencies": [], "acquire": [], "items": 0, "skipped": 0, "failed": 0, "errors": 0}
+
+    conns = []
+    try:
+        for _ in range(pool_size or len(workloads)):
+            conn = connect(dsn)
+            conn.autocommit = True
+            conns.append(conn)
+            if encryption_key:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT set_config('heys.encryption_key', %s, false)", (encryption_key,))
+        pids = []
+        if probe is not None:
+            for conn in conns:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_backend_pid()")
+                    pids.append(cur.fetchone()[0])
+    except Exception:
+        for conn in conns:
+            conn.close()
+        raise
+    idle = queue.Queue()
+    for conn in conns:
+        idle.put(conn)
+
+    def worker(index, workload):
+        call = make_call(target, workload)
+        latencies, acquire, items, skipped, failed, errors = [], [], 0, 0, 0, 0
+        own = None if pool_size else conns[index]
+        start.wait()
+        measure_from = time.perf_counter() + warmup
+        stop_at = measure_from + duration
+        while True:
+            sql, params, _ = call()
+            began = time.perf_counter()
+            if began >= stop_at:
+                break
+            conn = own or idle.get()
+            acquired = time.perf_counter()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    response = cur.fetchone()[0]
+            except Exception:
+                if began >= measure_from:
+                    errors += 1
+                continue
+            finally:
+                if own is None:
+                    idle.put(conn)
+            if began < measure_from:
+                continue
+            latencies.append(time.perf_counter() - began)
+            acquire.append(acquired - began)
+            written, was_skipped, was_failed = outcome(target, response or {})
+            items += written
+            skipped += was_skipped
+            failed += was_failed
+        with lock:
+            totals["latencies"] += latencies
+            totals["acquire"] += acquire
+            totals["items"] += items
+            totals["skipped"] += skipped
+            totals["failed"] += failed
+            totals["errors"] += errors
+
+    threads = [threading.Thread(target=worker, args=pair, daemon=True) for pair in enumerate(workloads)]
+    probed = {}
+    try:
+        for thread in threads:
+            thread.start()
+        start.wait()
+        if probe is not None:
+            time.sleep(warmup)
+            probe.start(pids)
+        for thread in threads:
+            thread.join()
+        if probe is not None:
+            probed = probe.stop()
+    finally:
+        for conn in conns:
+            conn.close()
+    result = summarize(totals["latencies"], duration, totals["items"], totals["skipped"],
+                       totals["failed"], totals["errors"])
+    if pool_size:
+        acquire = sorted(totals["acquire"])
+        result["acquire_p95_ms"] = round(percentile(acquire, 95) * 1000, 3) if acquire else None
+        result["acquire_max_ms"] = round(acquire[-1] * 1000, 3) if acquire else None
+    result.update(probed)
+    return result
+
+
+def overhead(results):
+    """Per target: protection on vs off, in percent of the "off" p50/p95 and throughput."""
+    by_key = {(r["target"], r["protection"]): r for r in results}
+    rows = {}
+    for target in TARGETS:
+        on, off = by_key.get((target, "on")), by_key.get((target, "off"))
+        if not on or not off or not off["calls"]:
+            continue
+        pct = lambda a, b: round((a - b) / b * 100, 1) if a is not None and b else None
+        rows[target] = {
+            "p50_pct": pct(on["p50_ms"], off["p50_ms"]),
+            "p95_pct": pct(on["p95_ms"], off["p95_ms"]),
+            "throughput_pct": pct(on["items_per_sec"], off["items_per_sec"]),
+        }
+    return rows
+
+
+def prepare_template(name, clients, days, items_per_meal):
+    """Provision and seed ``name``; returns (client ids, seeded dates)."""
+    import psycopg2
+
+    dsn = localpg.provision(name)
+    conn = psycopg2.connect(dsn)
+    try:
+        client_ids = localpg.seed(conn, clients, days, items_per_meal=items_per_meal)
+    finally:
+        conn.close()
+    return client_ids, localpg.day_dates(days)
+
+
+def clone(template, name, protection):
+    """Fresh copy of ``template`` with the protection trigger on or off."""
+    import psycopg2
+
+    localpg.drop_database(name)
+    localpg.create_database(name, template=template)
+    dsn = localpg.dsn_for(name)
+    if protection == "on":
+        conn = psycopg2.connect(dsn)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(PROTECTION_ON_SQL)
+        finally:
+            conn.close()
+    return dsn
+
+
+def format_row(result):
+    return (f"{result['target']:<8} {result['protection']:<6} {result['calls']:>8} "
+            f"{result['calls_per_sec']:>9} {result['items_per_sec']:>9} "
+            f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} {result['max_ms']:>9} "
+            f"{result['skipped']:>6} {result['failed'] + result['errors']:>5}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--targets", default="session,batch,writer", help="comma list of " + "/".join(TARGETS))
+    parser.add_argument("--protection", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--days", type=int, default=60, help="seeded days per client")
+    parser.add_argument("--items-per-meal", type=int, default=3, help="payload size knob")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--batch", type=int, default=10, help="days per batch call")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--empty-ratio", type=float, default=0.05)
+    parser.add_argument("--encrypt", action="store_true", help="set heys.encryption_key on every connection")
+    parser.add_argument("--db-prefix", default="heys_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch databases")
+    parser.add_argument("--report", help="write results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        raise SystemExit(f"unknown target(s): {', '.join(sorted(unknown))}")
+    modes = ["off", "on"] if args.protection == "both" else [args.protection]
+    key = hashlib.sha256(os.urandom(16)).hexdigest() if args.encrypt else None
+    template, scratch = f"{args.db_prefix}_template", f"{args.db_prefix}_run"
+
+    print(f"Seeding {args.clients} clients x {args.days} days ...", file=sys.stderr)
+    client_ids, dates = prepare_template(template, args.clients, args.days, args.items_per_meal)
+    results = []
+    print(f"{'target':<8} {'prot':<6} {'calls':>8} {'calls/s':>9} {'items/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>9} {'skip':>6} {'err':>5}")
+    try:
+        for target in targets:
+            # write_client_kv_value always checks inline; only one run for it.
+            for protection in (["inline"] if target == "writer" else modes):
+                dsn = clone(template, scratch, protection)
+                workloads = [
+                    Workload(client_ids, dates, args.batch if target == "batch" else 1,
+                             items_per_meal=args.items_per_meal, empty_ratio=args.empty_ratio,
+                             seed_value=n)
+                    for n in range(args.workers)
+                ]
+                result = {"target": target, "protection": protection,
+                          **run_load(dsn, target, workloads, args.duration, args.warmup, key)}
+                results.append(result)
+                print(format_row(result))
+    finally:
+        if not args.keep:
+            localpg.drop_database(scratch)
+            localpg.drop_database(template)
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "report"},
+        "results": results,
+        "protection_overhead": overhead(results),
+    }
+    for target, row in report["protection_overhead"].items():
+        print(f"{target}: protection adds {row['p50_pct']}% p50, {row['p95_pct']}% p95, "
+              f"throughput {row['throughput_pct']}%")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Streaming export of the shared product catalog (``shared_products``).
+
+Rows come through a server-side cursor in ``id`` order and are written one at
+a time: the ``_meta`` header (with ``field_descriptions`` for the chosen
+fields) goes out first, products are appended as they arrive, so memory stays
+flat however large the catalog is.
+
+    with open_output(path, gz=True) as fp:
+        write_json(fp, meta, iter_products(conn, fields))
+
+Two layouts:
+
+    json    ``{"_meta": {...}, "products": [...]}`` — byte-identical to
+            ``json.dump(..., indent=2)`` of the same data
+    jsonl   first line ``{"_meta": {...}}``, then one product per line
+
+Field names are those of the export (``badFat100``), :data:`COLUMNS` maps them
+to ``shared_products`` columns (``badfat100``).
+"""
+import datetime
+import decimal
+import gzip
+import json
+import uuid
+
+ITERSIZE = 2000
+
+# Fields of the default export, in output order.
+FIELD_DESCRIPTIONS = {
+    "id": "Уникальный идентификатор продукта (UUID)",
+    "name": "Название продукта",
+
+    "simple100": "Простые углеводы (сахара) на 100г, граммы",
+    "complex100": "Сложные углеводы на 100г, граммы",
+    "protein100": "Белок на 100г, граммы",
+    "badFat100": "Насыщенные (вредные) жиры на 100г, граммы",
+    "goodFat100": "Ненасыщенные (полезные) жиры на 100г, граммы",
+    "trans100": "Транс-жиры на 100г, граммы (самые вредные)",
+    "fiber100": "Клетчатка на 100г, граммы",
+    "gi": "Гликемический индекс (0-100). Низкий <55, средний 55-70, высокий >70",
+    "harm": "Индекс вредности (0-10). 0=суперполезный, 10=супервредный. Формула учитывает транс-жиры, сахар, насыщенные жиры vs клетчатку, белок",
+    "category": "Категория продукта (молочные, мясо, овощи и т.д.)",
+    "portions": "Порции продукта в формате JSON [{name: '1 шт', grams: 50}]",
+
+    "sodium100": "Натрий (соль) на 100г, миллиграммы. Норма <2000мг/день. Избыток вызывает гипертензию",
+    "nova_group": "NOVA классификация переработки (1-4). 1=натуральный, 2=кулинарный ингредиент, 3=переработанный, 4=ультрапереработанный (вредно!)",
+
+    "vitamin_a": "Витамин A, % от суточной нормы. Зрение, иммунитет",
+    "vitamin_c": "Витамин C, % от суточной нормы. Иммунитет, антиоксидант",
+    "vitamin_d": "Витамин D, % от суточной нормы. Кости, иммунитет",
+    "vitamin_e": "Витамин E, % от суточной нормы. Антиоксидант",
+    "vitamin_k": "Витамин K, % от суточной нормы. Свёртываемость крови",
+    "vitamin_b1": "Витамин B1 (тиамин), % от суточной нормы. Энергетический метаболизм",
+    "vitamin_b2": "Витамин B2 (рибофлавин), % от суточной нормы. Метаболизм",
+    "vitamin_b3": "Витамин B3 (ниацин), % от суточной нормы. Энергия, нервная система",
+    "vitamin_b6": "Витамин B6 (пиридоксин), % от суточной нормы. Белковый метаболизм",
+    "vitamin_b9": "Витамин B9 (фолат), % от суточной нормы. Кроветворение, беременность",
+    "vitamin_b12": "Витамин B12 (кобаламин), % от суточной нормы. Нервная система, кровь",
+
+    "calcium": "Кальций, % от суточной нормы. Кости, зубы",
+    "iron": "Железо, % от суточной нормы. Кровь, энергия",
+    "magnesium": "Магний, % от суточной нормы. Мышцы, нервы, сон",
+    "phosphorus": "Фосфор, % от суточной нормы. Кости, энергия",
+    "potassium": "Калий, % от суточной нормы. Сердце, давление",
+    "zinc": "Цинк, % от суточной нормы. Иммунитет, кожа",
+    "selenium": "Селен, % от суточной нормы. Антиоксидант, щитовидка",
+    "iodine": "Йод, % от суточной нормы. Щитовидная железа",
+
+    "is_organic": "Органический продукт (true/false). Без пестицидов и ГМО",
+    "is_whole_grain": "Цельнозерновой (true/false). Из цельного зерна, больше клетчатки",
+    "is_fermented": "Ферментированный (true/false). Квашеный, содержит пробиотики",
+    "is_raw": "Сырой/необработанный термически (true/false)",
+}
+DEFAULT_FIELDS = tuple(FIELD_DESCRIPTIONS)
+
+# Available on request (``--columns``), not in the default export.
+EXTRA_DESCRIPTIONS = {
+    "brand": "Бренд / производитель",
+    "name_norm": "Нормализованное название (поиск, дедупликация)",
+    "fingerprint": "Отпечаток состава для дедупликации",
+    "description": "Описание продукта",
+    "omega3_100": "Омега-3 на 100г, граммы",
+    "omega6_100": "Омега-6 на 100г, граммы",
+    "additives": "Пищевые добавки, массив E-кодов ['E621', 'E300']",
+    "nutrient_density": "Нутриентная плотность (0-100), рассчитывается по витаминам и минералам",
+    "kcal100_legacy": "Калорийность на 100г из старой базы, ккал (аудит, UI считает ккал по макросам)",
+    "created_at": "Время создания записи (ISO 8601)",
+    "updated_at": "Время последнего изменения записи (ISO 8601)",
+}
+
+# Export field -> shared_products column; only the camelCase fats differ.
+COLUMNS = {field: field for field in (*FIELD_DESCRIPTIONS, *EXTRA_DESCRIPTIONS)}
+COLUMNS.update({"badFat100": "badfat100", "goodFat100": "goodfat100"})
+
+META_DESCRIPTION = "Экспорт продуктов из общей базы HEYS для проверки и корректировки ИИ"
+
+
+def describe(fields):
+    """``field_descriptions`` for ``fields``, in their order."""
+    descriptions = {**FIELD_DESCRIPTIONS, **EXTRA_DESCRIPTIONS}
+    return {field: descriptions[field] for field in fields}
+
+
+def parse_fields(text):
+    """``"id,name,+updated_at"`` -> field tuple; ``+field`` appends to the defaults."""
+    parts = [part.strip() for part in (text or "").split(",") if part.strip()]
+    if parts and all(part.startswith("+") for part in parts):
+        parts = [*DEFAULT_FIELDS, *(part[1:] for part in parts)]
+    unknown = [part for part in parts if part not in COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+    if not parts:
+        return DEFAULT_FIELDS
+    # id always comes first: the cursor pages in id order and bundles key on it.
+    return tuple(dict.fromkeys(["id", *parts]))
+
+
+def select_sql(fields, where=None):
+    """SELECT over shared_products returning ``fields`` in order, ``id`` order."""
+    columns = ", ".join(
+        COLUMNS[f] if COLUMNS[f] == f else f'{COLUMNS[f]} AS "{f}"' for f in fields
+    )
+    return f"SELECT {columns} FROM shared_products {f'WHERE {where} ' if where else ''}ORDER BY id"
+
+
+def begin_snapshot(conn):
+    """
+    Start a read-only REPEATABLE READ transaction on ``conn``: the count in
+    ``_meta`` and the streamed rows then see the same catalog.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cur.execute("SELECT count(*) FROM shared_products")
+        return cur.fetchone()[0]
+
+
+def export_snapshot(conn):
+    """``pg_export_snapshot()`` of ``conn``'s open transaction, for :func:`join_snapshot`."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_export_snapshot()")
+        return cur.fetchone()[0]
+
+
+def join_snapshot(conn, snapshot):
+    """
+    Start a read-only transaction on ``conn`` that sees exactly ``snapshot``;
+    the exporting transaction must stay open until this one has begun.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+
+
+def iter_products(conn, fields=DEFAULT_FIELDS, itersize=ITERSIZE, where=None, params=None):
+    """
+    Yield one ``{field: value}`` dict per product via a server-side cursor;
+    ``where`` / ``params`` narrow the rows (delta exports).
+    """
+    cur = conn.cursor(name="heys_catalog_export")
+    cur.itersize = itersize
+    try:
+        cur.execute(select_sql(fields, where), params)
+        for row in cur:
+            yield dict(zip(fields, row))
+    finally:
+        cur.close()
+
+
+def make_meta(total, fields, export_date=None):
+    return {
+        "description": META_DESCRIPTION,
+        "total_products": total,
+        "export_date": (export_date or datetime.date.today()).isoformat(),
+        "field_descriptions": describe(fields),
+    }
+
+
+def _default(value):
+    """JSON for what psycopg2 returns that ``json`` does not know."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value, indent=None):
+    return json.dumps(value, ensure_ascii=False, indent=indent, default=_default)
+
+
+def json_head(meta, indent=2):
+    """``write_json`` output up to the opening ``[`` of ``products``."""
+    if not indent:
+        return '{"_meta": ' + _dumps(meta) + ', "products": ['
+    pad = " " * indent
+    return "{\n" + pad + '"_meta": ' + _dumps(meta, indent).replace("\n", "\n" + pad) + ",\n" + pad + '"products": ['
+
+
+def json_separator(first, indent=2):
+    """What goes before a product: before the first one, or between two."""
+    if not indent:
+        return "" if first else ", "
+    return ("\n" if first else ",\n") + " " * indent * 2
+
+
+def json_item(product, indent=2):
+    """One product as it appears inside ``products``."""
+    if not indent:
+        return _dumps(product)
+    return _dumps(product, indent).replace("\n", "\n" + " " * indent * 2)
+
+
+def json_tail(count, indent=2):
+    """What closes the document after ``count`` products."""
+    if not indent:
+        return "]}"
+    return ("\n" + " " * indent if count else "") + "]\n}"
+
+
+def write_json(fp, meta, products, indent=2):
+    """
+    ``{"_meta": ..., "products": [...]}`` written incrementally; returns the
+    number of products. With ``indent`` the bytes match a single
+    ``json.dump(..., indent=indent)``.
+    """
+    fp.write(json_head(meta, indent))
+    count = 0
+    for count, product in enumerate(products, 1):
+        fp.write(json_separator(count == 1, indent) + json_item(product, indent))
+    fp.write(json_tail(count, indent))
+    return count
+
+
+def jsonl_line(value):
+    return _dumps(value) + "\n"
+
+
+def write_jsonl(fp, meta, products):
+    """``{"_meta": ...}`` line, then one product per line; returns the count."""
+    fp.write(jsonl_line({"_meta": meta}))
+    count = 0
+    for count, product in enumerate(products, 1):
+        fp.write(jsonl_line(product))
+    return count
+
+
+def open_output(path, gz=False):
+    """Text stream for ``path``; gzip-compressed with ``gz`` (level 6, streaming)."""
+    if gz:
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "w", encoding="utf-8")
@@ -0,0 +1,402 @@
+"""
+Binary catalog bundle for clients, plus delta patches between bundles.
+
+``get_shared_products`` ships every product as a JSON object of ~40 keys;
+this packs the same catalog into typed columns a phone reads without a JSON
+parser (one ``Int16Array``/``Uint16Array`` view per column):
+
+    cd scripts
+    python3 export_shared_products.py -o catalog.bundle          # straight from Postgres
+    python3 -m heys_data.catalog_bundle build heys_shared_products_export.json -o catalog.bundle
+    python3 -m heys_data.catalog_bundle diff old.bundle new.bundle -o old-new.patch
+    python3 -m heys_data.catalog_bundle apply old.bundle old-new.patch -o new.bundle
+    python3 -m heys_data.catalog_bundle info catalog.bundle
+
+Bundle v1 (little endian; every section starts 8-byte aligned):
+
+    header       :data:`HEADER` magic "HEYSBNDL", version, fields, products,
+                 strings, meta string
+    strings      uint32[strings+1] offsets, then utf-8 data. Every distinct
+                 text value, JSON value (compact, sorted keys), field name
+                 and the meta JSON, stored once
+    fields       :data:`FIELD` per field: name string, kind, decimals, width
+    ids          ``products * 16`` bytes, each uuid raw (big endian), sorted;
+                 rows are in id order everywhere, which is all positional
+                 patch addressing needs
+    columns      one per field after ``id``, ``products * width`` bytes:
+                   fixed  int16/int32 value * 10^decimals, NULL = type minimum
+                   nova   uint8, 0 = NULL
+                   flag   uint8 0/1, 255 = NULL
+                   text   uint16/uint32 string index, NULL = all ones
+                   json   same as text, the string is JSON
+
+Nutrients are quantized to :data:`DECIMALS` (0.1 g by default) — the export
+data is no more precise than that. Time columns are not bundled.
+
+Patch v1 ("HEYSPTCH", :data:`PATCH_HEADER`): sha256 of the base and target
+bundles, the removed rows as LEB128 deltas of their base row numbers, then a
+bundle of the added and changed rows (with the target's meta).
+:func:`apply_patch` re-encodes the result and checks the target sha256, so a
+patch only applies to the exact bundle it was made from. Field lists must
+match; otherwise ship a full bundle.
+
+This module is the reference decoder (stdlib only); ``--gzip`` / ``.gz``
+compresses the whole file for download.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import struct
+import sys
+import uuid
+from array import array
+from dataclasses import dataclass
+
+MAGIC = b"HEYSBNDL"
+PATCH_MAGIC = b"HEYSPTCH"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIII8x")  # magic, version, fields, products, strings, meta string
+FIELD = struct.Struct("<IBBBx")  # name string, kind, decimals, width
+PATCH_HEADER = struct.Struct("<8sH2x32s32sII")  # magic, version, base sha256, target sha256, removed, removed bytes
+
+KINDS = {"fixed": 1, "nova": 2, "flag": 3, "text": 4, "json": 5}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+DECIMALS = {"gi": 0, "sodium100": 0, "kcal100_legacy": 0}
+DEFAULT_DECIMALS = 1
+NULL_FLAG = 255
+META_KEYS = ("export_date", "total_products")
+_TYPECODES = {1: "B", 2: "h", 4: "i"}
+_UNSIGNED = {2: "H", 4: "I"}
+
+
+def field_kind(field):
+    """Bundle kind of an export field; ``ValueError`` for what bundles do not carry."""
+    from heys_data import catalog_matrix
+
+    kind = catalog_matrix.kind(field)
+    if kind == "time":
+        raise ValueError(f"{field}: time columns are not bundled")
+    return {"float": "fixed"}.get(kind, kind)
+
+
+def _align(out):
+    out.extend(b"\0" * (-len(out) % 8))
+
+
+def _leb128(values):
+    out = bytearray()
+    for value in values:
+        while True:
+            byte = value & 0x7F
+            value >>= 7
+            if value:
+                out.append(byte | 0x80)
+            else:
+                out.append(byte)
+                break
+    return out
+
+
+def _read_leb128(data, pos, count):
+    values = []
+    for _ in range(count):
+        value = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        values.append(value)
+    return values, pos
+
+
+def _le(arr):
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def _json_text(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _number(value):
+    return None if value is None else float(value)  # Decimal from psycopg2
+
+
+def encode(meta, fields, products):
+    """Bundle bytes for ``products`` (dicts with the export ``fields``, any order)."""
+    fields = list(fields)
+    if not fields or fields[0] != "id":
+        raise ValueError("bundle fields start with id")
+    kinds = [field_kind(f) for f in fields[1:]]
+    rows = sorted(products, key=lambda p: uuid.UUID(str(p["id"])).int)
+
+    strings, lookup = [], {}
+
+    def intern(text):
+        if text not in lookup:
+            lookup[text] = len(strings)
+            strings.append(text)
+        return lookup[text]
+
+    meta_index = intern(_json_text({"format": "heys-catalog-bundle", "version": VERSION,
+                                    **{k: meta.get(k) for k in META_KEYS}}))
+    names = [intern(f) for f in fields]
+
+    columns, descriptors = [], [(names[0], 0, 0, 16)]
+    for field, kind, name in zip(fields[1:], kinds, names[1:]):
+        values = [row.get(field) for row in rows]
+        decimals = 0
+        if kind == "fixed":
+            decimals = DECIMALS.get(field, DEFAULT_DECIMALS)
+            scale = 10 ** decimals
+            ints = [None if v is None else round(_number(v) * scale) for v in values]
+            width = 2 if all(v is None or -32767 <= v <= 32767 for v in ints) else 4
+            null = -(1 << (8 * width - 1))
+            column = array(_TYPECODES[width], [null if v is None else v for v in ints])
+        elif kind in ("nova", "flag"):
+            width = 1
+            if kind == "nova":
+                column = array("B", [0 if v is None else int(v) for v in values])
+            else:
+                column = array("B", [NULL_FLAG if v is None else int(bool(v)) for v in values])
+        else:
+            column = [None if v is None else intern(_json_text(v) if kind == "json" else str(v)) for v in values]
+            width = None  # after every string is interned
+        columns.append(column)
+        descriptors.append((name, KINDS[kind], decimals, width))
+
+    ref_width = 2 if len(strings) < 0xFFFF else 4
+    for n, (name, kind, decimals, width) in enumerate(descriptors):
+        if width is None:
+            null = (1 << (8 * ref_width)) - 1
+            columns[n - 1] = array(_UNSIGNED[ref_width], [null if v is None else v for v in columns[n - 1]])
+            descriptors[n] = (name, kind, decimals, ref_width)
+
+    # Random v4 uuids barely compress as deltas (more than 16 bytes each in
+    # LEB128), so ids stay a fixed-width column a client can map directly.
+    id_bytes = b"".join(uuid.UUID(str(row["id"])).bytes for row in rows)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+
+    out = bytearray(HEADER.pack(MAGIC, VERSION, len(fields), len(rows), len(strings), meta_index))
+    for section in (_le(offsets).tobytes(), b"".join(encoded),
+                    b"".join(FIELD.pack(*d) for d in descriptors), id_bytes):
+        _align(out)
+        out += section
+    for column in columns:
+        _align(out)
+        out += _le(column).tobytes()
+    return bytes(out)
+
+
+@dataclass
+class Bundle:
+    meta: dict
+    fields: list
+    kinds: list
+    decimals: list
+    ids: list
+    columns: dict
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self):
+        """Products as export dicts (nutrients at bundle precision)."""
+        columns = [self.ids] + [self.columns[f] for f in self.fields[1:]]
+        for values in zip(*columns):
+            yield dict(zip(self.fields, values))
+
+
+def _read_array(data, pos, typecode, count):
+    arr = array(typecode)
+    arr.frombytes(data[pos:pos + arr.itemsize * count])
+    return _le(arr), pos + arr.itemsize * count
+
+
+def _skip_align(pos):
+    return pos + (-pos % 8)
+
+
+def decode(data):
+    """Parse bundle bytes (gzip allowed) into a :class:`Bundle`."""
+    data = _unzip(data)
+    magic, version, field_count, count, string_count, meta_index = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a {MAGIC.decode()} v{VERSION} bundle")
+    pos = HEADER.size
+    offsets, pos = _read_array(data, _skip_align(pos), "I", string_count + 1)
+    pos = _skip_align(pos)
+    blob = data[pos:pos + offsets[-1]]
+    strings = [blob[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+    pos = _skip_align(pos + offsets[-1])
+    descriptors = [FIELD.unpack_from(data, pos + n * FIELD.size) for n in range(field_count)]
+    pos = _skip_align(pos + field_count * FIELD.size)
+
+    ids = [str(uuid.UUID(bytes=data[at:at + 16])) for at in range(pos, pos + 16 * count, 16)]
+    pos += 16 * count
+
+    fields, kinds, decimals, columns = [], [], [], {}
+    for name, kind_code, places, width in descriptors:
+        fields.append(strings[name])
+        kinds.append(KIND_NAMES.get(kind_code, "id"))
+        decimals.append(places)
+        if not kind_code:
+            continue
+        kind = KIND_NAMES[kind_code]
+        typecode = _TYPECODES[width] if kind in ("fixed", "nova", "flag") else _UNSIGNED[width]
+        raw, pos = _read_array(data, _skip_align(pos), typecode, count)
+        if kind == "fixed":
+            null, scale = -(1 << (8 * width - 1)), 10 ** places
+            values = [None if v == null else (round(v / scale, places) if places else v) for v in raw]
+        elif kind == "nova":
+            values = [v or None for v in raw]
+        elif kind == "flag":
+            values = [None if v == NULL_FLAG else bool(v) for v in raw]
+        else:
+            null = (1 << (8 * width)) - 1
+            if kind == "json":
+                values = [None if v == null else json.loads(strings[v]) for v in raw]
+            else:
+                values = [None if v == null else strings[v] for v in raw]
+        columns[strings[name]] = values
+    return Bundle(json.loads(strings[meta_index]), fields, kinds, decimals, ids, columns)
+
+
+def _unzip(data):
+    return gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data
+
+
+def make_patch(base, target):
+    """Patch bytes turning bundle ``base`` into bundle ``target`` (both raw or gzip)."""
+    base, target = _unzip(base), _unzip(target)
+    old, new = decode(base), decode(target)
+    if (old.fields, old.decimals) != (new.fields, new.decimals):
+        raise ValueError("field lists differ: ship a full bundle")
+    old_rows = {row["id"]: (n, row) for n, row in enumerate(old.rows())}
+    new_ids = set(new.ids)
+    removed = [n for n, i in enumerate(old.ids) if i not in new_ids]
+    upserts = [row for row in new.rows() if old_rows.get(row["id"], (None, None))[1] != row]
+    removed_bytes = _leb128(b - a for a, b in zip([0] + removed, removed))
+    out = bytearray(PATCH_HEADER.pack(PATCH_MAGIC, VERSION, hashlib.sha256(base).digest(),
+                                      hashlib.sha256(target).digest(), len(removed), len(removed_bytes)))
+    out += removed_bytes
+    _align(out)
+    out += encode(new.meta, new.fields, upserts)
+    return bytes(out)
+
+
+def patch_counts(patch):
+    """``(removed, added or changed)`` rows of a patch."""
+    patch = _unzip(patch)
+    removed, removed_length = PATCH_HEADER.unpack_from(patch)[4:]
+    return removed, HEADER.unpack_from(patch, _skip_align(PATCH_HEADER.size + removed_length))[3]
+
+
+def apply_patch(base, patch):
+    """Target bundle bytes; ``ValueError`` if ``patch`` was made from another base."""
+    base, patch = _unzip(base), _unzip(patch)
+    magic, version, base_sha, target_sha, removed_count, removed_length = PATCH_HEADER.unpack_from(patch)
+    if magic != PATCH_MAGIC or version != VERSION:
+        raise ValueError(f"not a {PATCH_MAGIC.decode()} v{VERSION} patch")
+    if hashlib.sha256(base).digest() != base_sha:
+        raise ValueError("patch does not apply: base bundle differs")
+    deltas, _ = _read_leb128(patch, PATCH_HEADER.size, removed_count)
+    old = decode(base)
+    upserts = decode(patch[_skip_align(PATCH_HEADER.size + removed_length):])
+    removed, at = set(), 0
+    for delta in deltas:
+        at += delta
+        removed.add(old.ids[at])
+    rows = {row["id"]: row for row in old.rows() if row["id"] not in removed}
+    rows.update((row["id"], row) for row in upserts.rows())
+    target = encode(upserts.meta, upserts.fields, rows.values())
+    if hashlib.sha256(target).digest() != target_sha:
+        raise ValueError("patched bundle does not match the target checksum")
+    return target
+
+
+def write_bundle(path, meta, products, fields, compressed=False):
+    """Encode and write a bundle; returns the product count."""
+    data = encode(meta, fields, products)
+    with open(path, "wb") as f:
+        f.write(gzip.compress(data, 6) if compressed else data)
+    return HEADER.unpack_from(data)[3]
+
+
+def read_export(path):
+    """``(meta, products)`` of a .json / .jsonl export (gzip allowed)."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fp:
+        if ".jsonl" in str(path):
+            meta = json.loads(next(fp))["_meta"]
+            return meta, [json.loads(line) for line in fp]
+        data = json.load(fp)
+    return data["_meta"], data["products"]
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(gzip.compress(data, 6) if str(path).endswith(".gz") else data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="bundle a .json/.jsonl export")
+    build_cmd.add_argument("export")
+    build_cmd.add_argument("-o", "--output", required=True, help="*.gz: gzip the bundle")
+    diff_cmd = sub.add_parser("diff", help="patch from one bundle to the next")
+    diff_cmd.add_argument("base")
+    diff_cmd.add_argument("target")
+    diff_cmd.add_argument("-o", "--output", required=True)
+    apply_cmd = sub.add_parser("apply", help="rebuild the target bundle from base + patch")
+    apply_cmd.add_argument("base")
+    apply_cmd.add_argument("patch")
+    apply_cmd.add_argument("-o", "--output", required=True)
+    info_cmd = sub.add_parser("info", help="header and columns of a bundle")
+    info_cmd.add_argument("bundle")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "build":
+            meta, products = read_export(args.export)
+            fields = list(meta["field_descriptions"])
+            count = write_bundle(args.output, meta, products, fields, args.output.endswith(".gz"))
+            print(f"Bundled {count} products to {args.output}")
+        elif args.command == "diff":
+            patch = make_patch(_read(args.base), _read(args.target))
+            _write(args.output, patch)
+            removed, upserts = patch_counts(patch)
+            print(f"Patch: {removed} removed, {upserts} added/changed, {len(patch)} bytes -> {args.output}")
+        elif args.command == "apply":
+            _write(args.output, apply_patch(_read(args.base), _read(args.patch)))
+            print(f"Patched bundle written to {args.output}")
+        else:
+            bundle = decode(_read(args.bundle))
+            print(f"{len(bundle)} products, export {bundle.meta.get('export_date')}")
+            for field, kind, places in zip(bundle.fields, bundle.kinds, bundle.decimals):
+                print(f"  {field:<16} {kind}" + (f" /10^{places}" if kind == "fixed" and places else ""))
+    except ValueError as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+Near-duplicate products: MinHash / LSH over name trigrams plus nutrient distance.
+
+``shared_products.fingerprint`` hashes the exact ``name_norm``, so word-order
+and spelling variants ("Пельмени с маслом классические" / "пельмени
+классические с маслом") become separate products. This finds candidate
+clusters without comparing every pair:
+
+    cd scripts
+    python3 -m heys_data.catalog_dedup catalog.npz --json merge_suggestions.json
+    python3 -m heys_data.catalog_dedup --db --threshold 0.7 --max-distance 0.1
+
+1. Shingles: the pg_trgm-style trigram set of the folded name
+   (:mod:`heys_data.catalog_search`) — word order does not change it.
+2. MinHash: ``num_perm`` multiply-shift hashes, minimum per product, all in
+   numpy over the flattened (product, trigram) pairs.
+3. LSH: the signature is cut into ``bands`` of ``rows``; products sharing any
+   band bucket become candidates (detection threshold ~ (1/bands)^(1/rows),
+   0.5 for 16 x 4). Buckets above ``max_bucket`` (generic names like "яблоко")
+   are skipped and reported instead of exploding into pairs.
+4. Candidates are kept when the estimated name Jaccard >= ``threshold`` and
+   the macro vectors (protein, carbs, fats, fiber per 100 g) differ by at most
+   ``max_distance`` (L1 / the larger total). Different non-empty brands never
+   pair.
+5. Connected components turn pairs into clusters; the product with the most filled
+   nutrient fields (then the oldest, then the smallest id) is suggested to keep.
+
+Read-only: the output is suggestions for a curator, like
+``database/2026-07-02_product_duplicate_audit.sql``; client overlays and day
+items still reference the ids being merged.
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+
+from heys_data import catalog, catalog_search
+
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.6
+MAX_DISTANCE = 0.15
+MAX_BUCKET = 200
+PERM_CHUNK = 8
+NUTRIENT_FIELDS = ("protein100", "simple100", "complex100", "badFat100", "goodFat100", "trans100", "fiber100")
+DEDUP_FIELDS = (*catalog.DEFAULT_FIELDS, "name_norm", "brand", "created_at")
+
+
+def shingles(names):
+    """Flattened ``(trigram keys, product numbers)``, grouped by product."""
+    import numpy as np
+
+    keys, docs = [], []
+    for doc, name in enumerate(names):
+        grams = catalog_search.trigrams(catalog_search.fold(name))
+        keys.extend(grams)
+        docs.extend([doc] * len(grams))
+    return np.array(keys, dtype=np.uint64), np.array(docs, dtype=np.int64)
+
+
+def signatures(keys, docs, count, num_perm=NUM_PERM, seed=0):
+    """
+    ``(count, num_perm)`` uint32 MinHash signatures and a mask of products
+    that have any shingle. Hash ``i`` is ``(a_i * x + b_i) >> 32`` mod 2^64
+    with odd ``a_i`` (multiply-shift).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    sig = np.full((count, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    has = np.zeros(count, dtype=bool)
+    if not len(keys):
+        return sig, has
+    starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+    owners = docs[starts]
+    has[owners] = True
+    for lo in range(0, num_perm, PERM_CHUNK):
+        hashed = (keys[:, None] * a[None, lo:lo + PERM_CHUNK] + b[None, lo:lo + PERM_CHUNK]) >> np.uint64(32)
+        sig[owners, lo:lo + PERM_CHUNK] = np.minimum.reduceat(hashed, starts, axis=0).astype(np.uint32)
+    return sig, has
+
+
+def _unique_sorted(values):
+    import numpy as np
+
+    values.sort()
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def candidate_pairs(sig, has, bands=BANDS, max_bucket=MAX_BUCKET):
+    """Unique ``(i, j)`` with ``i < j`` sharing a band bucket, and the skipped oversized buckets."""
+    import numpy as np
+
+    rows = sig.shape[1] // bands
+    docs = np.flatnonzero(has)
+    count = len(has)
+    mult = np.random.default_rng(1).integers(1, 2 ** 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    found, oversized, triangles = [], 0, {}
+    for band in range(bands):
+        block = sig[docs, band * rows:(band + 1) * rows].astype(np.uint64)
+        buckets = (block * mult).sum(axis=1)  # wraps mod 2^64; collisions only add candidates
+        order = np.argsort(buckets, kind="stable")
+        ordered = buckets[order]
+        first = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        sizes = np.diff(np.append(first, len(ordered)))
+        shared = sizes > 1
+        oversized += int((sizes > max_bucket).sum())
+        for start, size in zip(first[shared].tolist(), sizes[shared].tolist()):
+            if size > max_bucket:
+                continue
+            if size not in triangles:
+                triangles[size] = np.triu_indices(size, 1)
+            i, j = triangles[size]
+            members = np.sort(docs[order[start:start + size]])
+            found.append(members[i] * count + members[j])
+        if found:
+            found = [_unique_sorted(np.concatenate(found))]
+    if not found:
+        return np.empty((0, 2), dtype=np.int64), oversized
+    pairs = found[0]
+    return np.stack([pairs // count, pairs % count], axis=1), oversized
+
+
+def name_similarity(sig, i, j, chunk=1 << 18):
+    """Estimated Jaccard of the names: the share of equal MinHash slots."""
+    import numpy as np
+
+    out = np.empty(len(i))
+    for lo in range(0, len(i), chunk):
+        out[lo:lo + chunk] = (sig[i[lo:lo + chunk]] == sig[j[lo:lo + chunk]]).mean(axis=1)
+    return out
+
+
+def nutrient_distance(vectors, i, j):
+    """L1 distance of macro vectors over the larger of the two totals (0 = identical)."""
+    import numpy as np
+
+    a, b = vectors[i], vectors[j]
+    scale = np.maximum(np.maximum(a.sum(axis=1), b.sum(axis=1)), 1.0)
+    return np.abs(a - b).sum(axis=1) / scale
+
+
+def components(count, i, j):
+    """Connected-component label (smallest member) per product for edges ``i``-``j``."""
+    import numpy as np
+
+    labels = np.arange(count)
+    while True:
+        before = labels.copy()
+        np.minimum.at(labels, i, labels[j])
+        np.minimum.at(labels, j, labels[i])
+        while True:  # pointer jumping
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+        if (labels == before).all():
+            return labels
+
+
+@dataclass
+class Cluster:
+    keep: int
+    merge: list
+    score: float
+    pairs: list = field(default_factory=list)
+
+
+def find_duplicates(m, threshold=THRESHOLD, max_distance=MAX_DISTANCE, num_perm=NUM_PERM, bands=BANDS,
+                    max_bucket=MAX_BUCKET):
+    """``(clusters best first, stats)`` for a :class:`heys_data.catalog_matrix.CatalogMatrix`."""
+    import numpy as np
+
+    names = m.decode("name_norm" if "name_norm" in m.fields else "name")
+    names = [name or "" for name in names]
+    count = len(names)
+    keys, docs = shingles(names)
+    sig, has = signatures(keys, docs, count, num_perm)
+    pairs, oversized = candidate_pairs(sig, has, bands, max_bucket)
+    stats = {"products": count, "candidates": len(pairs), "oversized_buckets": oversized, "pairs": 0}
+    if not len(pairs):
+        return [], stats
+
+    i, j = pairs[:, 0], pairs[:, 1]
+    fields = [f for f in NUTRIENT_FIELDS if f in m.fields]
+    vectors = np.nan_to_num(m.matrix(fields).astype(np.float64)) if fields else np.zeros((count, 1))
+    keep = np.ones(len(i), dtype=bool)
+    if "brand" in m.fields:
+        brand = m["brand"]
+        keep &= (brand[i] < 0) | (brand[j] < 0) | (brand[i] == brand[j])
+    i, j = i[keep], j[keep]
+    similarity = name_similarity(sig, i, j)
+    keep = similarity >= threshold
+    i, j, similarity = i[keep], j[keep], similarity[keep]
+    distance = nutrient_distance(vectors, i, j)
+    keep = distance <= max_distance
+    i, j, similarity, distance = i[keep], j[keep], similarity[keep], distance[keep]
+    stats["pairs"] = int(len(i))
+    if not len(i):
+        return [], stats
+
+    labels = components(count, i, j)
+    members = np.flatnonzero(labels != np.arange(count))
+    members = np.union1d(members, labels[members])
+    filled = (~np.isnan(m.matrix())).sum(axis=1) if m.float_fields() else np.zeros(count, np.int64)
+    created = m["created_at"].astype("int64") if "created_at" in m.fields else np.zeros(count, np.int64)
+    created = np.where(created == np.iinfo(np.int64).min, np.iinfo(np.int64).max, created)  # NaT last
+    ids = m.decode("id")
+    rank = np.empty(count, np.int64)
+    rank[np.argsort(np.array(ids), kind="stable")] = np.arange(count)
+
+    # Members grouped by cluster, the product to keep first in each group.
+    members = members[np.lexsort((rank[members], created[members], -filled[members], labels[members]))]
+    starts = np.flatnonzero(np.r_[True, labels[members][1:] != labels[members][:-1]])
+    edge_order = np.argsort(labels[i], kind="stable")
+    edge_labels = labels[i][edge_order]
+    weights = similarity * (1 - np.minimum(distance, 1))
+
+    group_labels = labels[members[starts]]
+    bounds = zip(np.searchsorted(edge_labels, group_labels, side="left").tolist(),
+                 np.searchsorted(edge_labels, group_labels, side="right").tolist())
+
+    clusters = []
+    for group, (lo, hi) in zip(np.split(members, starts[1:]), bounds):
+        edges = edge_order[lo:hi]
+        merge = group[1:][np.argsort(rank[group[1:]])]
+        clusters.append(Cluster(
+            int(group[0]), merge.tolist(), round(float(weights[edges].mean()), 3),
+            list(zip(i[edges].tolist(), j[edges].tolist(), np.round(similarity[edges], 3).tolist(),
+                     np.round(distance[edges], 3).tolist())),
+        ))
+    clusters.sort(key=lambda c: (-c.score, -len(c.merge), ids[c.keep]))
+    return clusters, stats
+
+
+def suggestions(m, clusters):
+    """JSON-ready merge suggestions."""
+    ids = m.decode("id")
+    names = m.decode("name")
+    brands = m.decode("brand") if "brand" in m.fields else [None] * len(ids)
+
+    def product(doc):
+        return {"id": ids[doc], "name": names[doc], "brand": brands[doc]}
+
+    return [
+        {
+            "score": c.score,
+            "keep": product(c.keep),
+            "merge": [product(doc) for doc in c.merge],
+            "pairs": [{"a": ids[a], "b": ids[b], "name_similarity": s, "nutrient_distance": d}
+                      for a, b, s, d in c.pairs],
+        }
+        for c in clusters
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("catalog", nargs="?", help=".npz from export_shared_products.py")
+    parser.add_argument("--db", action="store_true", help="load the live catalog (with brand, name_norm)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="estimated name Jaccard")
+    parser.add_argument("--max-distance", type=float, default=MAX_DISTANCE, help="relative macro difference")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM)
+    parser.add_argument("--bands", type=int, default=BANDS)
+    parser.add_argument("--max-bucket", type=int, default=MAX_BUCKET)
+    parser.add_argument("--top", type=int, default=30, help="clusters printed")
+    parser.add_argument("--json", metavar="PATH", help="write every merge suggestion")
+    args = parser.parse_args(argv)
+    if bool(args.catalog) == args.db:
+        parser.error("pass a .npz file or --db")
+    if args.num_perm % args.bands:
+        parser.error("--num-perm must be a multiple of --bands")
+
+    from heys_data import catalog_matrix
+
+    if args.db:
+        from heys_data import db
+
+        conn = db.connect()
+        try:
+            m = catalog_matrix.from_db(conn, DEDUP_FIELDS)
+        finally:
+            conn.close()
+    else:
+        m = catalog_matrix.load(args.catalog)
+
+    clusters, stats = find_duplicates(m, args.threshold, args.max_distance, args.num_perm, args.bands,
+                                      args.max_bucket)
+    result = suggestions(m, clusters)
+    for s in result[:args.top]:
+        print(f"{s['score']:.3f}  keep {s['keep']['id']}  {s['keep']['name']}")
+        for p in s["merge"]:
+            print(f"       merge {p['id']}  {p['name']}")
+    print(f"{len(result)} cluster(s) from {stats['pairs']} pair(s) / {stats['candidates']} LSH candidate(s) "
+          f"in {stats['products']} products; {stats['oversized_buckets']} oversized bucket(s) skipped",
+          file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"stats": stats, "suggestions": result}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Chained catalog exports: one full base, then nightly deltas.
+
+``export_shared_products.py --chain DIR`` writes a full export the first time
+(or with ``--full``) and afterwards only what changed since the previous
+export in the chain:
+
+    products    rows with ``updated_at`` past the previous watermark (minus
+                :data:`OVERLAP` for transactions that committed late), plus
+                rows whose ids reappeared
+    tombstones  ``{"_deleted": id}`` for ids that are gone — deleted rows,
+                or with ``--curator`` products that curator has blocklisted
+
+Deletions leave no trace in ``shared_products``, so every export also stores
+its sorted id list (``<name>.ids.gz``); the next delta diffs it against the
+current ids in one merge pass. Each export is ``<name>.jsonl.gz`` (the
+:func:`heys_data.catalog.write_jsonl` layout, tombstones last) and
+``<name>.manifest.json``, which names its ``base`` (the previous manifest),
+the chain's ``root`` full export, the watermark and a sha256 of the data.
+``LATEST`` names the newest manifest and is replaced last, so an interrupted
+export is never picked up.
+
+    cd scripts
+    python3 -m heys_data.catalog_delta ./catalog-chain log
+    python3 -m heys_data.catalog_delta ./catalog-chain materialize -o catalog.json
+    python3 -m heys_data.catalog_delta ./catalog-chain materialize -o catalog.npz --name delta-20261019T020000Z
+
+``materialize`` verifies every file of the chain, folds the deltas into one
+id -> product map and streams the base through it in id order.
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+from heys_data import catalog
+
+FORMAT = "heys-catalog-chain"
+FORMAT_VERSION = 1
+LATEST = "LATEST"
+OVERLAP = datetime.timedelta(minutes=10)
+ID_ITERSIZE = 50000
+
+BLOCKED_SQL = """NOT EXISTS (
+    SELECT 1 FROM shared_products_blocklist b
+    WHERE b.product_id = shared_products.id AND b.curator_id = %(curator)s
+)"""
+CHANGED_SQL = "(updated_at > %(since)s OR id = ANY(%(added)s::uuid[]))"
+
+
+class ChainError(ValueError):
+    """The chain on disk is incomplete, inconsistent or does not match the request."""
+
+
+# --- ids ------------------------------------------------------------------------
+
+
+def iter_ids(conn, curator=None, itersize=ID_ITERSIZE):
+    """Current product ids as text, sorted (uuid order is hex text order)."""
+    where = f"WHERE {BLOCKED_SQL} " if curator else ""
+    cur = conn.cursor(name="heys_catalog_ids")
+    cur.itersize = itersize
+    try:
+        cur.execute(f"SELECT id::text FROM shared_products {where}ORDER BY id", {"curator": curator})
+        for (product_id,) in cur:
+            yield product_id
+    finally:
+        cur.close()
+
+
+def read_ids(path):
+    with gzip.open(path, "rt", encoding="ascii") as fp:
+        for line in fp:
+            yield line.rstrip("\n")
+
+
+def diff_ids(previous, current, out, collect_added=True):
+    """
+    Merge two sorted id streams, writing ``current`` to ``out``. Returns
+    ``(added, removed, total)``; ``added`` stays empty without ``collect_added``.
+    """
+    added, removed, total = [], [], 0
+    previous = iter(previous)
+    prev = next(previous, None)
+    for product_id in current:
+        out.write(product_id + "\n")
+        total += 1
+        while prev is not None and prev < product_id:
+            removed.append(prev)
+            prev = next(previous, None)
+        if prev == product_id:
+            prev = next(previous, None)
+        elif collect_added:
+            added.append(product_id)
+    while prev is not None:
+        removed.append(prev)
+        prev = next(previous, None)
+    return added, removed, total
+
+
+# --- manifests ------------------------------------------------------------------
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def latest(directory):
+    """Name of the newest manifest in ``directory``, or None for a new chain."""
+    path = Path(directory) / LATEST
+    return path.read_text(encoding="utf-8").strip() if path.exists() else None
+
+
+def load_manifest(directory, name):
+    path = Path(directory) / f"{name}.manifest.json"
+    if not path.exists():
+        raise ChainError(f"manifest {path} is missing")
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise ChainError(f"{path} is not a {FORMAT} v{FORMAT_VERSION} manifest")
+    return manifest
+
+
+def chain(directory, name=None):
+    """Manifests from the root full export up to ``name`` (default: LATEST)."""
+    name = name or latest(directory)
+    if not name:
+        raise ChainError(f"no exports in {directory}")
+    manifests = [load_manifest(directory, name)]
+    while manifests[-1]["kind"] != "full":
+        manifests.append(load_manifest(directory, manifests[-1]["base"]))
+    return manifests[::-1]
+
+
+def verify(directory, manifest):
+    path = Path(directory) / manifest["data"]
+    if sha256_file(path) != manifest["sha256"]:
+        raise ChainError(f"{path} does not match its manifest (sha256)")
+
+
+# --- export ---------------------------------------------------------------------
+
+
+def export(conn, directory, fields=None, full=False, curator=None, itersize=catalog.ITERSIZE, overlap=OVERLAP):
+    """
+    Append one export to the chain in ``directory``: full when the chain is
+    empty or ``full`` is set, a delta against LATEST otherwise. ``fields``
+    defaults to the base's (a delta must keep them). Returns the manifest.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    base = None if full or not latest(directory) else load_manifest(directory, latest(directory))
+    if base:
+        if fields and tuple(fields) != tuple(base["fields"]):
+            raise ChainError("fields differ from the chain; export with --full to start a new base")
+        if curator != base["curator"]:
+            raise ChainError(f"chain is scoped to curator {base['curator']}; export with --full to change it")
+    fields = tuple(fields or (base["fields"] if base else catalog.DEFAULT_FIELDS))
+
+    catalog.begin_snapshot(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT now()")
+        watermark = cur.fetchone()[0].astimezone(datetime.timezone.utc)
+    kind = "delta" if base else "full"
+    name = f"{kind}-{watermark:%Y%m%dT%H%M%S}Z"
+    if base and name == base["name"]:
+        raise ChainError(f"{name} already exists; exports in the same second")
+
+    ids_path = directory / f"{name}.ids.gz"
+    previous = read_ids(directory / base["ids"]) if base else ()
+    with gzip.open(ids_path, "wt", encoding="ascii") as out:
+        added, removed, total = diff_ids(previous, iter_ids(conn, curator), out, collect_added=bool(base))
+
+    params = {"curator": curator}
+    conditions = [BLOCKED_SQL] if curator else []
+    since = None
+    if base:
+        since = datetime.datetime.fromisoformat(base["watermark"]) - overlap
+        params.update(since=since, added=added)
+        conditions.insert(0, CHANGED_SQL)
+    where = " AND ".join(conditions) or None
+
+    data_path = directory / f"{name}.jsonl.gz"
+    meta = {**catalog.make_meta(total, fields, watermark.date()),
+            "chain": {"kind": kind, "name": name, "base": base and base["name"]}}
+    with catalog.open_output(data_path, gz=True) as fp:
+        products = catalog.write_jsonl(fp, meta, catalog.iter_products(conn, fields, itersize, where, params))
+        for product_id in removed:
+            fp.write(json.dumps({"_deleted": product_id}) + "\n")
+    conn.rollback()
+
+    manifest = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "kind": kind,
+        "name": name,
+        "base": base and base["name"],
+        "root": base["root"] if base else name,
+        "sequence": base["sequence"] + 1 if base else 0,
+        "watermark": watermark.isoformat(),
+        "since": since and since.isoformat(),
+        "curator": curator,
+        "fields": list(fields),
+        "data": data_path.name,
+        "ids": ids_path.name,
+        "sha256": sha256_file(data_path),
+        "products": products,
+        "tombstones": len(removed),
+        "total_products": total,
+    }
+    _write_atomic(directory / f"{name}.manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    _write_atomic(directory / LATEST, name + "\n")
+    return manifest
+
+
+# --- materialize ----------------------------------------------------------------
+
+
+def read_records(directory, manifest):
+    """Products and ``{"_deleted": id}`` records of one export, after its _meta line."""
+    with gzip.open(Path(directory) / manifest["data"], "rt", encoding="utf-8") as fp:
+        next(fp)
+        for line in fp:
+            yield json.loads(line)
+
+
+def merge(base, overrides):
+    """
+    Stream ``base`` (sorted by id) with ``overrides`` applied: ``id -> product``
+    replaces or inserts, ``id -> None`` drops. Output stays in id order.
+    """
+    pending = sorted(overrides)
+    i = 0
+    for product in base:
+        product_id = product["id"]
+        while i < len(pending) and pending[i] < product_id:
+            if overrides[pending[i]] is not None:
+                yield overrides[pending[i]]
+            i += 1
+        if i < len(pending) and pending[i] == product_id:
+            i += 1
+            if overrides[product_id] is not None:
+                yield overrides[product_id]
+            continue
+        yield product
+    for product_id in pending[i:]:
+        if overrides[product_id] is not None:
+            yield overrides[product_id]
+
+
+def materialize(directory, name=None):
+    """``(meta, products)`` of the catalog as of ``name`` (default: LATEST)."""
+    manifests = chain(directory, name)
+    for manifest in manifests:
+        verify(directory, manifest)
+    overrides = {}
+    for manifest in manifests[1:]:
+        for record in read_records(directory, manifest):
+            if "_deleted" in record:
+                overrides[record["_deleted"]] = None
+            else:
+                overrides[record["id"]] = record
+    target = manifests[-1]
+    meta = catalog.make_meta(target["total_products"], target["fields"],
+                             datetime.date.fromisoformat(target["watermark"][:10]))
+    return meta, merge(read_records(directory, manifests[0]), overrides)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("directory")
+    parser.add_argument("command", choices=["log", "materialize"])
+    parser.add_argument("--name", help="manifest to stop at (default: LATEST)")
+    parser.add_argument("-o", "--output", help="materialize: .json, .jsonl[.gz], .npz or .bundle[.gz]")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "log":
+            for m in chain(args.directory, args.name):
+                print(f"{m['sequence']:>4}  {m['name']:<28} watermark={m['watermark']}  "
+                      f"products={m['products']:<7} tombstones={m['tombstones']:<5} total={m['total_products']}")
+            return 0
+
+        if not args.output:
+            parser.error("materialize needs -o/--output")
+        meta, products = materialize(args.directory, args.name)
+        fields = list(meta["field_descriptions"])
+        if args.output.endswith(".npz"):
+            from heys_data import catalog_matrix
+
+            count = catalog_matrix.write_npz(args.output, meta, products, meta["total_products"], fields)
+        elif ".bundle" in args.output:
+            from heys_data import catalog_bundle
+
+            count = catalog_bundle.write_bundle(args.output, meta, products, fields, args.output.endswith(".gz"))
+        else:
+            with catalog.open_output(args.output, args.output.endswith(".gz")) as fp:
+                if ".jsonl" in args.output:
+                    count = catalog.write_jsonl(fp, meta, products)
+                else:
+                    count = catalog.write_json(fp, meta, products)
+    except ChainError as err:
+        print(f"chain error: {err}", file=sys.stderr)
+        return 2
+
+    print(f"Materialized {count} products to {args.output}")
+    if count != meta["total_products"]:
+        print(f"WARNING: manifest counts {meta['total_products']} products", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
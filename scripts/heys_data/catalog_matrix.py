@@ -0,0 +1,231 @@
+"""
+Column-oriented catalog export (NumPy ``.npz``) for vectorized analysis.
+
+Harm / kcal / NOVA audits want whole columns, not a list of dicts re-parsed
+from pretty-printed JSON. ``export_shared_products.py -o catalog.npz`` writes
+every field of the export as one typed array:
+
+    id                      ``S36`` uuid text
+    nutrients, gi, harm     ``float32``, NULL -> NaN
+    nova_group              ``int8``, NULL -> 0 (valid groups are 1-4)
+    is_* flags              ``int8``: 1 / 0, NULL -> -1
+    created_at, updated_at  ``datetime64[ms]``, NULL -> NaT
+    text and JSONB          dictionary-encoded: ``<field>`` holds ``int32``
+                            codes (NULL -> -1), ``<field>.dict_offsets`` /
+                            ``<field>.dict_data`` the distinct UTF-8 values
+
+Nothing needs pickle, so loading is a plain ``np.load`` — the full catalog in
+milliseconds:
+
+    m = catalog_matrix.load("catalog.npz")
+    m.matrix(["protein100", "badFat100"])   # (n, 2) float32
+    m.decode("category")                    # per-row strings
+    m["nova_group"], m.row_index()          # typed column, id -> row
+
+Arrays are preallocated from the snapshot count (:func:`heys_data.catalog.begin_snapshot`)
+and filled as rows stream in.
+"""
+import datetime
+import json
+
+from heys_data import catalog
+
+FORMAT = "heys-catalog-npz"
+FORMAT_VERSION = 1
+META_KEY = "_meta"
+
+FLOAT_FIELDS = frozenset({
+    "simple100", "complex100", "protein100", "badFat100", "goodFat100", "trans100", "fiber100",
+    "gi", "harm", "sodium100", "omega3_100", "omega6_100", "nutrient_density", "kcal100_legacy",
+    "vitamin_a", "vitamin_c", "vitamin_d", "vitamin_e", "vitamin_k", "vitamin_b1", "vitamin_b2",
+    "vitamin_b3", "vitamin_b6", "vitamin_b9", "vitamin_b12",
+    "calcium", "iron", "magnesium", "phosphorus", "potassium", "zinc", "selenium", "iodine",
+})
+FLAG_FIELDS = frozenset({"is_organic", "is_whole_grain", "is_fermented", "is_raw"})
+TIME_FIELDS = frozenset({"created_at", "updated_at"})
+JSON_FIELDS = frozenset({"portions", "additives"})
+
+NULL_NOVA = 0
+NULL_FLAG = -1
+NULL_CODE = -1
+
+
+def kind(field):
+    if field == "id":
+        return "id"
+    if field in FLOAT_FIELDS:
+        return "float"
+    if field == "nova_group":
+        return "nova"
+    if field in FLAG_FIELDS:
+        return "flag"
+    if field in TIME_FIELDS:
+        return "time"
+    return "json" if field in JSON_FIELDS else "text"
+
+
+def _dtypes(np):
+    return {"id": "S36", "float": np.float32, "nova": np.int8, "flag": np.int8,
+            "time": "datetime64[ms]", "text": np.int32, "json": np.int32}
+
+
+def _nulls(np):
+    return {"id": b"", "float": np.nan, "nova": NULL_NOVA, "flag": NULL_FLAG,
+            "time": np.datetime64("NaT"), "text": NULL_CODE, "json": NULL_CODE}
+
+
+class _Dictionary:
+    """Value -> code, codes assigned in first-seen order."""
+
+    def __init__(self, as_json):
+        self.as_json = as_json
+        self.codes = {}
+
+    def code(self, value):
+        if value is None:
+            return NULL_CODE
+        if self.as_json:
+            value = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return self.codes.setdefault(value, len(self.codes))
+
+    def arrays(self, np):
+        data = [value.encode("utf-8") for value in self.codes]
+        offsets = np.zeros(len(data) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(d) for d in data], dtype=np.int64)
+        return offsets, np.frombuffer(b"".join(data), dtype=np.uint8)
+
+
+def _cell(kind_, value, np):
+    if kind_ == "id":
+        return str(value).encode("ascii")
+    if kind_ == "time":
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return np.datetime64(value, "ms")
+    if kind_ == "flag":
+        return 1 if value else 0
+    if kind_ == "float":
+        return float(value)
+    return value
+
+
+def build(products, total, fields=catalog.DEFAULT_FIELDS):
+    """``{array name: ndarray}`` for ``products`` (at most ``total`` rows)."""
+    import numpy as np
+
+    kinds = {f: kind(f) for f in fields}
+    dtypes, nulls = _dtypes(np), _nulls(np)
+    columns = {f: np.full(total, nulls[k], dtype=dtypes[k]) for f, k in kinds.items()}
+    dictionaries = {f: _Dictionary(k == "json") for f, k in kinds.items() if k in ("text", "json")}
+    count = 0
+    for count, product in enumerate(products, 1):
+        if count > total:
+            raise ValueError(f"more than {total} products streamed; the count and rows disagree")
+        row = count - 1
+        for field, kind_ in kinds.items():
+            value = product.get(field)
+            if field in dictionaries:
+                columns[field][row] = dictionaries[field].code(value)
+            elif value is not None:
+                columns[field][row] = _cell(kind_, value, np)
+    arrays = {f: column[:count] for f, column in columns.items()}
+    for field, dictionary in dictionaries.items():
+        arrays[f"{field}.dict_offsets"], arrays[f"{field}.dict_data"] = dictionary.arrays(np)
+    return arrays
+
+
+def pack(meta, products, total, fields=catalog.DEFAULT_FIELDS):
+    """:func:`build` plus the ``_meta`` array — exactly what goes into the file."""
+    import numpy as np
+
+    arrays = build(products, total, fields)
+    meta = {**meta, "total_products": len(arrays[fields[0]]), "format": FORMAT, "version": FORMAT_VERSION,
+            "fields": list(fields), "kinds": {f: kind(f) for f in fields}}
+    arrays[META_KEY] = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+    return arrays
+
+
+def write_npz(path, meta, products, total, fields=catalog.DEFAULT_FIELDS, compressed=False):
+    """Build the columns and save them with ``meta``; returns the number of products."""
+    import numpy as np
+
+    arrays = pack(meta, products, total, fields)
+    (np.savez_compressed if compressed else np.savez)(path, **arrays)
+    return len(arrays[fields[0]])
+
+
+class CatalogMatrix:
+    """A loaded ``.npz`` export; see the module docstring."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.meta = json.loads(arrays[META_KEY].tobytes().decode("utf-8"))
+        if self.meta.get("format") != FORMAT or self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"not a {FORMAT} v{FORMAT_VERSION} file")
+        self.fields = self.meta["fields"]
+        self.kinds = self.meta["kinds"]
+        self._dictionaries = {}
+
+    def __len__(self):
+        return len(self.arrays[self.fields[0]])
+
+    def __getitem__(self, field):
+        return self.arrays[field]
+
+    def dictionary(self, field):
+        """Distinct values of a text/JSONB field, indexed by code (JSONB parsed)."""
+        if field not in self._dictionaries:
+            offsets = self.arrays[f"{field}.dict_offsets"]
+            data = self.arrays[f"{field}.dict_data"].tobytes()
+            values = [data[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+            if self.kinds[field] == "json":
+                values = [json.loads(v) for v in values]
+            self._dictionaries[field] = values
+        return self._dictionaries[field]
+
+    def decode(self, field):
+        """Per-row values of any field as Python objects (NULL -> None)."""
+        column = self.arrays[field]
+        kind_ = self.kinds[field]
+        if kind_ in ("text", "json"):
+            values = self.dictionary(field)
+            return [values[c] if c != NULL_CODE else None for c in column.tolist()]
+        if kind_ == "id":
+            return [v.decode("ascii") for v in column.tolist()]
+        if kind_ == "float":
+            return [None if v != v else v for v in column.tolist()]
+        if kind_ == "time":
+            return column.tolist()  # datetime, NaT -> None
+        null = NULL_NOVA if kind_ == "nova" else NULL_FLAG
+        return [None if v == null else (bool(v) if kind_ == "flag" else v) for v in column.tolist()]
+
+    def float_fields(self):
+        return [f for f in self.fields if self.kinds[f] == "float"]
+
+    def matrix(self, fields=None):
+        """``(rows, len(fields))`` float32 matrix (default: every float field)."""
+        import numpy as np
+
+        fields = fields or self.float_fields()
+        return np.stack([self.arrays[f] for f in fields], axis=1) if fields else np.empty((len(self), 0), np.float32)
+
+    def row_index(self):
+        """``{id: row}``."""
+        return {v.decode("ascii"): row for row, v in enumerate(self.arrays["id"].tolist())}
+
+
+def from_db(conn, fields=catalog.DEFAULT_FIELDS, itersize=catalog.ITERSIZE):
+    """The live catalog as a :class:`CatalogMatrix`, without a file in between."""
+    total = catalog.begin_snapshot(conn)
+    try:
+        return CatalogMatrix(pack(catalog.make_meta(total, fields), catalog.iter_products(conn, fields, itersize),
+                                  total, fields))
+    finally:
+        conn.rollback()
+
+
+def load(path):
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as npz:
+        return CatalogMatrix({name: npz[name] for name in npz.files})
@@ -0,0 +1,282 @@
+"""
+Offline product-name search: a memory-mapped trigram / prefix index file.
+
+``get_shared_products(p_search, ...)`` answers ``name_norm ILIKE '%q%'`` on the
+live DB through ``idx_shared_products_name_trgm``. This compiles the same
+names into one read-only file that edge lookups, offline tools and batch
+matching jobs can query without Postgres:
+
+    cd scripts
+    python3 -m heys_data.catalog_search build catalog.npz -o products.trgm
+    python3 -m heys_data.catalog_search build --db -o products.trgm
+    python3 -m heys_data.catalog_search query products.trgm "творог 5"
+
+    with catalog_search.TrigramIndex.open("products.trgm") as index:
+        for match in index.search("творог 5", limit=10):
+            print(match.id, match.score, match.name)
+
+Names are ``name_norm`` (or ``name``) folded once more — lower case, ``ё`` ->
+``е``, punctuation -> space. Trigrams are pg_trgm's: each word padded as
+``"  word "``, so a query of one or two letters still matches word starts.
+Ranking: whole-name prefix, then substring (the ILIKE hits), then trigram
+similarity ``shared / (query + name - shared)`` like ``similarity()``.
+
+File layout (little endian, sections 8-byte aligned, all arrays used in
+place through ``mmap``; nothing is parsed on open):
+
+    header      magic, version, counts, section offsets (:data:`HEADER`)
+    keys        uint64[trigrams]   three code points, 21 bits each, sorted
+    starts      uint64[trigrams+1] posting list bounds
+    postings    uint32[]           doc numbers, ascending per trigram
+    lengths     uint16[docs]       distinct trigrams per name
+    ids         uint8[docs, 16]    product uuid bytes
+    name_starts uint64[docs+1]     bounds into name_data
+    name_data   utf-8              folded names
+    by_name     uint32[docs]       doc numbers sorted by name (prefix search)
+"""
+import argparse
+import bisect
+import mmap
+import re
+import struct
+import sys
+import uuid
+from dataclasses import dataclass
+
+MAGIC = b"HEYSTRGM"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ9Q")  # magic, version, docs, trigrams, postings, 9 section offsets
+SECTIONS = ("keys", "starts", "postings", "lengths", "ids", "name_starts", "name_data", "by_name", "end")
+
+_NON_WORD = re.compile(r"[^\w%]+")
+CANDIDATES_PER_RESULT = 20
+
+
+def fold(text):
+    """Search normal form: lower case, ``ё`` -> ``е``, single spaces between words."""
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower().replace("ё", "е")).split())
+
+
+def trigrams(text):
+    """pg_trgm-style trigram keys of an already folded string."""
+    keys = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            a, b, c = padded[i:i + 3]
+            keys.add((ord(a) << 42) | (ord(b) << 21) | ord(c))
+    return keys
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def build(path, ids, names):
+    """Write the index for parallel ``ids`` (uuid text) and ``names``; returns doc count."""
+    import numpy as np
+
+    folded = [fold(name) for name in names]
+    doc_keys, doc_numbers, lengths = [], [], []
+    for doc, name in enumerate(folded):
+        keys = trigrams(name)
+        doc_keys.extend(keys)
+        doc_numbers.extend([doc] * len(keys))
+        lengths.append(min(len(keys), 0xFFFF))
+    doc_keys = np.array(doc_keys, dtype=np.uint64)
+    doc_numbers = np.array(doc_numbers, dtype=np.uint32)
+    order = np.lexsort((doc_numbers, doc_keys))
+    doc_keys, postings = doc_keys[order], doc_numbers[order]
+    keys, first = np.unique(doc_keys, return_index=True)
+    starts = np.append(first, len(postings)).astype(np.uint64)
+
+    encoded = [name.encode("utf-8") for name in folded]
+    name_starts = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    name_starts[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+    id_bytes = np.frombuffer(b"".join(uuid.UUID(str(i)).bytes for i in ids), dtype=np.uint8).reshape(-1, 16)
+    by_name = np.array(sorted(range(len(folded)), key=folded.__getitem__), dtype=np.uint32)
+
+    sections = [
+        keys.astype("<u8"), starts.astype("<u8"), postings.astype("<u4"),
+        np.array(lengths, dtype="<u2"), id_bytes, name_starts.astype("<u8"),
+        np.frombuffer(b"".join(encoded), dtype=np.uint8), by_name.astype("<u4"),
+    ]
+    offsets, offset = [], HEADER.size
+    for array in sections:
+        offset = _align(offset)
+        offsets.append(offset)
+        offset += array.nbytes
+    offsets.append(offset)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(folded), len(keys), len(postings), *offsets))
+        for array, at in zip(sections, offsets):
+            f.write(b"\0" * (at - f.tell()))
+            f.write(array.tobytes())
+    return len(folded)
+
+
+@dataclass
+class Match:
+    id: str
+    name: str
+    score: float
+    prefix: bool
+    substring: bool
+
+
+class TrigramIndex:
+    """Read-only view of an index file; arrays are slices of one mmap."""
+
+    def __init__(self, fp):
+        import numpy as np
+
+        self._fp = fp
+        self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.docs, self.trigram_count, postings, *offsets = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            fp.close()
+            raise ValueError(f"not a {MAGIC.decode()} v{VERSION} index")
+        at = dict(zip(SECTIONS, offsets))
+
+        def view(section, dtype, count):
+            return np.frombuffer(self._mm, dtype=dtype, count=count, offset=at[section])
+
+        self.keys = view("keys", "<u8", self.trigram_count)
+        self.starts = view("starts", "<u8", self.trigram_count + 1)
+        self.postings = view("postings", "<u4", postings)
+        self.lengths = view("lengths", "<u2", self.docs)
+        self.ids = view("ids", np.uint8, self.docs * 16).reshape(-1, 16)
+        self.name_starts = view("name_starts", "<u8", self.docs + 1)
+        self.name_data = view("name_data", np.uint8, int(self.name_starts[-1]) if self.docs else 0)
+        self.by_name = view("by_name", "<u4", self.docs)
+
+    @classmethod
+    def open(cls, path):
+        return cls(open(path, "rb"))
+
+    def close(self):
+        # Views must go first: an mmap with exported buffers refuses to close.
+        for attr in ("keys", "starts", "postings", "lengths", "ids", "name_starts", "name_data", "by_name"):
+            setattr(self, attr, None)
+        self._mm.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.docs
+
+    def name(self, doc):
+        return self.name_data[int(self.name_starts[doc]):int(self.name_starts[doc + 1])].tobytes().decode("utf-8")
+
+    def id(self, doc):
+        return str(uuid.UUID(bytes=self.ids[doc].tobytes()))
+
+    def prefix(self, query, limit=20):
+        """Docs whose whole folded name starts with ``query``, in name order."""
+        q = fold(query)
+        lo = bisect.bisect_left(range(self.docs), q, key=lambda i: self.name(int(self.by_name[i])))
+        docs = []
+        for i in range(lo, self.docs):
+            doc = int(self.by_name[i])
+            if not self.name(doc).startswith(q) or len(docs) >= limit:
+                break
+            docs.append(doc)
+        return docs
+
+    def _shared(self, keys):
+        """``(docs, shared trigram counts)`` over the posting lists of ``keys``."""
+        import numpy as np
+
+        keys = np.array(sorted(keys), dtype=np.uint64)
+        at = np.searchsorted(self.keys, keys)
+        found = at < len(self.keys)
+        found[found] = self.keys[at[found]] == keys[found]
+        lists = [self.postings[int(self.starts[i]):int(self.starts[i + 1])] for i in at[found]]
+        if not lists:
+            return np.empty(0, np.uint32), np.empty(0, np.int64)
+        return np.unique(np.concatenate(lists), return_counts=True)
+
+    def search(self, query, limit=20, min_similarity=0.0):
+        """Best ``limit`` matches for ``query``, ranked as in the module docstring."""
+        import numpy as np
+
+        q = fold(query)
+        keys = trigrams(q)
+        if not keys:
+            return []
+        docs, shared = self._shared(keys)
+        similarity = shared / (len(keys) + self.lengths[docs].astype(np.int64) - shared)
+        keep = similarity >= min_similarity
+        docs, shared, similarity = docs[keep], shared[keep], similarity[keep]
+        # Substring hits share most query trigrams but long names dilute their
+        # similarity: take candidates by shared count, then rank.
+        top = np.lexsort((-similarity, -shared))[:max(limit * CANDIDATES_PER_RESULT, 200)]
+        matches = []
+        for doc, score in zip(docs[top].tolist(), similarity[top].tolist()):
+            name = self.name(doc)
+            matches.append(Match(self.id(doc), name, round(score, 4), name.startswith(q), q in name))
+        matches.sort(key=lambda m: (not m.prefix, not m.substring, -m.score, m.name))
+        return matches[:limit]
+
+
+def _load_names(args):
+    from heys_data import catalog_matrix
+
+    if args.db:
+        from heys_data import db
+
+        conn = db.connect()
+        try:
+            m = catalog_matrix.from_db(conn, ("id", "name", "name_norm"))
+        finally:
+            conn.close()
+    else:
+        m = catalog_matrix.load(args.catalog)
+    field = "name_norm" if "name_norm" in m.fields else "name"
+    names = [name or "" for name in m.decode(field)]
+    return m.decode("id"), names, field
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="compile the index from an .npz export or --db")
+    build_cmd.add_argument("catalog", nargs="?", help=".npz from export_shared_products.py")
+    build_cmd.add_argument("--db", action="store_true")
+    build_cmd.add_argument("-o", "--output", required=True)
+    query_cmd = sub.add_parser("query", help="search an index")
+    query_cmd.add_argument("index")
+    query_cmd.add_argument("text")
+    query_cmd.add_argument("--limit", type=int, default=20)
+    query_cmd.add_argument("--prefix", action="store_true", help="whole-name prefix only")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if bool(args.catalog) == args.db:
+            parser.error("pass a .npz file or --db")
+        ids, names, field = _load_names(args)
+        count = build(args.output, ids, names)
+        print(f"Indexed {count} product names ({field}) to {args.output}")
+        return 0
+
+    with TrigramIndex.open(args.index) as index:
+        if args.prefix:
+            for doc in index.prefix(args.text, args.limit):
+                print(f"{index.id(doc)}  {index.name(doc)}")
+        else:
+            for m in index.search(args.text, args.limit):
+                flags = ("P" if m.prefix else "-") + ("S" if m.substring else "-")
+                print(f"{m.score:.3f} {flags}  {m.id}  {m.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
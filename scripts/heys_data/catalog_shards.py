@@ -0,0 +1,199 @@
+"""
+Parallel export of ``shared_products``: one process and connection per id range.
+
+``export_shared_products.py --workers N`` serializes N id ranges at once
+instead of streaming everything through one core:
+
+    python3 scripts/export_shared_products.py --workers 4        # same file as without --workers
+    python3 scripts/export_shared_products.py --workers 8 --shards -o catalog.jsonl.gz
+
+1. The coordinator opens the usual read-only snapshot (:func:`catalog.begin_snapshot`),
+   exports it (``pg_export_snapshot``) and cuts the id space at every
+   ``total / N``-th id (:func:`id_ranges`), so ranges hold equal row counts.
+2. Each worker process connects on its own, joins that snapshot
+   (``SET TRANSACTION SNAPSHOT``, as ``pg_dump -j`` does) and streams its range
+   through :func:`catalog.iter_products`. All shards see one catalog state;
+   the coordinator keeps its transaction open until they finish.
+3. Without ``--shards`` workers write body fragments and the coordinator
+   concatenates them as bytes: the output matches the single-process export
+   (gzip: a multi-member stream, compressed in parallel too). With
+   ``--shards`` every range is a standalone file (with the whole export's
+   ``_meta``) and ``<stem>.shards.json`` lists them (:data:`MANIFEST_FORMAT`):
+
+       {"format", "version", "export_date", "total_products", "fields",
+        "shards": [{"file", "from", "to", "products", "sha256"}, ...]}
+
+   ``from`` is inclusive, ``to`` exclusive, ``null`` = open end.
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from heys_data import catalog
+
+MANIFEST_FORMAT = "heys-catalog-shards"
+MANIFEST_VERSION = 1
+COPY_CHUNK = 1 << 20
+
+
+def id_ranges(conn, total, parts):
+    """``[(from, to), ...]`` cutting ``total`` rows (id order) into ``parts`` near-equal ranges."""
+    bounds = []
+    with conn.cursor() as cur:
+        for k in range(1, min(parts, total)):
+            cur.execute("SELECT id FROM shared_products ORDER BY id OFFSET %s LIMIT 1", (k * total // parts,))
+            row = cur.fetchone()
+            if row and str(row[0]) not in bounds:
+                bounds.append(str(row[0]))
+    edges = [None, *bounds, None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def range_where(lo, hi):
+    """WHERE clause for ``lo <= id < hi`` (``None`` = open end), or ``None`` for all rows."""
+    parts = [sql for bound, sql in ((lo, "id >= %(from)s"), (hi, "id < %(to)s")) if bound is not None]
+    return " AND ".join(parts) or None
+
+
+def split_name(output):
+    """``"dir/catalog.jsonl.gz"`` -> ``("dir/catalog", ".jsonl.gz")``."""
+    path = str(output)
+    name = os.path.basename(path)
+    suffix = "".join(Path(name).suffixes[-2:] if name.endswith(".gz") else Path(name).suffixes[-1:])
+    return path[:len(path) - len(suffix)], suffix
+
+
+def shard_tasks(output, fmt, fields, ranges, snapshot, meta, shards=False, gz=False, indent=2,
+                itersize=catalog.ITERSIZE):
+    """Picklable work items, one per range."""
+    stem, suffix = split_name(output)
+    width = len(str(len(ranges)))
+    tasks = []
+    for n, (lo, hi) in enumerate(ranges, 1):
+        path = f"{stem}.shard-{n:0{width}d}-of-{len(ranges)}{suffix}" if shards else f"{output}.part-{n}"
+        tasks.append({"path": path, "from": lo, "to": hi, "format": fmt, "fields": list(fields),
+                      "snapshot": snapshot, "meta": meta, "standalone": shards, "gzip": gz,
+                      "indent": indent, "itersize": itersize})
+    return tasks
+
+
+def write_shard(conn, task):
+    """Export one range on ``conn`` (inside the shared snapshot); returns ``{"products", "sha256"}``."""
+    catalog.join_snapshot(conn, task["snapshot"])
+    fields, indent = tuple(task["fields"]), task["indent"]
+    products = catalog.iter_products(conn, fields, task["itersize"], range_where(task["from"], task["to"]),
+                                     {"from": task["from"], "to": task["to"]})
+    count = 0
+    try:
+        with catalog.open_output(task["path"], task["gzip"]) as fp:
+            if task["standalone"]:
+                write = catalog.write_jsonl if task["format"] == "jsonl" else catalog.write_json
+                args = () if task["format"] == "jsonl" else (indent,)
+                count = write(fp, task["meta"], products, *args)
+            elif task["format"] == "jsonl":
+                for count, product in enumerate(products, 1):
+                    fp.write(catalog.jsonl_line(product))
+            else:
+                for count, product in enumerate(products, 1):
+                    fp.write(("" if count == 1 else catalog.json_separator(False, indent))
+                             + catalog.json_item(product, indent))
+    finally:
+        conn.rollback()
+    return {"products": count, "sha256": _sha256(task["path"])}
+
+
+def run_shard(task):
+    """Process-pool entry point: own connection, :func:`write_shard`, close."""
+    from heys_data import db
+
+    conn = db.connect()
+    try:
+        return write_shard(conn, task)
+    finally:
+        conn.close()
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def concatenate(output, meta, tasks, results, fmt, gz=False, indent=2):
+    """Join body fragments into ``output`` (byte copies, no re-serialization); removes them."""
+    def encode(text):
+        data = text.encode("utf-8")
+        return gzip.compress(data, 6) if gz else data
+
+    total = 0
+    with open(output, "wb") as out:
+        if fmt == "jsonl":
+            out.write(encode(catalog.jsonl_line({"_meta": meta})))
+        else:
+            out.write(encode(catalog.json_head(meta, indent)))
+        for task, result in zip(tasks, results):
+            if result["products"]:
+                if fmt != "jsonl":
+                    out.write(encode(catalog.json_separator(total == 0, indent)))
+                with open(task["path"], "rb") as part:
+                    for chunk in iter(lambda: part.read(COPY_CHUNK), b""):
+                        out.write(chunk)
+                total += result["products"]
+            os.remove(task["path"])
+        if fmt != "jsonl":
+            out.write(encode(catalog.json_tail(total, indent)))
+    return total
+
+
+def write_manifest(output, meta, fields, tasks, results):
+    stem, _ = split_name(output)
+    manifest = {
+        "format": MANIFEST_FORMAT, "version": MANIFEST_VERSION,
+        "export_date": meta["export_date"], "total_products": meta["total_products"], "fields": list(fields),
+        "shards": [{"file": os.path.basename(t["path"]), "from": t["from"], "to": t["to"], **r}
+                   for t, r in zip(tasks, results)],
+    }
+    path = f"{stem}.shards.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def export(conn, output, fields, fmt="json", workers=2, shards=False, gz=False, indent=2,
+           itersize=catalog.ITERSIZE, run=None):
+    """
+    Parallel export (module docstring); returns ``(products written, manifest
+    path or None)``. ``run(tasks) -> results`` replaces the process pool (tests).
+    """
+    if fmt not in ("json", "jsonl"):
+        raise ValueError(f"--workers exports json or jsonl, not {fmt}")
+    total = catalog.begin_snapshot(conn)
+    try:
+        snapshot = catalog.export_snapshot(conn)
+        meta = catalog.make_meta(total, fields)
+        tasks = shard_tasks(output, fmt, fields, id_ranges(conn, total, workers), snapshot, meta,
+                            shards, gz, indent, itersize)
+        try:
+            if run is None:
+                import multiprocessing
+
+                # spawn: workers must not inherit the coordinator's libpq socket.
+                with multiprocessing.get_context("spawn").Pool(min(workers, len(tasks))) as pool:
+                    results = pool.map(run_shard, tasks, chunksize=1)
+            else:
+                results = run(tasks)
+        except BaseException:
+            for task in tasks:
+                if os.path.exists(task["path"]):
+                    os.remove(task["path"])
+            raise
+    finally:
+        conn.rollback()
+
+    if shards:
+        return sum(r["products"] for r in results), write_manifest(output, meta, fields, tasks, results)
+    return concatenate(output, meta, tasks, results, fmt, gz, indent), None
@@ -0,0 +1,264 @@
+"""
+"Healthier alternative" table: top-k nearest products by nutrient vector.
+
+For every product: products of the same ``category`` with the closest
+nutrient profile and a ``harm`` lower by at least ``min_gain``. Computed once
+from the catalog, served by lookup instead of a scan per meal:
+
+    cd scripts
+    python3 -m heys_data.catalog_substitutes build catalog.npz -o substitutes.npz
+    python3 -m heys_data.catalog_substitutes build --db -k 8 -o substitutes.json
+    python3 -m heys_data.catalog_substitutes query substitutes.npz <product id>
+
+Vectors: the numeric columns of :data:`heys_data.catalog.FIELD_DESCRIPTIONS`
+except ``harm`` (the target). Each column is centred on its median (NULL ->
+median) and divided by its standard deviation, then scaled by
+:data:`WEIGHTS`: macros count most, the 19 % DV columns (0.3 each) together
+weigh about as much as two macros. Distance is Euclidean in that space.
+
+Search is blocked brute force per category: ``|a|^2 + |b|^2 - 2ab`` over row
+blocks of at most :data:`BLOCK_CELLS` distances, ``argpartition`` for top-k.
+Products without category or ``harm`` get no substitutes and are never one.
+
+Table (``.npz``, ``allow_pickle=False``):
+
+    _meta        uint8 JSON: format, version, k, min_gain, weights, source meta
+    ids          S36[n]        product ids, catalog order
+    harm         float16[n]
+    substitutes  int32[n, k]   rows into ``ids``, nearest first, -1 = none
+    distance     float16[n, k]
+
+``-o *.json`` writes ``{"_meta": ..., "substitutes": {id: [id, ...]}}`` for the
+app instead (products without substitutes omitted).
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+
+from heys_data import catalog
+
+FORMAT = "heys-catalog-substitutes"
+FORMAT_VERSION = 1
+K = 5
+MIN_GAIN = 1.0
+BLOCK_CELLS = 1 << 23
+
+MACRO_FIELDS = ("protein100", "simple100", "complex100", "badFat100", "goodFat100", "trans100", "fiber100")
+DV_FIELDS = tuple(f for f in catalog.FIELD_DESCRIPTIONS if f.startswith("vitamin_")) + (
+    "calcium", "iron", "magnesium", "phosphorus", "potassium", "zinc", "selenium", "iodine")
+WEIGHTS = {**{f: 1.0 for f in MACRO_FIELDS}, "gi": 0.5, "sodium100": 0.5, **{f: 0.3 for f in DV_FIELDS}}
+VECTOR_FIELDS = tuple(f for f in catalog.FIELD_DESCRIPTIONS if f in WEIGHTS)
+SUBSTITUTE_FIELDS = ("id", "category", "harm", *VECTOR_FIELDS)
+
+
+def vectors(m, fields=None):
+    """``(rows, fields)`` float32: robust-centred, standardized, weighted; plus the fields used."""
+    import numpy as np
+
+    fields = [f for f in (fields or VECTOR_FIELDS) if f in m.fields]
+    x = m.matrix(fields).astype(np.float64)
+    if not fields or not len(x):
+        return x.astype(np.float32), fields
+    known = ~np.isnan(x)
+    with np.errstate(all="ignore"):
+        median = np.where(known.any(axis=0), np.nanmedian(np.where(known, x, np.nan), axis=0), 0.0)
+        x = np.where(known, x, median) - median
+        std = np.sqrt((x ** 2).mean(axis=0))
+    x /= np.where(std > 0, std, 1.0)
+    x *= np.array([WEIGHTS.get(f, 1.0) for f in fields])
+    return x.astype(np.float32), fields
+
+
+def nearest(x, harm, k=K, min_gain=MIN_GAIN, max_distance=None):
+    """
+    Top-``k`` rows of ``x`` (nearest first, -1 padded) with ``harm`` at least
+    ``min_gain`` below each row's, and their distances. Brute force in blocks.
+    """
+    import numpy as np
+
+    n = len(x)
+    found = np.full((n, k), -1, dtype=np.int32)
+    dist = np.full((n, k), np.inf, dtype=np.float32)
+    if n < 2 or k < 1:
+        return found, dist
+    take = min(k, n)
+    sq = (x.astype(np.float32) ** 2).sum(axis=1)
+    step = max(1, BLOCK_CELLS // n)
+    for lo in range(0, n, step):
+        hi = min(n, lo + step)
+        d = sq[lo:hi, None] + sq[None, :] - 2 * (x[lo:hi] @ x.T)
+        np.maximum(d, 0, out=d)
+        d[harm[None, :] > harm[lo:hi, None] - min_gain] = np.inf  # also drops the row itself
+        if max_distance is not None:
+            d[d > max_distance ** 2] = np.inf
+        top = np.argpartition(d, take - 1, axis=1)[:, :take]
+        top_d = np.take_along_axis(d, top, axis=1)
+        order = np.argsort(top_d, axis=1, kind="stable")
+        top, top_d = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_d, order, axis=1)
+        top[np.isinf(top_d)] = -1
+        found[lo:hi, :take] = top
+        dist[lo:hi, :take] = np.sqrt(top_d)
+    return found, dist
+
+
+def build(m, k=K, min_gain=MIN_GAIN, max_distance=None):
+    """Substitute arrays (module docstring layout) for a :class:`heys_data.catalog_matrix.CatalogMatrix`."""
+    import numpy as np
+
+    n = len(m)
+    x, fields = vectors(m)
+    harm = m["harm"].astype(np.float64)
+    category = m["category"]
+    substitutes = np.full((n, k), -1, dtype=np.int32)
+    distance = np.full((n, k), np.inf, dtype=np.float32)
+    usable = (category >= 0) & ~np.isnan(harm)
+    rows = np.flatnonzero(usable)
+    rows = rows[np.argsort(category[rows], kind="stable")]
+    bounds = np.flatnonzero(np.r_[True, category[rows][1:] != category[rows][:-1], True])
+    for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        group = rows[lo:hi]
+        found, dist = nearest(x[group], harm[group], k, min_gain, max_distance)
+        substitutes[group] = np.where(found >= 0, group[np.maximum(found, 0)], -1)
+        distance[group] = dist
+
+    meta = {
+        "format": FORMAT, "version": FORMAT_VERSION, "k": k, "min_gain": min_gain,
+        "max_distance": max_distance, "fields": fields, "weights": {f: WEIGHTS.get(f, 1.0) for f in fields},
+        "products": n, "with_substitutes": int((substitutes[:, 0] >= 0).sum()),
+        "source": {key: m.meta.get(key) for key in ("export_date", "total_products")},
+    }
+    return {
+        "_meta": np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+        "ids": m["id"],
+        "harm": harm.astype(np.float16),
+        "substitutes": substitutes,
+        "distance": distance.astype(np.float16),
+    }
+
+
+@dataclass
+class Substitute:
+    id: str
+    distance: float
+    harm: float
+    harm_gain: float
+
+
+class SubstituteTable:
+    """A loaded substitutes table; :meth:`lookup` by product id."""
+
+    def __init__(self, arrays):
+        import numpy as np
+
+        self.arrays = arrays
+        self.meta = json.loads(arrays["_meta"].tobytes().decode("utf-8"))
+        if self.meta.get("format") != FORMAT or self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"not a {FORMAT} v{FORMAT_VERSION} file")
+        self.ids = arrays["ids"]
+        self._order = np.argsort(self.ids, kind="stable")
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, product_id):
+        """Row of ``product_id`` or ``None``."""
+        key = str(product_id).encode("ascii")
+        at = int(self.ids.searchsorted(key, sorter=self._order))
+        if at < len(self.ids) and self.ids[self._order[at]] == key:
+            return int(self._order[at])
+        return None
+
+    def lookup(self, product_id):
+        """Substitutes of ``product_id``, nearest first (unknown id -> ``[]``)."""
+        row = self.row(product_id)
+        if row is None:
+            return []
+        harm = self.arrays["harm"]
+        result = []
+        for sub, dist in zip(self.arrays["substitutes"][row].tolist(), self.arrays["distance"][row].tolist()):
+            if sub < 0:
+                break
+            result.append(Substitute(self.ids[sub].decode("ascii"), round(dist, 3), float(harm[sub]),
+                                     round(float(harm[row]) - float(harm[sub]), 2)))
+        return result
+
+
+def write(path, arrays):
+    """``.npz`` table or, for ``*.json``, the id -> [ids] map for the app."""
+    import numpy as np
+
+    if not str(path).endswith(".json"):
+        np.savez_compressed(path, **arrays)
+        return
+    ids = [v.decode("ascii") for v in arrays["ids"].tolist()]
+    substitutes = {
+        ids[row]: [ids[s] for s in subs if s >= 0]
+        for row, subs in enumerate(arrays["substitutes"].tolist()) if subs and subs[0] >= 0
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"_meta": json.loads(arrays["_meta"].tobytes()), "substitutes": substitutes}, f,
+                  ensure_ascii=False, separators=(",", ":"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="compute the table from an .npz export or --db")
+    build_cmd.add_argument("catalog", nargs="?", help=".npz from export_shared_products.py")
+    build_cmd.add_argument("--db", action="store_true")
+    build_cmd.add_argument("-o", "--output", required=True, help=".npz table or .json map")
+    build_cmd.add_argument("-k", type=int, default=K, help="substitutes per product")
+    build_cmd.add_argument("--min-gain", type=float, default=MIN_GAIN, help="required harm decrease")
+    build_cmd.add_argument("--max-distance", type=float, help="drop substitutes further than this")
+    query_cmd = sub.add_parser("query", help="substitutes of one product")
+    query_cmd.add_argument("table")
+    query_cmd.add_argument("id")
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        table = SubstituteTable.load(args.table)
+        if table.row(args.id) is None:
+            print(f"{args.id}: not in the table", file=sys.stderr)
+            return 1
+        for s in table.lookup(args.id):
+            print(f"{s.distance:6.3f}  harm {s.harm:4.1f} (-{s.harm_gain})  {s.id}")
+        return 0
+
+    if bool(args.catalog) == args.db:
+        parser.error("pass a .npz file or --db")
+    if args.min_gain <= 0:
+        parser.error("--min-gain must be positive")
+    from heys_data import catalog_matrix
+
+    if args.db:
+        from heys_data import db
+
+        conn = db.connect()
+        try:
+            m = catalog_matrix.from_db(conn, SUBSTITUTE_FIELDS)
+        finally:
+            conn.close()
+    else:
+        m = catalog_matrix.load(args.catalog)
+    missing = [f for f in ("category", "harm") if f not in m.fields]
+    if missing:
+        parser.error(f"catalog lacks {', '.join(missing)}")
+    arrays = build(m, args.k, args.min_gain, args.max_distance)
+    write(args.output, arrays)
+    meta = json.loads(arrays["_meta"].tobytes())
+    print(f"{meta['with_substitutes']} of {meta['products']} products have substitutes -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
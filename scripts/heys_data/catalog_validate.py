@@ -0,0 +1,300 @@
+"""
+Vectorized validation of the product catalog: every rule in one pass over arrays.
+
+    cd scripts
+    python3 -m heys_data.catalog_validate catalog.npz               # ranked issues
+    python3 -m heys_data.catalog_validate --db --fail-on error      # gate a bulk import
+    python3 -m heys_data.catalog_validate catalog.npz --json issues.json --top 0
+
+Rules work on whole columns of a :class:`heys_data.catalog_matrix.CatalogMatrix`
+(``.npz`` export, or ``--db`` straight from Postgres) instead of one SQL
+fix-up at a time; the full catalog validates in tens of milliseconds.
+
+    negative_values     any nutrient < 0
+    macro_sum           protein + carbs + fats > 100 g per 100 g
+    sodium_above_salt   sodium100 above pure salt (38 758 mg)
+    kcal_mismatch       kcal100_legacy vs protein*3 + carbs*4 + fat*9
+                        (the TEF-aware formula of shared_products_kcal_audit)
+    out_of_range        gi outside 0-100, harm outside 0-10, nova_group not 1-4
+    dv_outliers         vitamin/mineral %DV far from its category: modified
+                        z-score 0.6745 * (x - median) / MAD > 3.5 (Iglewicz-Hoaglin;
+                        mean absolute deviation when MAD is 0)
+    nova_vs_additives   NOVA 1-2 with E-additives; additives without a NOVA group
+
+Issues are ranked by severity, then by how far past the threshold they are.
+Rules whose fields are not in the matrix are reported as skipped (``additives``
+and ``kcal100_legacy`` are not in the default export; ``--db`` loads them).
+Exit code: 1 when an issue at or above ``--fail-on`` was found.
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+from dataclasses import dataclass
+
+from heys_data import catalog
+
+ERROR, WARN, INFO = "error", "warn", "info"
+SEVERITY_RANK = {ERROR: 3, WARN: 2, INFO: 1}
+
+MACRO_FIELDS = ("protein100", "simple100", "complex100", "badFat100", "goodFat100", "trans100")
+DV_FIELDS = ("vitamin_a", "vitamin_c", "vitamin_d", "vitamin_e", "vitamin_k", "vitamin_b1", "vitamin_b2",
+             "vitamin_b3", "vitamin_b6", "vitamin_b9", "vitamin_b12",
+             "calcium", "iron", "magnesium", "phosphorus", "potassium", "zinc", "selenium", "iodine")
+VALIDATION_FIELDS = (*catalog.DEFAULT_FIELDS, "additives", "kcal100_legacy")
+
+MACRO_TOLERANCE = 0.5          # g, rounding on labels
+SALT_SODIUM_MG = 38758         # mg sodium in 100 g NaCl
+KCAL_ABS_TOLERANCE = 20.0      # kcal
+KCAL_REL_TOLERANCE = 0.10
+RANGES = {"gi": (0, 100), "harm": (0, 10)}
+ROBUST_Z = 3.5
+MIN_GROUP = 8                  # non-null values a category needs for dv_outliers
+
+
+@dataclass
+class Rule:
+    name: str
+    func: object
+    severity: str
+    needs: tuple
+
+
+@dataclass
+class Hits:
+    """Rows one rule flagged: ``score`` ranks them, ``values`` fill ``template``."""
+    rows: object
+    scores: object
+    template: str
+    values: tuple = ()
+    severity: str = None
+
+
+@dataclass
+class Issue:
+    id: str
+    name: str
+    rule: str
+    severity: str
+    score: float
+    message: str
+
+    def as_dict(self):
+        return {"id": self.id, "name": self.name, "rule": self.rule, "severity": self.severity,
+                "score": self.score, "message": self.message}
+
+
+RULES = []
+
+
+def rule(severity, *needs):
+    """Register ``func(m, np) -> iterable of Hits``; skipped unless ``needs`` are loaded."""
+    def register(func):
+        RULES.append(Rule(func.__name__, func, severity, needs))
+        return func
+    return register
+
+
+def _hits(np, mask, scores, template, *values, severity=None):
+    rows = np.flatnonzero(mask)
+    return Hits(rows, scores[rows], template, tuple(v[rows] for v in values), severity)
+
+
+def _zeros(np, m, fields):
+    """Columns summed with NULL as 0 (missing macros are not an error here)."""
+    return np.nansum(m.matrix(list(fields)).astype(np.float64), axis=1)
+
+
+@rule(ERROR)
+def negative_values(m, np):
+    for field in m.float_fields():
+        column = m[field]
+        with np.errstate(invalid="ignore"):
+            yield _hits(np, column < 0, -column, f"{field} = {{:g}}", column)
+
+
+@rule(ERROR, *MACRO_FIELDS)
+def macro_sum(m, np):
+    total = _zeros(np, m, MACRO_FIELDS)
+    yield _hits(np, total > 100 + MACRO_TOLERANCE, total - 100, "macros {:.1f} g per 100 g", total)
+
+
+@rule(ERROR, "sodium100")
+def sodium_above_salt(m, np):
+    sodium = m["sodium100"]
+    with np.errstate(invalid="ignore"):
+        yield _hits(np, sodium > SALT_SODIUM_MG, sodium / SALT_SODIUM_MG, "sodium100 {:.0f} mg > pure salt", sodium)
+
+
+@rule(WARN, "kcal100_legacy", *MACRO_FIELDS)
+def kcal_mismatch(m, np):
+    protein = np.nan_to_num(m["protein100"])
+    carbs = _zeros(np, m, ("simple100", "complex100"))
+    fats = _zeros(np, m, ("badFat100", "goodFat100", "trans100"))
+    computed = protein * 3 + carbs * 4 + fats * 9
+    legacy = m["kcal100_legacy"].astype(np.float64)
+    diff = np.abs(legacy - computed)
+    limit = np.maximum(KCAL_ABS_TOLERANCE, computed * KCAL_REL_TOLERANCE)
+    with np.errstate(invalid="ignore"):
+        yield _hits(np, diff > limit, diff / limit, "kcal100_legacy {:.0f} vs {:.0f} from macros", legacy, computed)
+
+
+@rule(WARN)
+def out_of_range(m, np):
+    for field, (lo, hi) in RANGES.items():
+        if field in m.fields:
+            column = m[field]
+            with np.errstate(invalid="ignore"):
+                outside = (column < lo) | (column > hi)
+            scores = np.maximum(lo - column, column - hi) / (hi - lo)
+            yield _hits(np, outside, scores, f"{field} {{:g}} outside {lo}-{hi}", column)
+    if "nova_group" in m.fields:
+        nova = m["nova_group"]
+        yield _hits(np, nova > 4, nova.astype(np.float64), "nova_group {} not 1-4", nova)
+
+
+def _groups(np, codes):
+    """``(code, rows)`` per non-NULL dictionary code."""
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    values, starts = np.unique(sorted_codes, return_index=True)
+    for code, rows in zip(values, np.split(order, starts[1:])):
+        if code >= 0:
+            yield code, rows
+
+
+@rule(WARN, "category")
+def dv_outliers(m, np):
+    categories = m.dictionary("category")
+    fields = [f for f in DV_FIELDS if f in m.fields]
+    if not fields:
+        return
+    matrix = m.matrix(fields).astype(np.float64)
+    for code, rows in _groups(np, m["category"]):
+        if len(rows) < MIN_GROUP:
+            continue
+        values = matrix[rows]
+        counts = np.sum(~np.isnan(values), axis=0)
+        with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NULL columns
+            median = np.nanmedian(values, axis=0)
+            deviation = np.abs(values - median)
+            mad = np.nanmedian(deviation, axis=0)
+            # MAD is 0 when most of a category shares one value (often 0%);
+            # Iglewicz-Hoaglin fall back to the mean absolute deviation then.
+            scale = np.where(mad > 0, mad / 0.6745, np.nanmean(deviation, axis=0) * 1.253314)
+            z = (values - median) / scale
+        for j, field in enumerate(fields):
+            if counts[j] < MIN_GROUP or not scale[j] > 0:
+                continue
+            with np.errstate(invalid="ignore"):
+                flagged = np.abs(z[:, j]) > ROBUST_Z
+            hits = _hits(np, flagged, np.abs(z[:, j]),
+                         f"{field} {{:.0f}}% DV, {categories[code]} median {median[j]:.0f}% (z={{:.1f}})",
+                         values[:, j], z[:, j])
+            hits.rows = rows[hits.rows]
+            yield hits
+
+
+@rule(WARN, "nova_group", "additives")
+def nova_vs_additives(m, np):
+    lengths = np.array([len(v or ()) for v in m.dictionary("additives")] + [0], dtype=np.int64)
+    additives = lengths[m["additives"]]  # NULL code -1 -> the trailing 0
+    nova = m["nova_group"]
+    yield _hits(np, (nova >= 1) & (nova <= 2) & (additives > 0), additives.astype(np.float64),
+                "NOVA {} with {} additive(s)", nova, additives)
+    yield _hits(np, (nova == 0) & (additives > 0), additives.astype(np.float64),
+                "no NOVA group but {} additive(s): 3-4 likely", additives, severity=INFO)
+
+
+def validate(m, limit=None):
+    """
+    ``(issues, {rule: count}, [skipped rules])``: the worst ``limit`` issues
+    (default all), ranked by severity, score, then catalog (id) order. Ranking
+    runs on arrays; only the returned issues are formatted.
+    """
+    import numpy as np
+
+    found, counts, skipped = [], {}, []
+    for r in RULES:
+        if any(field not in m.fields for field in r.needs):
+            skipped.append(r.name)
+            continue
+        counts[r.name] = 0
+        for hits in r.func(m, np):
+            if len(hits.rows):
+                counts[r.name] += len(hits.rows)
+                found.append((r.name, hits.severity or r.severity, hits))
+    if not found:
+        return [], counts, skipped
+
+    ranks = np.concatenate([np.full(len(h.rows), SEVERITY_RANK[sev]) for _, sev, h in found])
+    scores = np.concatenate([np.asarray(h.scores, dtype=np.float64) for _, _, h in found])
+    rows = np.concatenate([h.rows for _, _, h in found])
+    which = np.concatenate([np.full(len(h.rows), n) for n, (_, _, h) in enumerate(found)])
+    offsets = np.cumsum([0] + [len(h.rows) for _, _, h in found])
+    order = np.lexsort((rows, -scores, -ranks))[:limit]
+
+    names = m.dictionary("name") if "name" in m.fields else None
+    issues = []
+    for i in order.tolist():
+        name, severity, hits = found[which[i]]
+        at, row = i - offsets[which[i]], int(rows[i])
+        code = m["name"][row] if names else -1
+        issues.append(Issue(
+            m["id"][row].decode("ascii"), names[code] if code >= 0 else "", name, severity,
+            round(float(scores[i]), 3), hits.template.format(*(v[at].item() for v in hits.values)),
+        ))
+    return issues, counts, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("catalog", nargs="?", help=".npz from export_shared_products.py")
+    parser.add_argument("--db", action="store_true", help="load the live catalog instead of a file")
+    parser.add_argument("--top", type=int, default=50, help="issues printed (0: all)")
+    parser.add_argument("--json", metavar="PATH", help="write every issue and the per-rule counts")
+    parser.add_argument("--fail-on", choices=[ERROR, WARN, INFO], default=ERROR)
+    args = parser.parse_args(argv)
+    if bool(args.catalog) == args.db:
+        parser.error("pass a .npz file or --db")
+
+    from heys_data import catalog_matrix
+
+    started = time.perf_counter()
+    if args.db:
+        from heys_data import db
+
+        conn = db.connect()
+        try:
+            m = catalog_matrix.from_db(conn, VALIDATION_FIELDS)
+        finally:
+            conn.close()
+    else:
+        m = catalog_matrix.load(args.catalog)
+    loaded = time.perf_counter()
+    issues, counts, skipped = validate(m, None if args.json else args.top or None)
+    elapsed_ms = round((time.perf_counter() - loaded) * 1000, 1)
+    total = sum(counts.values())
+
+    for issue in issues[:args.top or None]:
+        print(f"{issue.severity:<5} {issue.rule:<18} {issue.score:>8.2f}  {issue.id}  {issue.name}: {issue.message}")
+    print(f"{total} issue(s) in {len(m)} products "
+          f"(load {round((loaded - started) * 1000, 1)} ms, validate {elapsed_ms} ms)", file=sys.stderr)
+    for name, count in counts.items():
+        print(f"  {name:<18} {count}", file=sys.stderr)
+    if skipped:
+        print(f"  skipped (fields not loaded): {', '.join(skipped)}", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"products": len(m), "validate_ms": elapsed_ms, "counts": counts, "skipped": skipped,
+                       "issues": [i.as_dict() for i in issues]}, f, ensure_ascii=False, indent=2)
+    threshold = SEVERITY_RANK[args.fail_on]
+    return 1 if issues and SEVERITY_RANK[issues[0].severity] >= threshold else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
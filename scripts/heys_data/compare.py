@@ -0,0 +1,159 @@
+"""
+Backup-vs-DB comparison engine.
+
+The DB side is fetched with ONE query per client batch — meal counts for every
+``heys_dayv2_*`` key of the requested clients — instead of one SELECT per date.
+The diff itself is a plain dict join in memory and reports both directions:
+
+    missing_in_db       day is in the backup but not in client_kv_store
+    missing_in_backup   day is in client_kv_store but not in the backup ("extra")
+    mismatched          present on both sides with different meal counts
+"""
+from dataclasses import dataclass, field
+
+from heys_data.days import DAY_KEY_LIKE, day_date, day_key, meal_count
+
+# CASE guards against legacy rows where `meals` is not an array —
+# jsonb_array_length() would abort the whole query on them.
+_MEAL_COUNT_EXPR = (
+    "CASE WHEN jsonb_typeof(v->'meals') = 'array' "
+    "THEN jsonb_array_length(v->'meals') ELSE 0 END"
+)
+
+DB_MEAL_COUNTS_SQL = f"""
+    SELECT client_id::text, k, {_MEAL_COUNT_EXPR}
+    FROM client_kv_store
+    WHERE client_id = ANY(%(client_ids)s::uuid[])
+      AND k LIKE %(like)s
+      AND k >= %(k_from)s AND k <= %(k_to)s
+    ORDER BY client_id
+"""
+
+
+@dataclass
+class DayDiff:
+    """Per-client comparison result; dates are 'YYYY-MM-DD' strings."""
+
+    client_id: str
+    matched: list = field(default_factory=list)
+    empty: list = field(default_factory=list)
+    missing_in_db: list = field(default_factory=list)
+    missing_in_backup: list = field(default_factory=list)
+    mismatched: list = field(default_factory=list)  # (date, backup_meals, db_meals)
+    counts: dict = field(default_factory=dict, repr=False)  # date -> (backup, db)
+
+    @property
+    def ok(self):
+        return not (self.missing_in_db or self.missing_in_backup or self.mismatched)
+
+    @property
+    def dates_to_fix(self):
+        """Dates the backup can repair (missing in DB or with different meals)."""
+        return sorted(self.missing_in_db + [d for d, _, _ in self.mismatched])
+
+    def as_dict(self):
+        return {
+            "client_id": self.client_id,
+            "matched": len(self.matched),
+            "empty": len(self.empty),
+            "missing_in_db": self.missing_in_db,
+            "missing_in_backup": self.missing_in_backup,
+            "mismatched": [
+                {"date": d, "backup_meals": b, "db_meals": m} for d, b, m in self.mismatched
+            ],
+        }
+
+
+def _key_bounds(since, until):
+    # Day keys sort lexicographically by date, so a date range is a key range.
+    return day_key(since or "0000-00-00"), day_key(until or "9999-99-99")
+
+
+def _in_range(date, since, until):
+    return (since is None or date >= since) and (until is None or date <= until)
+
+
+def backup_meal_counts(days, since=None, until=None):
+    """Reduce ``(key_or_date, day)`` pairs to ``{date: meal_count}``."""
+    counts = {}
+    for key, day in days:
+        date = day_date(key)
+        if date and _in_range(date, since, until):
+            counts[date] = meal_count(day)
+    return counts
+
+
+def iter_db_meal_counts(conn, client_ids, since=None, until=None, itersize=5000):
+    """
+    Yield ``(client_id, {date: meal_count})`` for each client that has day rows.
+
+    Uses a server-side (named) cursor so auditing many clients streams rows
+    instead of materialising the whole result set; rows arrive ordered by
+    client, so only one client's counts are held at a time.
+    """
+    k_from, k_to = _key_bounds(since, until)
+    cur = conn.cursor(name="heys_compare_meal_counts")
+    cur.itersize = itersize
+    try:
+        cur.execute(
+            DB_MEAL_COUNTS_SQL,
+            {"client_ids": list(client_ids), "like": DAY_KEY_LIKE, "k_from": k_from, "k_to": k_to},
+        )
+        current, counts = None, {}
+        for client_id, key, meals in cur:
+            if client_id != current:
+                if current is not None:
+                    yield current, counts
+                current, counts = client_id, {}
+            date = day_date(key)
+            if date:
+                counts[date] = meals
+        if current is not None:
+            yield current, counts
+    finally:
+        cur.close()
+
+
+def fetch_db_meal_counts(conn, client_id, since=None, until=None):
+    """``{date: meal_count}`` for a single client — one round trip."""
+    for _, counts in iter_db_meal_counts(conn, [client_id], since, until):
+        return counts
+    return {}
+
+
+def diff_meal_counts(client_id, backup_counts, db_counts):
+    """Join two ``{date: meal_count}`` maps into a :class:`DayDiff`."""
+    diff = DayDiff(client_id)
+    for date in sorted(backup_counts.keys() | db_counts.keys()):
+        backup_meals = backup_counts.get(date)
+        db_meals = db_counts.get(date)
+        diff.counts[date] = (backup_meals, db_meals)
+        if db_meals is None:
+            diff.missing_in_db.append(date)
+        elif backup_meals is None:
+            diff.missing_in_backup.append(date)
+        elif backup_meals != db_meals:
+            diff.mismatched.append((date, backup_meals, db_meals))
+        elif backup_meals == 0:
+            diff.empty.append(date)
+        else:
+            diff.matched.append(date)
+    return diff
+
+
+def compare_clients(conn, backups, since=None, until=None):
+    """
+    Compare many clients at once.
+
+    ``backups`` maps client_id -> ``{date: meal_count}`` (see
+    :func:`backup_meal_counts`). Yields one :class:`DayDiff` per client, in
+    client_id order; clients without any DB rows get an all-missing diff.
+    """
+    db_iter = iter_db_meal_counts(conn, sorted(backups), since, until)
+    db_client, db_counts = next(db_iter, (None, None))
+    for client_id in sorted(backups):
+        # Both sides are ordered by client_id: merge-join instead of buffering.
+        while db_client is not None and db_client < client_id:
+            db_client, db_counts = next(db_iter, (None, None))
+        counts = db_counts if db_client == client_id else {}
+        yield diff_meal_counts(client_id, backups[client_id], counts)
@@ -0,0 +1,592 @@
+"""
+Columnar day tables: ``heys_dayv2_*`` documents flattened for fleet analytics.
+
+Offline reports and model training want "kcal and macros per client-day for
+the whole fleet", not one JSON document at a time. ``extract`` walks every day
+row of ``client_kv_store`` — client_id partitions on parallel connections, as
+:mod:`heys_data.fleet_scan` does, decrypted server-side when
+HEYS_ENCRYPTION_KEY is set — and flattens the documents into one ``.npz`` of
+typed arrays:
+
+    days    client (int32 code into ``clients``), date (datetime64[D]), meals,
+            trainings (int16, performed only), weight (weightMorning), steps,
+            sleep_hours (night span + nap, as the app shows it),
+            water_ml, training_min (float32, missing -> NaN)
+    items   item_day (row in days), item_product / item_origin (int32 codes
+            into ``products``: product_id and shared_origin_id, -1 = none),
+            item_grams, item_inline (items x INLINE_FIELDS float32: the
+            nutrient snapshot the app stores in every item, missing -> NaN)
+
+Only the item array (``jsonb_path_query_array``) and a few scalars leave the
+server. ``totals`` joins the items to a catalog matrix
+(:mod:`heys_data.catalog_matrix`) by product_id, then shared_origin_id, with
+the item's own snapshot as the fallback, and sums per day and per date with
+``np.bincount`` — seconds for millions of items, no database needed:
+
+    cd scripts
+    python3 -m heys_data.day_columns extract --since 2026-01-01 -o days.npz
+    python3 -m heys_data.day_columns totals days.npz --catalog catalog.npz \\
+        --daily daily.csv -o day_totals.npz
+
+kcal are counted like the app (NET Atwater, ``computeTefKcal100``):
+3 x protein + 4 x carbs + 9 x fat, with carbs = simple + complex and
+fat = bad + good + trans when the totals are missing. Catalog ``kcal100`` is
+raw and never used; an item's own ``kcal100`` is already TEF-adjusted.
+"""
+import argparse
+import csv
+import json
+import math
+import re
+import sys
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from heys_data.days import DAY_KEY_LIKE, day_date, day_key
+
+FORMAT = "heys-day-columns"
+TOTALS_FORMAT = "heys-day-totals"
+FORMAT_VERSION = 1
+ITERSIZE = 2000
+
+NUTRIENTS = ("kcal", "protein", "carbs", "simple", "fat", "badFat", "trans", "fiber", "sodium")
+INLINE_FIELDS = ("kcal100", "protein100", "carbs100", "fat100", "simple100", "complex100",
+                 "badFat100", "goodFat100", "trans100", "fiber100", "sodium100")
+CATALOG_FIELDS = ("protein100", "simple100", "complex100", "badFat100", "goodFat100", "trans100", "fiber100")
+DAY_FLOAT_FIELDS = ("weight", "steps", "sleep_hours", "water_ml", "training_min")
+DAILY_MEANS = ("kcal", "protein", "carbs", "fat", "fiber", "weight", "steps", "sleep_hours")
+
+SOURCE_NONE, SOURCE_CATALOG, SOURCE_INLINE = 0, 1, 2
+NOT_PERFORMED = ("assigned", "skipped", "moved")  # NOT_PERFORMED_PLAN_STATUSES in the app
+
+EXTRACT_SQL = """
+    SELECT client_id::text, k,
+           CASE WHEN jsonb_typeof(d.doc->'meals') = 'array' THEN jsonb_array_length(d.doc->'meals') ELSE 0 END,
+           jsonb_path_query_array(d.doc, '$.meals[*].items[*]'),
+           d.doc->'trainings', d.doc->'weightMorning', d.doc->'steps', d.doc->'sleepHours',
+           d.doc->>'sleepStart', d.doc->>'sleepEnd', d.doc->'waterMl', d.doc->'daySleepMinutes',
+           v_encrypted IS NOT NULL AND d.doc = '{{}}'::jsonb
+    FROM client_kv_store
+    CROSS JOIN LATERAL (SELECT {doc} AS doc) d
+    WHERE client_id BETWEEN %(lo)s::uuid AND %(hi)s::uuid
+      AND k LIKE %(like)s
+      AND k >= %(k_from)s AND k <= %(k_to)s
+    ORDER BY client_id, k
+"""
+
+_NAN = float("nan")
+_CLOCK = re.compile(r"(\d{1,2}):(\d{2})", re.ASCII)
+
+
+def number(value):
+    """JSON number or numeric string (``"72,4"`` too) -> float; anything else -> NaN."""
+    if isinstance(value, bool):
+        return _NAN
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip().replace(",", "."))
+        except ValueError:
+            return _NAN
+    return _NAN
+
+
+def _minutes(clock):
+    """``H:MM`` / ``HH:MM`` -> minutes since midnight; None otherwise, like the app's ``normalizeTime``."""
+    match = _CLOCK.fullmatch(clock.strip()) if isinstance(clock, str) else None
+    if match is None:
+        return None
+    hours, minutes = int(match[1]), int(match[2])
+    return hours * 60 + minutes if hours <= 23 and minutes <= 59 else None
+
+
+def sleep_hours(hours, start=None, end=None, nap_minutes=None):
+    """
+    Like the app (``totalSleepHours(day) ?? day.sleepHours``): the
+    ``sleepStart``..``sleepEnd`` span across midnight plus the
+    ``daySleepMinutes`` nap, rounded to 0.1 h; ``sleepHours`` only when the
+    times are missing or not valid ``HH:MM`` (NaN if that is missing too).
+    """
+    start, end = _minutes(start), _minutes(end)
+    if start is None or end is None:
+        value = number(hours)
+        return value if value >= 0 else _NAN
+    span = (end - start) % 1440
+    nap = number(nap_minutes)
+    nap = math.floor(nap + 0.5) if nap > 0 else 0
+    return _round1(_round1(span / 60) + nap / 60)
+
+
+def _round1(value):
+    return math.floor(value * 10 + 0.5) / 10  # Math.round, not banker's rounding
+
+
+def performed(training):
+    """False for a curator's plan the client has not done (``plan.status`` in NOT_PERFORMED)."""
+    plan = training.get("plan")
+    return not (isinstance(plan, dict) and plan.get("status") in NOT_PERFORMED)
+
+
+def training_minutes(trainings):
+    """
+    ``(count, minutes)`` of performed trainings; minutes are the 4 pulse-zone
+    minutes ``z``, else ``duration``.
+    """
+    count, total = 0, 0.0
+    for training in trainings if isinstance(trainings, list) else ():
+        if not isinstance(training, dict) or not performed(training):
+            continue
+        count += 1
+        zones = training.get("z")
+        if isinstance(zones, list):
+            total += sum(v for v in map(number, zones) if v > 0)
+        else:
+            duration = number(training.get("duration"))
+            total += duration if duration > 0 else 0.0
+    return count, total
+
+
+class Builder:
+    """Appends day rows to flat buffers; :meth:`arrays` turns them into NumPy columns."""
+
+    def __init__(self):
+        self.clients, self._clients = [], {}
+        self.products, self._products = [], {}
+        self.client = array("i")
+        self.dates = []
+        self.meals = array("h")
+        self.trainings = array("h")
+        self.day_floats = {f: array("f") for f in DAY_FLOAT_FIELDS}
+        self.item_day = array("i")
+        self.item_product = array("i")
+        self.item_origin = array("i")
+        self.item_grams = array("f")
+        self.item_inline = array("f")
+        self.hidden = 0
+
+    def _code(self, codes, values, value):
+        if value is None or value == "":
+            return -1
+        value = str(value)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def add(self, client_id, date, meals=0, items=(), trainings=None, weight=None, steps=None,
+            sleep=None, sleep_start=None, sleep_end=None, water=None, nap=None):
+        """One day: ``items`` is the flat list of its meal items."""
+        row = len(self.dates)
+        self.client.append(self._code(self._clients, self.clients, client_id))
+        self.dates.append(date)
+        self.meals.append(min(meals or 0, 32767))
+        count, minutes = training_minutes(trainings)
+        self.trainings.append(min(count, 32767))
+        floats = self.day_floats
+        floats["weight"].append(number(weight))
+        floats["steps"].append(number(steps))
+        floats["sleep_hours"].append(sleep_hours(sleep, sleep_start, sleep_end, nap))
+        floats["water_ml"].append(number(water))
+        floats["training_min"].append(minutes)
+        for item in items if isinstance(items, list) else ():
+            if not isinstance(item, dict):
+                continue
+            product = item.get("product_id")
+            self.item_day.append(row)
+            self.item_product.append(self._code(self._products, self.products,
+                                                product if product is not None else item.get("productId")))
+            self.item_origin.append(self._code(self._products, self.products, item.get("shared_origin_id")))
+            self.item_grams.append(number(item.get("grams")))
+            self.item_inline.extend(number(item.get(f)) for f in INLINE_FIELDS)
+
+    def add_document(self, client_id, key, doc):
+        """A whole day document (backups, tests); returns False for non-day keys."""
+        date = day_date(key)
+        if date is None or not isinstance(doc, dict):
+            return False
+        meals = doc.get("meals") if isinstance(doc.get("meals"), list) else []
+        items = [item for meal in meals if isinstance(meal, dict) and isinstance(meal.get("items"), list)
+                 for item in meal["items"]]
+        self.add(client_id, date, len(meals), items, doc.get("trainings"), doc.get("weightMorning"),
+                 doc.get("steps"), doc.get("sleepHours"), doc.get("sleepStart"), doc.get("sleepEnd"),
+                 doc.get("waterMl"), doc.get("daySleepMinutes"))
+        return True
+
+    def arrays(self):
+        import numpy as np
+
+        arrays = {
+            "clients": np.array(self.clients, dtype="S36"),
+            "products": np.array(self.products, dtype=str),
+            "client": np.frombuffer(self.client, np.int32).copy(),
+            "date": np.array(self.dates, dtype="datetime64[D]"),
+            "meals": np.frombuffer(self.meals, np.int16).copy(),
+            "trainings": np.frombuffer(self.trainings, np.int16).copy(),
+            "item_day": np.frombuffer(self.item_day, np.int32).copy(),
+            "item_product": np.frombuffer(self.item_product, np.int32).copy(),
+            "item_origin": np.frombuffer(self.item_origin, np.int32).copy(),
+            "item_grams": np.frombuffer(self.item_grams, np.float32).copy(),
+            "item_inline": np.frombuffer(self.item_inline, np.float32).reshape(-1, len(INLINE_FIELDS)).copy(),
+        }
+        for field, values in self.day_floats.items():
+            arrays[field] = np.frombuffer(values, np.float32).copy()
+        return arrays
+
+
+def _recode(codes, values, local):
+    """Map a part's dictionary onto the merged one; index ``-1`` stays ``-1``."""
+    import numpy as np
+
+    mapping = []
+    for value in local.tolist():
+        value = value.decode("ascii") if isinstance(value, bytes) else value
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        mapping.append(codes[value])
+    return np.array(mapping + [-1], dtype=np.int32)
+
+
+def concat(parts):
+    """Merge :meth:`Builder.arrays` of several partitions into one set of columns."""
+    import numpy as np
+
+    clients, client_codes, products, product_codes = [], {}, [], {}
+    merged, offset = {}, 0
+    for part in parts:
+        client_map = _recode(client_codes, clients, part["clients"])
+        product_map = _recode(product_codes, products, part["products"])
+        part = dict(part, client=client_map[part["client"]], item_day=part["item_day"] + offset,
+                    item_product=product_map[part["item_product"]], item_origin=product_map[part["item_origin"]])
+        offset += len(part["date"])
+        for name, values in part.items():
+            if name not in ("clients", "products"):
+                merged.setdefault(name, []).append(values)
+    if not merged:
+        return Builder().arrays()
+    arrays = {name: np.concatenate(values) for name, values in merged.items()}
+    arrays["clients"] = np.array(clients, dtype="S36")
+    arrays["products"] = np.array(products, dtype=str)
+    return arrays
+
+
+def pack(arrays, **meta):
+    """Columns plus the ``_meta`` header (format, counts, extraction options)."""
+    import numpy as np
+
+    meta = {"format": FORMAT, "version": FORMAT_VERSION, "days": len(arrays["date"]),
+            "items": len(arrays["item_day"]), "clients": len(arrays["clients"]),
+            "inline_fields": list(INLINE_FIELDS), **meta}
+    return {"_meta": np.frombuffer(json.dumps(meta).encode("utf-8"), np.uint8), **arrays}
+
+
+class DayColumns:
+    """A loaded ``extract`` file; see the module docstring."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.meta = json.loads(arrays["_meta"].tobytes().decode("utf-8"))
+        if self.meta.get("format") != FORMAT or self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"not a {FORMAT} v{FORMAT_VERSION} file")
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def __len__(self):
+        return len(self.arrays["date"])
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+def _sum_present(*columns):
+    """Element-wise sum ignoring NaN; NaN only where every column is NaN."""
+    import numpy as np
+
+    stacked = np.stack(columns)
+    return np.where(np.isnan(stacked).all(axis=0), np.nan, np.nansum(stacked, axis=0))
+
+
+def tef(protein, carbs, fat):
+    """NET Atwater kcal; a missing macro counts as 0, NaN only when all three are missing."""
+    import numpy as np
+
+    kcal = 3 * np.nan_to_num(protein) + 4 * np.nan_to_num(carbs) + 9 * np.nan_to_num(fat)
+    return np.where(np.isnan(protein) & np.isnan(carbs) & np.isnan(fat), np.nan, kcal)
+
+
+def per100(column):
+    """
+    ``(n, len(NUTRIENTS))`` float32 per-100 g values from ``column(field)`` (one
+    of INLINE_FIELDS -> float array, NaN = missing), with the app's fallbacks.
+    """
+    import numpy as np
+
+    carbs, fat = column("carbs100"), column("fat100")
+    carbs = np.where(carbs > 0, carbs, _sum_present(column("simple100"), column("complex100")))
+    fat = np.where(fat > 0, fat, _sum_present(column("badFat100"), column("goodFat100"), column("trans100")))
+    protein = column("protein100")
+    kcal = column("kcal100")
+    kcal = np.where(np.isnan(kcal), tef(protein, carbs, fat), kcal)
+    values = {"kcal": kcal, "protein": protein, "carbs": carbs, "simple": column("simple100"), "fat": fat,
+              "badFat": column("badFat100"), "trans": column("trans100"), "fiber": column("fiber100"),
+              "sodium": column("sodium100")}
+    return np.stack([values[name] for name in NUTRIENTS], axis=1).astype(np.float32)
+
+
+def catalog_per100(m):
+    """Per-100 g NUTRIENTS of every catalog row (catalog ``kcal100`` is raw, so TEF is recomputed)."""
+    import numpy as np
+
+    missing = [f for f in CATALOG_FIELDS if f not in m.fields]
+    if missing:
+        raise ValueError(f"catalog lacks {', '.join(missing)}")
+    nan = np.full(len(m), np.nan, np.float32)
+    return per100(lambda f: m[f] if f in m.fields and f != "kcal100" else nan)
+
+
+def join(columns, m):
+    """
+    ``(values, source)``: per-100 g NUTRIENTS of every item and where they came
+    from (SOURCE_*). Catalog rows win per cell; NaN cells fall back to the
+    item's snapshot, and kcal are recomputed from the merged macros.
+    """
+    import numpy as np
+
+    index = m.row_index()
+    rows = np.array([index.get(p, -1) for p in columns["products"].tolist()] + [-1], dtype=np.int64)
+    row = rows[columns["item_product"]]
+    row = np.where(row >= 0, row, rows[columns["item_origin"]])
+    matched = row >= 0
+    inline = columns["item_inline"]
+    own = per100(lambda f: inline[:, INLINE_FIELDS.index(f)])
+    values = own.copy()
+    if matched.any():
+        from_catalog = catalog_per100(m)[row[matched]]
+        merged = np.where(np.isnan(from_catalog), own[matched], from_catalog)
+        at = {name: NUTRIENTS.index(name) for name in ("kcal", "protein", "carbs", "fat")}
+        merged[:, at["kcal"]] = tef(merged[:, at["protein"]], merged[:, at["carbs"]], merged[:, at["fat"]])
+        values[matched] = merged
+    source = np.where(matched, SOURCE_CATALOG, np.where(np.isnan(own[:, 0]), SOURCE_NONE, SOURCE_INLINE))
+    return values, source.astype(np.int8)
+
+
+def day_totals(columns, m):
+    """
+    Per-day sums: ``(totals, counts)`` with ``totals`` a ``(days,
+    len(NUTRIENTS))`` float64 matrix and ``counts`` ``{"items", "catalog",
+    "inline", "unmatched"}`` int32 arrays per day.
+    """
+    import numpy as np
+
+    days = len(columns)
+    item_day = columns["item_day"]
+    values, source = join(columns, m)
+    grams = np.nan_to_num(columns["item_grams"]).astype(np.float64)
+    amounts = np.nan_to_num(values).astype(np.float64) * (grams / 100)[:, None]
+    totals = np.empty((days, len(NUTRIENTS)))
+    for col in range(len(NUTRIENTS)):
+        totals[:, col] = np.bincount(item_day, weights=amounts[:, col], minlength=days)
+    counts = {"items": np.bincount(item_day, minlength=days).astype(np.int32)}
+    for name, code in (("catalog", SOURCE_CATALOG), ("inline", SOURCE_INLINE), ("unmatched", SOURCE_NONE)):
+        counts[name] = np.bincount(item_day[source == code], minlength=days).astype(np.int32)
+    return totals, counts
+
+
+def daily(columns, totals, counts):
+    """
+    Fleet rows per date over logged days (at least one item): ``{"date",
+    "days", "items", "catalog_share", "<x>_mean" for DAILY_MEANS}``.
+    """
+    import numpy as np
+
+    logged = counts["items"] > 0
+    dates, inverse = np.unique(columns["date"][logged], return_inverse=True)
+    n = np.bincount(inverse, minlength=len(dates))
+    items = np.bincount(inverse, weights=counts["items"][logged], minlength=len(dates))
+    catalog_items = np.bincount(inverse, weights=counts["catalog"][logged], minlength=len(dates))
+    means = {}
+    for name in DAILY_MEANS:
+        if name in NUTRIENTS:
+            values = totals[logged, NUTRIENTS.index(name)]
+        else:
+            values = columns[name][logged].astype(np.float64)
+        present = ~np.isnan(values)
+        sums = np.bincount(inverse[present], weights=values[present], minlength=len(dates))
+        seen = np.bincount(inverse[present], minlength=len(dates))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[name] = sums / seen
+    rows = []
+    for at, date in enumerate(dates.astype(str).tolist()):
+        row = {"date": date, "days": int(n[at]), "items": int(items[at]),
+               "catalog_share": round(float(catalog_items[at] / items[at]), 4)}
+        for name, values in means.items():
+            row[f"{name}_mean"] = None if math.isnan(values[at]) else round(float(values[at]), 1)
+        rows.append(row)
+    return rows
+
+
+def totals_arrays(columns, totals, counts, catalog_meta=None):
+    """``.npz`` columns of per-day totals (one row per extracted day)."""
+    import numpy as np
+
+    meta = {"format": TOTALS_FORMAT, "version": FORMAT_VERSION, "days": len(columns),
+            "nutrients": list(NUTRIENTS), "catalog_export_date": (catalog_meta or {}).get("export_date")}
+    arrays = {"_meta": np.frombuffer(json.dumps(meta).encode("utf-8"), np.uint8)}
+    for name in ("clients", "client", "date", "meals", "trainings", *DAY_FLOAT_FIELDS):
+        arrays[name] = columns[name]
+    for col, name in enumerate(NUTRIENTS):
+        arrays[name] = totals[:, col].astype(np.float32)
+    arrays.update(counts)
+    return arrays
+
+
+def write_daily(path, rows):
+    """Fleet daily table as ``.json`` or CSV."""
+    if str(path).endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        return
+    fields = ["date", "days", "items", "catalog_share", *(f"{name}_mean" for name in DAILY_MEANS)]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def extract_partition(conn, lo, hi, since=None, until=None, decrypt=False, itersize=ITERSIZE):
+    """Days of the clients in ``[lo, hi]`` as a filled :class:`Builder`."""
+    from heys_data.fleet_scan import DOC_DECRYPTED, DOC_PLAIN
+
+    builder = Builder()
+    sql = EXTRACT_SQL.format(doc=DOC_DECRYPTED if decrypt else DOC_PLAIN)
+    with conn.cursor(name=f"day_columns_{lo[:8]}") as cur:
+        cur.itersize = itersize
+        cur.execute(sql, {
+            "lo": lo, "hi": hi, "like": DAY_KEY_LIKE,
+            "k_from": day_key(since or "0000-00-00"), "k_to": day_key(until or "9999-99-99"),
+        })
+        for client_id, k, meals, items, trainings, weight, steps, sleep, start, end, water, nap, hidden in cur:
+            date = day_date(k)
+            if hidden:
+                builder.hidden += 1
+            elif date is not None:
+                builder.add(client_id, date, meals, items, trainings, weight, steps, sleep, start, end, water, nap)
+    return builder
+
+
+def _extract_one(pool, lo, hi, args):
+    from heys_data import db
+
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            decrypt = db.set_encryption_key(cur)
+        builder = extract_partition(conn, lo, hi, args.since, args.until, decrypt)
+        conn.rollback()  # read-only; ends the transaction holding the cursor
+    return builder.arrays(), builder.hidden
+
+
+def _extract(args):
+    import numpy as np
+
+    from heys_data import db
+    from heys_data.fleet_restore import BoundedPool
+    from heys_data.fleet_scan import partitions
+
+    ranges = partitions(args.partitions or args.workers * 4)
+    started = time.monotonic()
+    parts, hidden, failures = {}, 0, []
+    with BoundedPool(args.workers, **db.connect_kwargs()) as pool, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(_extract_one, pool, lo, hi, args): lo for lo, hi in ranges}
+        for done, future in enumerate(as_completed(futures), 1):
+            lo = futures[future]
+            try:
+                parts[lo], part_hidden = future.result()
+            except Exception as err:
+                failures.append(lo)
+                print(f"  [{done}/{len(ranges)}] {lo}: FAILED — {err}", file=sys.stderr)
+                continue
+            hidden += part_hidden
+            print(f"  [{done}/{len(ranges)}] {sum(len(p['date']) for p in parts.values())} days",
+                  file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} partitions failed; nothing written", file=sys.stderr)
+        return 1
+    arrays = pack(concat(parts[lo] for lo, _ in ranges), since=args.since, until=args.until,
+                  encrypted_hidden=hidden)
+    np.savez(args.output, **arrays)
+    meta = json.loads(arrays["_meta"].tobytes())
+    print(f"{meta['days']} days / {meta['items']} items of {meta['clients']} clients "
+          f"in {time.monotonic() - started:.1f}s -> {args.output}"
+          + (f" ({hidden} encrypted days skipped: no HEYS_ENCRYPTION_KEY)" if hidden else ""))
+    return 0
+
+
+def _totals(args, parser):
+    import numpy as np
+
+    from heys_data import catalog_matrix
+
+    started = time.monotonic()
+    columns = DayColumns.load(args.days)
+    if args.db:
+        from heys_data import db
+
+        conn = db.connect()
+        try:
+            m = catalog_matrix.from_db(conn, ("id", *CATALOG_FIELDS, "sodium100"))
+        finally:
+            conn.close()
+    else:
+        m = catalog_matrix.load(args.catalog)
+    try:
+        totals, counts = day_totals(columns, m)
+    except ValueError as err:
+        parser.error(str(err))
+    items = int(counts["items"].sum())
+    print(f"{len(columns)} days, {items} items: "
+          + ", ".join(f"{int(counts[name].sum())} {name}" for name in ("catalog", "inline", "unmatched"))
+          + f" ({time.monotonic() - started:.2f}s)")
+    if args.output:
+        np.savez(args.output, **totals_arrays(columns, totals, counts, m.meta))
+    if args.daily:
+        write_daily(args.daily, daily(columns, totals, counts))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    extract_cmd = sub.add_parser("extract", help="flatten client_kv_store day documents into an .npz")
+    extract_cmd.add_argument("-o", "--output", required=True, help="day columns .npz")
+    extract_cmd.add_argument("--since", help="only days on or after this date")
+    extract_cmd.add_argument("--until", help="only days on or before this date")
+    extract_cmd.add_argument("--workers", type=int, default=8, help="parallel connections")
+    extract_cmd.add_argument("--partitions", type=int, help="client_id ranges (default: 4 x workers)")
+    totals_cmd = sub.add_parser("totals", help="join items to the catalog, per-day and fleet daily totals")
+    totals_cmd.add_argument("days", help=".npz from extract")
+    totals_cmd.add_argument("--catalog", help=".npz from export_shared_products.py")
+    totals_cmd.add_argument("--db", action="store_true", help="read the catalog from the database")
+    totals_cmd.add_argument("-o", "--output", help="per-day totals .npz")
+    totals_cmd.add_argument("--daily", help="fleet totals per date (.csv or .json)")
+    args = parser.parse_args(argv)
+
+    if args.command == "extract":
+        return _extract(args)
+    if bool(args.catalog) == args.db:
+        parser.error("pass --catalog catalog.npz or --db")
+    return _totals(args, parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Helpers for ``heys_dayv2_<YYYY-MM-DD>`` day documents.
+
+Hand-exported backups store days either by bare date (schema v1/v2,
+``"2026-01-25"``) or by full key (schema v3, ``"heys_dayv2_2026-01-25"``);
+server snapshots always use the full key. Everything here accepts both.
+"""
+import re
+
+DAY_KEY_PREFIX = "heys_dayv2_"
+DAY_KEY_LIKE = DAY_KEY_PREFIX + "%"
+
+_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})$")
+
+
+def day_key(date):
+    """'2026-01-25' -> 'heys_dayv2_2026-01-25' (idempotent for full keys)."""
+    return date if date.startswith(DAY_KEY_PREFIX) else DAY_KEY_PREFIX + date
+
+
+def day_date(key):
+    """'heys_dayv2_2026-01-25' or '2026-01-25' -> '2026-01-25' (None if not a day)."""
+    if key.startswith(DAY_KEY_PREFIX):
+        key = key[len(DAY_KEY_PREFIX):]
+    match = _DATE_RE.fullmatch(key)
+    return match.group(1) if match else None
+
+
+def meal_count(day):
+    """Number of meals in a day document (0 for missing/malformed ``meals``)."""
+    meals = day.get("meals") if isinstance(day, dict) else None
+    return len(meals) if isinstance(meals, list) else 0
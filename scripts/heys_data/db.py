@@ -0,0 +1,72 @@
+"""
+PostgreSQL connection helpers.
+
+Connection settings come from the environment; passwords are never
+hard-coded:
+
+    YC_PG_PASSWORD        required (unless HEYS_PG_DSN is set)
+    YC_PG_HOST            default: production cluster host
+    YC_PG_PORT            default: 6432 (odyssey)
+    YC_PG_DATABASE        default: heys_production
+    YC_PG_USER            default: heys_admin
+    YC_PG_SSL_ROOT_CERT   default: ~/.postgresql/root.crt
+    HEYS_PG_DSN           full libpq DSN; overrides everything above
+                          (local Postgres for benchmarks/tests)
+    HEYS_ENCRYPTION_KEY   health-data key, same value as for heys-api-rpc;
+                          see :func:`set_encryption_key`
+"""
+import os
+import re
+
+DEFAULT_HOST = "rc1b-obkgs83tnrd6a2m3.mdb.yandexcloud.net"
+
+
+def connect_kwargs():
+    """Return psycopg2.connect() keyword arguments built from the environment."""
+    dsn = os.environ.get("HEYS_PG_DSN")
+    if dsn:
+        return {"dsn": dsn}
+
+    password = os.environ.get("YC_PG_PASSWORD")
+    if not password:
+        raise SystemExit("Set YC_PG_PASSWORD (or HEYS_PG_DSN) before running this script")
+
+    return {
+        "host": os.environ.get("YC_PG_HOST", DEFAULT_HOST),
+        "port": int(os.environ.get("YC_PG_PORT", "6432")),
+        "dbname": os.environ.get("YC_PG_DATABASE", "heys_production"),
+        "user": os.environ.get("YC_PG_USER", "heys_admin"),
+        "password": password,
+        "sslmode": "verify-full",
+        "sslrootcert": os.environ.get(
+            "YC_PG_SSL_ROOT_CERT", os.path.expanduser("~/.postgresql/root.crt")
+        ),
+    }
+
+
+def connect():
+    """Open a new psycopg2 connection using :func:`connect_kwargs`."""
+    import psycopg2
+
+    return psycopg2.connect(**connect_kwargs())
+
+
+def encryption_key():
+    """HEYS_ENCRYPTION_KEY normalised like heys-api-rpc (hex, else utf-8 -> hex)."""
+    key = (os.environ.get("HEYS_ENCRYPTION_KEY") or "").strip()
+    if not key:
+        return None
+    if re.fullmatch(r"[0-9a-fA-F]+", key) and len(key) % 2 == 0 and len(key) >= 32:
+        return key
+    return key.encode("utf-8").hex()
+
+
+def set_encryption_key(cur):
+    """
+    Make health keys encrypted by the DB write functions in this transaction
+    (``heys.encryption_key``, transaction-local). Returns False without a key.
+    """
+    key = encryption_key()
+    if key:
+        cur.execute("SELECT set_config('heys.encryption_key', %s, true)", (key,))
+    return key is not None
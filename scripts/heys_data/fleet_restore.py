@@ -0,0 +1,231 @@
+"""
+Fleet restore: restore day documents for many clients concurrently.
+
+    cd scripts
+    python3 -m heys_data.fleet_restore --snapshots s3://heys-backups/client-daily \\
+        --on-or-before 2026-03-29 --since 2026-03-01 --until 2026-03-29 \\
+        --clients-file affected.txt --workers 8 --pool-size 4 --report restore.json
+
+    python3 -m heys_data.fleet_restore --backup <client_id>=heys-backup-ccfe6ea3.json \\
+        --backup <client_id>=heys-backup-4545ee50.json --dry-run
+
+    # each day as it was on 2026-01-20 / the last version that still had meals
+    python3 -m heys_data.fleet_restore --snapshots <source> <client_id> \
+        --since 2026-01-17 --until 2026-01-17 --as-of 2026-01-20
+    python3 -m heys_data.fleet_restore --snapshots <source> <client_id> --last-nonempty
+
+Each client runs in a worker thread (snapshot download, gunzip and DB I/O all
+release the GIL) and borrows a connection from one bounded psycopg2 pool, so
+throughput scales with ``--workers`` / ``--pool-size`` rather than with the
+number of clients. Every client is its own transaction: a failure is rolled
+back, reported and does not stop the others. Days whose content already
+matches the DB (server-side md5, see :mod:`heys_data.restore`) are left alone
+unless ``--force`` is given. Writes go through the protected
+``write_client_kv_values()`` (a day with meals is never emptied, health keys
+are encrypted with HEYS_ENCRYPTION_KEY); ``--unprotected`` falls back to the
+raw upsert for deliberate overrides. ``--dry-run`` parses and counts without touching
+the DB. Exit code is 1 if any client failed.
+"""
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from heys_data import db, restore, snapshot_index, snapshots
+
+
+class BoundedPool:
+    """
+    ThreadedConnectionPool that blocks instead of raising when exhausted.
+
+    psycopg2's pool raises PoolError once ``maxconn`` connections are out;
+    the semaphore makes extra workers wait for a free connection instead.
+    """
+
+    def __init__(self, size, **connect_kwargs):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self._pool = ThreadedConnectionPool(1, size, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._pool.closeall()
+
+    def connection(self):
+        return _PooledConnection(self)
+
+
+class _PooledConnection:
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._pool._slots.acquire()
+        try:
+            self._conn = self._pool._pool.getconn()
+        except Exception:
+            self._pool._slots.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, *exc):
+        broken = self._conn.closed != 0
+        if exc_type and not broken:
+            self._conn.rollback()
+        self._pool._pool.putconn(self._conn, close=broken)
+        self._pool._slots.release()
+
+
+def client_rows(args, client_id, backups, source):
+    """Return (source label, DayRow iterator) for one client."""
+    if client_id in backups:
+        path = backups[client_id]
+        return path, restore.rows_from_backup(path, args.since, args.until)
+    if args.as_of or args.last_nonempty:
+        # Per-day point in time: resolved through the snapshot history index,
+        # so days may come from different snapshots.
+        index = snapshot_index.load_or_build(source, client_id, args.index_dir)
+        rows = snapshot_index.rows_as_of(
+            source, index, args.since, args.until, args.as_of, args.last_nonempty
+        )
+        label = f"index as of {args.as_of or 'latest'}"
+        return label + (", last non-empty" if args.last_nonempty else ""), rows
+    business_date = snapshots.resolve_date(source, client_id, args.snapshot_date, args.on_or_before)
+    rows = restore.rows_from_snapshot(source, business_date, client_id, args.since, args.until)
+    return f"snapshot {business_date}", rows
+
+
+def restore_one(pool, args, client_id, backups, source):
+    started = time.monotonic()
+    label, rows = client_rows(args, client_id, backups, source)
+    result = restore.RestoreResult(client_id, source=label, dry_run=args.dry_run)
+    if args.dry_run:
+        result.skipped = sum(1 for _ in rows)
+    else:
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                hashes = None if args.force else restore.fetch_day_hashes(
+                    cur, client_id, args.since, args.until
+                )
+                write = restore.upsert_days if args.unprotected else restore.write_days_protected
+                write(cur, client_id, rows, result, args.batch_size, hashes)
+            conn.commit()
+    result.duration_sec = round(time.monotonic() - started, 3)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("clients", nargs="*", help="client ids (with --snapshots)")
+    parser.add_argument("--clients-file", help="file with one client id per line")
+    parser.add_argument("--backup", action="append", default=[], metavar="CLIENT=PATH",
+                        help="hand-exported backup for a client (repeatable)")
+    parser.add_argument("--snapshots", metavar="URI", help="local mirror dir or s3://bucket/prefix")
+    parser.add_argument("--snapshot-date", help="exact snapshot businessDate")
+    parser.add_argument("--on-or-before", help="latest snapshot on or before this date")
+    parser.add_argument("--as-of", help="restore each day as it was in the snapshots at this date "
+                                        "(via the snapshot history index)")
+    parser.add_argument("--last-nonempty", action="store_true",
+                        help="restore each day from the last snapshot where it still had meals")
+    parser.add_argument("--index-dir", default=snapshot_index.DEFAULT_INDEX_DIR,
+                        help="where snapshot history indexes are kept")
+    parser.add_argument("--since", help="first day to restore (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last day to restore (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4, help="max DB connections")
+    parser.add_argument("--batch-size", type=int, default=restore.BATCH_SIZE)
+    parser.add_argument("--force", action="store_true",
+                        help="rewrite days even if the DB already holds identical content")
+    parser.add_argument("--unprotected", action="store_true",
+                        help="raw upsert: skip data-loss protection and encryption")
+    parser.add_argument("--dry-run", action="store_true", help="read sources, write nothing")
+    parser.add_argument("--report", help="write the final JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def collect_clients(args):
+    backups = {}
+    for spec in args.backup:
+        client_id, sep, path = spec.partition("=")
+        if not sep:
+            raise SystemExit(f"--backup expects CLIENT=PATH, got {spec!r}")
+        backups[client_id.lower()] = path
+
+    clients = [c.lower() for c in args.clients]
+    if args.clients_file:
+        with open(args.clients_file, "r", encoding="utf-8") as f:
+            clients += [line.strip().lower() for line in f if line.strip() and not line.startswith("#")]
+    if clients and not args.snapshots:
+        raise SystemExit("client ids without --backup need --snapshots")
+    if (args.as_of or args.last_nonempty) and backups:
+        raise SystemExit("--as-of / --last-nonempty work on --snapshots only")
+    return list(dict.fromkeys(list(backups) + clients)), backups
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    clients, backups = collect_clients(args)
+    if not clients:
+        raise SystemExit("nothing to restore: pass client ids or --backup")
+    source = snapshots.source_from_uri(args.snapshots) if args.snapshots else None
+
+    started = time.monotonic()
+    results, failures = [], []
+    print(f"Restoring {len(clients)} client(s): workers={args.workers}, pool={args.pool_size}"
+          + (" [DRY RUN]" if args.dry_run else ""))
+
+    pool_cm = (
+        contextlib.nullcontext() if args.dry_run
+        else BoundedPool(args.pool_size, **db.connect_kwargs())
+    )
+    with pool_cm as pool, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(restore_one, pool, args, cid, backups, source): cid
+            for cid in clients
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            client_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as err:  # isolate: one client's failure never stops the fleet
+                failures.append({"client_id": client_id, "error": f"{type(err).__name__}: {err}"[:300]})
+                print(f"  [{done}/{len(clients)}] {client_id}: FAILED — {err}")
+                continue
+            results.append(result)
+            counts = (f"would write {result.skipped}" if args.dry_run
+                      else f"inserted={result.inserted} updated={result.updated} "
+                           f"unchanged={result.unchanged} blocked={result.blocked}")
+            print(f"  [{done}/{len(clients)}] {client_id}: {result.source}, {counts} "
+                  f"({result.duration_sec}s)")
+
+    report = {
+        "clients": len(clients),
+        "succeeded": len(results),
+        "failed": len(failures),
+        "days_written": sum(r.written for r in results),
+        "days_unchanged": sum(r.unchanged for r in results),
+        "days_blocked": sum(r.blocked for r in results),
+        "duration_sec": round(time.monotonic() - started, 2),
+        "dry_run": args.dry_run,
+        "results": [r.as_dict() for r in sorted(results, key=lambda r: r.client_id)],
+        "failures": failures,
+    }
+    print(f"\nDone in {report['duration_sec']}s: {report['succeeded']} ok, {report['failed']} failed, "
+          f"{report['days_written']} day(s) written, {report['days_unchanged']} unchanged, {report['days_blocked']} blocked")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
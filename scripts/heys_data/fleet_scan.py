@@ -0,0 +1,235 @@
+"""
+Fleet-wide suspicious-day scanner.
+
+``check_suspicious_days()`` and ``data_protection_audit.py`` look at one
+client. This walks every ``heys_dayv2_*`` row of ``client_kv_store`` and
+ranks clients by data-loss signals:
+
+    empty_between_full      0 meals on a day whose neighbours both have meals
+    meal_drop               meals fell to less than half of both neighbours
+
+and reports one low-severity signal, which never outranks data loss:
+
+    updated_at_regression   row rewritten (updated_at) with a document whose
+                            v.updatedAt is more than a day older. A stale
+                            device overwriting newer data looks like this, but
+                            so does every legitimate restore or backup
+                            re-upload, so it only orders clients with equal
+                            data-loss scores (and lists those with none last)
+
+    cd scripts
+    python3 -m heys_data.fleet_scan --workers 8 --since 2026-01-01 --report scan.json
+
+The key space is split into ``--partitions`` client_id ranges. Client ids are
+random v4 UUIDs, so equal ranges balance like a hash split, yet every
+partition is an index range scan on (client_id, k). Partitions run on
+``--workers`` parallel connections, each through a server-side cursor that
+ships only (client, key, meals, updatedAt) scalars; rows are consumed one
+client at a time, so memory stays flat whatever the fleet size. Encrypted
+days are decrypted server-side when HEYS_ENCRYPTION_KEY is set, otherwise
+they are counted and left out of the signals.
+"""
+import argparse
+import heapq
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from itertools import groupby
+
+from heys_data import db
+from heys_data.days import DAY_KEY_LIKE, day_date, day_key
+from heys_data.fleet_restore import BoundedPool
+
+ITERSIZE = 5000
+MAX_EXAMPLES = 10
+STALE_WRITE_MS = 24 * 3600 * 1000
+SIGNAL_WEIGHTS = {"empty_between_full": 3, "meal_drop": 1}
+LOW_SEVERITY = ("updated_at_regression",)
+
+# {doc} is the day document: v, or the decrypted ciphertext when a key is set.
+DOC_PLAIN = "v"
+DOC_DECRYPTED = "CASE WHEN v_encrypted IS NOT NULL THEN COALESCE(decrypt_health_data(v_encrypted), v) ELSE v END"
+SCAN_SQL = """
+    SELECT client_id::text, k,
+           CASE WHEN jsonb_typeof(d.doc->'meals') = 'array' THEN jsonb_array_length(d.doc->'meals') ELSE 0 END,
+           CASE WHEN jsonb_typeof(d.doc->'updatedAt') = 'number' THEN (d.doc->>'updatedAt')::numeric::bigint END,
+           (extract(epoch FROM updated_at) * 1000)::bigint,
+           v_encrypted IS NOT NULL AND d.doc = '{{}}'::jsonb
+    FROM client_kv_store
+    CROSS JOIN LATERAL (SELECT {doc} AS doc) d
+    WHERE client_id BETWEEN %(lo)s::uuid AND %(hi)s::uuid
+      AND k LIKE %(like)s
+      AND k >= %(k_from)s
+    ORDER BY client_id, k
+"""
+
+
+@dataclass
+class ClientSignals:
+    client_id: str
+    days: int = 0
+    encrypted_hidden: int = 0
+    counts: dict = field(default_factory=lambda: dict.fromkeys((*SIGNAL_WEIGHTS, *LOW_SEVERITY), 0))
+    examples: dict = field(default_factory=dict)  # signal -> [date, ...]
+
+    @property
+    def score(self):
+        return sum(weight * self.counts[name] for name, weight in SIGNAL_WEIGHTS.items())
+
+    @property
+    def low_severity(self):
+        return sum(self.counts[name] for name in LOW_SEVERITY)
+
+    @property
+    def rank(self):
+        """Data-loss score first; low-severity signals only break ties."""
+        return self.score, self.low_severity
+
+    def flag(self, signal, date):
+        self.counts[signal] += 1
+        examples = self.examples.setdefault(signal, [])
+        if len(examples) < MAX_EXAMPLES:
+            examples.append(date)
+
+    def as_dict(self):
+        return {
+            "client_id": self.client_id,
+            "score": self.score,
+            "severity": "data_loss" if self.score else "low",
+            "days": self.days,
+            "encrypted_hidden": self.encrypted_hidden,
+            "signals": self.counts,
+            "examples": self.examples,
+        }
+
+
+def analyze_client(client_id, days):
+    """
+    Signals for one client; ``days`` are ``(date, meals, updated_ms,
+    row_updated_ms, hidden)`` tuples in date order.
+    """
+    result = ClientSignals(client_id)
+    visible = []
+    for date, meals, updated_ms, row_updated_ms, hidden in days:
+        result.days += 1
+        if hidden:
+            result.encrypted_hidden += 1
+            continue
+        visible.append((date, meals))
+        if updated_ms is not None and row_updated_ms - updated_ms > STALE_WRITE_MS:
+            result.flag("updated_at_regression", date)
+    for (_, before), (date, meals), (_, after) in zip(visible, visible[1:], visible[2:]):
+        if before <= 0 or after <= 0:
+            continue
+        if meals == 0:
+            result.flag("empty_between_full", date)
+        elif meals * 2 < min(before, after):
+            result.flag("meal_drop", date)
+    return result
+
+
+def partitions(count):
+    """``count`` contiguous, inclusive client_id ranges covering the uuid space."""
+    step = (1 << 128) // count
+    bounds = [i * step for i in range(count)] + [1 << 128]
+    return [(str(uuid.UUID(int=lo)), str(uuid.UUID(int=hi - 1))) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def scan_partition(conn, lo, hi, since=None, decrypt=False, itersize=ITERSIZE):
+    """Stream :class:`ClientSignals` for every client in ``[lo, hi]``."""
+    sql = SCAN_SQL.format(doc=DOC_DECRYPTED if decrypt else DOC_PLAIN)
+    with conn.cursor(name=f"fleet_scan_{lo[:8]}") as cur:
+        cur.itersize = itersize
+        cur.execute(sql, {
+            "lo": lo, "hi": hi, "like": DAY_KEY_LIKE,
+            "k_from": day_key(since or "0000-00-00"),
+        })
+        for client_id, rows in groupby(cur, key=lambda row: row[0]):
+            days = [(day_date(k), meals, upd, row_upd, hidden) for _, k, meals, upd, row_upd, hidden in rows]
+            yield analyze_client(client_id, days)
+
+
+def _keep_top(heap, entry, limit):
+    if len(heap) < limit:
+        heapq.heappush(heap, entry)
+    else:
+        heapq.heappushpop(heap, entry)
+
+
+def _scan_one(pool, lo, hi, args, limit):
+    """Scan one partition; keeps only the top ``limit`` flagged clients."""
+    top, clients, days = [], 0, 0
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            decrypt = db.set_encryption_key(cur)
+        for signals in scan_partition(conn, lo, hi, args.since, decrypt):
+            clients += 1
+            days += signals.days
+            if any(signals.rank):
+                _keep_top(top, (signals.rank, signals.client_id, signals), limit)
+        conn.rollback()  # read-only; ends the transaction holding the cursor
+    return clients, days, top
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--since", help="only days on or after this date")
+    parser.add_argument("--workers", type=int, default=8, help="parallel connections")
+    parser.add_argument("--partitions", type=int, help="client_id ranges (default: 4 x workers)")
+    parser.add_argument("--limit", type=int, default=1000, help="clients kept in the ranked report")
+    parser.add_argument("--top", type=int, default=20, help="clients printed")
+    parser.add_argument("--report", help="write the ranked JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ranges = partitions(args.partitions or args.workers * 4)
+    started = time.monotonic()
+    top, clients, days, failures = [], 0, 0, []
+
+    with BoundedPool(args.workers, **db.connect_kwargs()) as pool, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(_scan_one, pool, lo, hi, args, args.limit): lo for lo, hi in ranges}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                part_clients, part_days, part_top = future.result()
+            except Exception as err:
+                failures.append({"partition": futures[future], "error": f"{type(err).__name__}: {err}"[:300]})
+                print(f"  [{done}/{len(ranges)}] {futures[future]}: FAILED — {err}", file=sys.stderr)
+                continue
+            clients += part_clients
+            days += part_days
+            for entry in part_top:
+                _keep_top(top, entry, args.limit)
+            print(f"  [{done}/{len(ranges)}] {clients} clients, {days} days", file=sys.stderr)
+
+    ranked = [signals for _, _, signals in sorted(top, key=lambda e: (-e[0][0], -e[0][1], e[1]))]
+    report = {
+        "clients": clients,
+        "days": days,
+        "flagged": len(ranked),
+        "data_loss": sum(1 for signals in ranked if signals.score),
+        "since": args.since,
+        "duration_sec": round(time.monotonic() - started, 2),
+        "failures": failures,
+        "ranked": [signals.as_dict() for signals in ranked],
+    }
+    for signals in ranked[:args.top]:
+        counts = " ".join(f"{name}={n}" for name, n in signals.counts.items() if n)
+        print(f"{signals.score:5d}  {signals.client_id}  {counts}" + ("" if signals.score else "  (low)"))
+    print(f"Scanned {clients} clients / {days} days in {report['duration_sec']}s, "
+          f"{report['data_loss']} with data-loss signals, {len(ranked) - report['data_loss']} low-severity only")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
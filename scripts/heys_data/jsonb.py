@@ -0,0 +1,75 @@
+"""
+Canonical JSON in PostgreSQL ``jsonb::text`` form.
+
+Restore and snapshot tooling compare local day documents with rows in
+``client_kv_store`` by hash. Hashing on the server is cheap
+(``md5(v::text)``), so the local side renders values exactly the way
+PostgreSQL prints a ``jsonb``:
+
+* object keys ordered by byte length, then bytewise (jsonb storage order),
+  last duplicate wins;
+* ``", "`` / ``": "`` separators;
+* numbers printed as ``numeric`` (``1.50`` stays ``1.50``, ``1e3`` -> ``1000``)
+  — parse with ``parse_float=decimal.Decimal`` to keep the original digits;
+* strings escaped like ``escape_json()``: ``\\" \\\\ \\b \\f \\n \\r \\t``,
+  other control chars as lowercase ``\\u00xx``, everything else raw UTF-8.
+
+The rendering is valid JSON, so it doubles as the write payload.
+"""
+import hashlib
+import re
+from decimal import Decimal
+
+_ESCAPES = {'"': '\\"', "\\": "\\\\", "\b": "\\b", "\f": "\\f", "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_NEEDS_ESCAPE = re.compile(r'["\\\x00-\x1f]')
+
+
+def _escape(match):
+    char = match.group()
+    return _ESCAPES.get(char) or "\\u%04x" % ord(char)
+
+
+def _string(value):
+    return '"' + _NEEDS_ESCAPE.sub(_escape, value) + '"'
+
+
+def _key_order(key):
+    encoded = key.encode("utf-8")
+    return len(encoded), encoded
+
+
+def _number(value):
+    if isinstance(value, Decimal):
+        if value.is_zero():
+            value = abs(value)  # numeric has no negative zero
+        return format(value, "f")
+    if isinstance(value, float):
+        # Floats only reach here when the caller parsed without Decimal;
+        # repr is the shortest round-trip form, normalised like numeric.
+        return _number(Decimal(repr(value)))
+    return str(value)
+
+
+def jsonb_text(value):
+    """Render ``value`` as PostgreSQL prints the equivalent ``jsonb``."""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return _string(value)
+    if isinstance(value, (int, float, Decimal)):
+        return _number(value)
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda item: _key_order(item[0]))
+        return "{" + ", ".join(_string(k) + ": " + jsonb_text(v) for k, v in items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(jsonb_text(v) for v in value) + "]"
+    raise TypeError(f"not JSON-serialisable: {type(value).__name__}")
+
+
+def jsonb_md5(value):
+    """Hex md5 of :func:`jsonb_text` — equals ``md5(v::text)`` on the server."""
+    return hashlib.md5(jsonb_text(value).encode("utf-8")).hexdigest()
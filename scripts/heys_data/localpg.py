@@ -0,0 +1,253 @@
+"""
+Scratch databases on a local Postgres for benchmarks and protection tests.
+
+``HEYS_PG_DSN`` points at a maintenance database of a *local* server the
+current user may CREATE DATABASE on (e.g. ``dbname=postgres host=localhost``);
+scratch databases are created next to it. Hosts other than localhost / a unix
+socket are refused unless ``HEYS_LOCAL_PG_ALLOW_REMOTE=1`` — these helpers
+drop databases.
+
+A provisioned database gets ``sql/local_base.sql`` (roles, pgcrypto, the
+tables and the few helpers defined outside ``database/``) and then the real
+KV write migrations from ``database/`` in order, so benchmarks and tests run
+the same function bodies as production.
+
+    cd scripts
+    HEYS_PG_DSN="dbname=postgres" python3 -m heys_data.localpg provision heys_local
+    HEYS_PG_DSN="dbname=postgres" python3 -m heys_data.localpg drop heys_local
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+MIGRATIONS_DIR = REPO_ROOT / "database"
+BASE_SQL = Path(__file__).resolve().parent / "sql" / "local_base.sql"
+
+# Applied in this order on top of BASE_SQL: the chain that defines today's
+# client_kv_store write paths and the data-loss protection around them.
+KV_MIGRATIONS = [
+    "2026-01-24_encryption_phase2.sql",
+    "2026-01-25_data_loss_protection.sql",
+    "2026-01-25_data_loss_protection_v2.sql",
+    "2026-06-16_harden_safe_upsert_non_client_auth_keys.sql",
+    "2026-06-16_harden_write_client_kv_value_non_client_keys.sql",
+    "2026-06-21_harden_kv_subscription_write_gate.sql",
+    "2026-10-19_write_client_kv_values_batch.sql",
+    "2026-10-19_data_loss_audit_rollups.sql",
+]
+
+_LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1"}
+
+
+def admin_dsn():
+    """The maintenance DSN from HEYS_PG_DSN, refused if it is not a local server."""
+    from psycopg2.extensions import parse_dsn
+
+    dsn = os.environ.get("HEYS_PG_DSN")
+    if not dsn:
+        raise SystemExit("Set HEYS_PG_DSN to a local Postgres (e.g. 'dbname=postgres') before running this")
+    host = parse_dsn(dsn).get("host", "")
+    if host not in _LOCAL_HOSTS and not host.startswith("/") and os.environ.get("HEYS_LOCAL_PG_ALLOW_REMOTE") != "1":
+        raise SystemExit(f"HEYS_PG_DSN host {host!r} is not local; set HEYS_LOCAL_PG_ALLOW_REMOTE=1 to override")
+    return dsn
+
+
+def dsn_for(dbname, base_dsn=None):
+    """``base_dsn`` (default :func:`admin_dsn`) with the database swapped."""
+    from psycopg2.extensions import make_dsn
+
+    return make_dsn(base_dsn or admin_dsn(), dbname=dbname)
+
+
+def _admin_execute(sql, base_dsn=None):
+    import psycopg2
+
+    conn = psycopg2.connect(base_dsn or admin_dsn())
+    try:
+        conn.autocommit = True  # CREATE/DROP DATABASE cannot run in a transaction
+        with conn.cursor() as cur:
+            cur.execute(sql)
+    finally:
+        conn.close()
+
+
+def create_database(name, template=None, base_dsn=None, strategy=None):
+    """
+    ``strategy="FILE_COPY"`` (PG15+) clones a small template by copying files
+    at the cost of one checkpoint — milliseconds instead of WAL-logging
+    every page as the default WAL_LOG strategy does.
+    """
+    from psycopg2 import sql
+
+    stmt = sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name))
+    if template:
+        stmt = sql.SQL("{} TEMPLATE {}").format(stmt, sql.Identifier(template))
+    if strategy:
+        stmt = sql.SQL("{} STRATEGY {}").format(stmt, sql.SQL(strategy))
+    _admin_execute(stmt, base_dsn)
+
+
+def server_version(base_dsn=None):
+    import psycopg2
+
+    conn = psycopg2.connect(base_dsn or admin_dsn())
+    try:
+        return conn.server_version
+    finally:
+        conn.close()
+
+
+def drop_database(name, base_dsn=None):
+    from psycopg2 import sql
+
+    # WITH (FORCE) (PG13+) also disconnects stragglers left by a failed run.
+    _admin_execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(name)), base_dsn)
+
+
+def apply_files(conn, paths):
+    """Run each SQL file as one script (files carry their own BEGIN/COMMIT)."""
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for path in paths:
+            cur.execute(Path(path).read_text(encoding="utf-8"))
+    conn.autocommit = False
+
+
+def provision(name, extra_sql=(), base_dsn=None):
+    """Create ``name`` from scratch with the base schema and KV migrations; returns its DSN."""
+    import psycopg2
+
+    drop_database(name, base_dsn)
+    create_database(name, base_dsn=base_dsn)
+    dsn = dsn_for(name, base_dsn)
+    conn = psycopg2.connect(dsn)
+    try:
+        apply_files(conn, [BASE_SQL, *(MIGRATIONS_DIR / m for m in KV_MIGRATIONS), *extra_sql])
+    finally:
+        conn.close()
+    return dsn
+
+
+# --- realistic client_kv_store data ---------------------------------------------
+
+_FOODS = ["Овсянка", "Творог 5%", "Куриная грудка", "Рис отварной", "Гречка", "Яблоко",
+          "Банан", "Омлет", "Салат овощной", "Хлеб цельнозерновой", "Кефир 1%", "Сыр"]
+_MEAL_NAMES = ["Завтрак", "Перекус", "Обед", "Полдник", "Ужин"]
+
+
+def session_token(index):
+    return f"local-session-{index:06d}"
+
+
+def day_document(date, meals, items_per_meal=3, updated_ms=None, rng=random):
+    """A ``heys_dayv2_*`` value shaped like what the app writes."""
+    return {
+        "date": date,
+        "meals": [
+            {
+                "id": f"meal_{date}_{m}",
+                "name": _MEAL_NAMES[m % len(_MEAL_NAMES)],
+                "time": f"{8 + m * 3:02d}:{rng.randrange(60):02d}",
+                "items": [
+                    {
+                        "id": f"item_{date}_{m}_{i}",
+                        "product_id": rng.randrange(1, 5000),
+                        "name": rng.choice(_FOODS),
+                        "grams": rng.randrange(20, 350),
+                        "kcal100": rng.randrange(30, 400),
+                        "protein100": round(rng.uniform(0, 30), 1),
+                        "fat100": round(rng.uniform(0, 25), 1),
+                        "carbs100": round(rng.uniform(0, 70), 1),
+                    }
+                    for i in range(items_per_meal)
+                ],
+            }
+            for m in range(meals)
+        ],
+        "waterMl": rng.randrange(0, 3000, 250),
+        "steps": rng.randrange(0, 15000),
+        "sleepStart": "23:30",
+        "sleepEnd": "07:15",
+        "weightMorning": round(rng.uniform(55, 95), 1),
+        "updatedAt": updated_ms if updated_ms is not None else int(time.time() * 1000),
+    }
+
+
+def day_dates(days, end=None):
+    import datetime
+
+    end = end or datetime.date.today()
+    return [(end - datetime.timedelta(days=n)).isoformat() for n in range(days - 1, -1, -1)]
+
+
+def seed(conn, clients=50, days=30, meals=(2, 5), items_per_meal=3, seed_value=0):
+    """
+    Insert ``clients`` active clients, one live session each (token from
+    :func:`session_token`) and ``days`` day documents per client. Returns the
+    client ids in session-token order.
+    """
+    from psycopg2.extras import Json, execute_values
+
+    rng = random.Random(seed_value)
+    client_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(clients)]
+    dates = day_dates(days)
+    updated_ms = int(time.time() * 1000) - 3 * 3600 * 1000
+    with conn.cursor() as cur:
+        execute_values(cur, "INSERT INTO clients (id, name) VALUES %s",
+                       [(cid, f"Local client {n}") for n, cid in enumerate(client_ids)])
+        execute_values(
+            cur,
+            "INSERT INTO client_sessions (client_id, token_hash, expires_at) VALUES %s",
+            [(cid, hashlib.sha256(session_token(n).encode()).digest(), "infinity")
+             for n, cid in enumerate(client_ids)],
+        )
+        for cid in client_ids:
+            execute_values(
+                cur,
+                "INSERT INTO client_kv_store (client_id, k, v) VALUES %s",
+                [(cid, f"heys_dayv2_{date}",
+                  Json(day_document(date, rng.randint(*meals), items_per_meal, updated_ms, rng)))
+                 for date in dates],
+                page_size=500,
+            )
+        cur.execute("ANALYZE client_kv_store")
+    conn.commit()
+    return client_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["provision", "drop"])
+    parser.add_argument("name")
+    parser.add_argument("--seed-clients", type=int, default=0, help="provision: also seed this many clients")
+    parser.add_argument("--seed-days", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.command == "drop":
+        drop_database(args.name)
+        print(f"Dropped {args.name}")
+        return 0
+
+    import psycopg2
+
+    dsn = provision(args.name)
+    if args.seed_clients:
+        conn = psycopg2.connect(dsn)
+        try:
+            seed(conn, args.seed_clients, args.seed_days)
+        finally:
+            conn.close()
+    print(dsn)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Data-protection audit: a registry of independent checks run concurrently.
+
+    cd scripts
+    python3 -m heys_data.protection_audit                   # human-readable
+    python3 -m heys_data.protection_audit --json            # for monitoring
+    python3 -m heys_data.protection_audit --snapshots s3://heys-backups/client-daily
+
+Each check gets its own pooled connection and read-only transaction with a
+``statement_timeout``, so one slow check neither blocks the others nor runs
+past its budget; durations are measured per check. Exit code (Nagios style):
+0 all ok, 1 warnings, 2 failures, 3 the audit itself could not run. A lock
+file makes overlapping cron runs exit immediately instead of stacking up.
+
+Checks only read. The write probes (an empty day over a day with meals) run
+against a local Postgres in ``heys_data/tests/test_protection.py``.
+"""
+import argparse
+import datetime
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from heys_data import db, snapshots
+
+OK, WARN, FAIL, SKIP, TIMEOUT, ERROR = "ok", "warn", "fail", "skip", "timeout", "error"
+EXIT_CODES = {OK: 0, SKIP: 0, WARN: 1, FAIL: 2, TIMEOUT: 2, ERROR: 2}
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_LOCK_FILE = "/tmp/heys_protection_audit.lock"
+
+
+@dataclass
+class Check:
+    name: str
+    func: object
+    title: str
+    timeout: float = DEFAULT_TIMEOUT
+    needs_db: bool = True
+
+
+@dataclass
+class CheckResult:
+    name: str
+    status: str
+    message: str = ""
+    data: dict = field(default_factory=dict)
+    duration_ms: float = 0.0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "message": self.message,
+            "data": self.data,
+            "duration_ms": self.duration_ms,
+        }
+
+
+CHECKS = []
+
+
+def check(title, timeout=DEFAULT_TIMEOUT, needs_db=True):
+    """Register a check: ``func(cur, args) -> (status, message[, data])``."""
+    def register(func):
+        CHECKS.append(Check(func.__name__, func, title, timeout, needs_db))
+        return func
+    return register
+
+
+def _function_source(cur, name):
+    cur.execute("SELECT prosrc FROM pg_proc WHERE proname = %s ORDER BY oid DESC LIMIT 1", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+_WRITER_CALL = re.compile(r"\bwrite_client_kv_value\s*\(")
+
+
+def _protected(cur, name, wrapper=False):
+    """
+    The writers themselves must call check_day_overwrite_allowed; a ``wrapper``
+    may instead call write_client_kv_value (a real call, not a mention such as
+    ``write_client_kv_value_blacklist``). The 2026-06-21 session upserts INSERT
+    directly, so they report FAIL until the check is restored there.
+    """
+    src = _function_source(cur, name)
+    if src is None:
+        return FAIL, f"{name} is missing"
+    if "check_day_overwrite_allowed" in src:
+        return OK, "calls check_day_overwrite_allowed"
+    if wrapper and _WRITER_CALL.search(src):
+        return OK, "writes through write_client_kv_value"
+    return FAIL, "writes without check_day_overwrite_allowed"
+
+
+@check("write_client_kv_value protection")
+def write_client_kv_value_protected(cur, args):
+    return _protected(cur, "write_client_kv_value")
+
+
+@check("upsert_client_kv_by_session protection")
+def upsert_by_session_protected(cur, args):
+    return _protected(cur, "upsert_client_kv_by_session", wrapper=True)
+
+
+@check("batch_upsert_client_kv_by_session protection")
+def batch_upsert_by_session_protected(cur, args):
+    return _protected(cur, "batch_upsert_client_kv_by_session", wrapper=True)
+
+
+@check("safe_upsert_client_kv (REST) protection")
+def safe_upsert_protected(cur, args):
+    return _protected(cur, "safe_upsert_client_kv")
+
+
+@check("data_loss_audit table")
+def audit_table(cur, args):
+    cur.execute("SELECT to_regclass('public.data_loss_audit'), to_regclass('public.data_loss_audit_rollup_hourly')")
+    audit, rollups = cur.fetchone()
+    if audit is None:
+        return FAIL, "data_loss_audit is missing"
+    if rollups is None:
+        return WARN, "audit rollups not installed (2026-10-19_data_loss_audit_rollups.sql)"
+    # Rollups, not count(*) over the whole log: cheap enough for every cron run.
+    cur.execute("""
+        SELECT COALESCE(sum(events) FILTER (WHERE NOT allowed), 0), count(DISTINCT client_id)
+        FROM data_loss_audit_rollup_hourly
+        WHERE hour >= date_trunc('hour', NOW() - INTERVAL '24 hours')
+    """)
+    blocked, clients = cur.fetchone()
+    return OK, f"{blocked} blocked write(s) in 24h", {"blocked_24h": int(blocked), "clients_24h": int(clients)}
+
+
+@check("monitoring functions")
+def monitoring_functions(cur, args):
+    names = ["get_recent_data_loss_alerts", "check_suspicious_days", "refresh_data_loss_audit_rollups"]
+    cur.execute("SELECT DISTINCT proname FROM pg_proc WHERE proname = ANY(%s)", (names,))
+    present = {row[0] for row in cur.fetchall()}
+    missing = [n for n in names if n not in present]
+    if missing:
+        return WARN, "missing: " + ", ".join(missing), {"missing": missing}
+    return OK, "all present"
+
+
+@check("daily snapshots", needs_db=False, timeout=30.0)
+def daily_snapshots(cur, args):
+    if not args.snapshots:
+        return SKIP, "pass --snapshots to check heys-client-daily-backup output"
+    source = snapshots.source_from_uri(args.snapshots)
+    dates = source.list_business_dates()
+    if not dates:
+        return FAIL, f"no snapshots in {source!r}"
+    age = (datetime.date.today() - datetime.date.fromisoformat(dates[-1])).days
+    data = {"latest": dates[-1], "age_days": age}
+    if age > 2:
+        return FAIL, f"latest snapshot {dates[-1]} is {age} days old", data
+    return OK, f"latest snapshot {dates[-1]}", data
+
+
+def run_check(chk, pool, args):
+    started = time.monotonic()
+    try:
+        if chk.needs_db:
+            with pool.connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SET TRANSACTION READ ONLY")
+                        cur.execute("SELECT set_config('statement_timeout', %s, true)",
+                                    (str(int(chk.timeout * 1000)),))
+                        outcome = chk.func(cur, args)
+                finally:
+                    conn.rollback()
+        else:
+            outcome = chk.func(None, args)
+        status, message, *rest = outcome
+        result = CheckResult(chk.name, status, message, rest[0] if rest else {})
+    except Exception as err:
+        status = TIMEOUT if "statement timeout" in str(err) else ERROR
+        result = CheckResult(chk.name, status, f"{type(err).__name__}: {err}".strip()[:300])
+    result.duration_ms = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+def run_checks(checks, pool, args, workers):
+    """Run ``checks`` concurrently; anything past its timeout is reported as such."""
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(run_check, chk, pool, args): chk for chk in checks}
+    # statement_timeout bounds DB work; this bounds everything else (S3, pool waits).
+    deadline = max(chk.timeout for chk in checks) * 2 + 5
+    done, pending = wait(futures, timeout=deadline)
+    executor.shutdown(wait=False, cancel_futures=True)
+    results = [f.result() for f in done]
+    results += [CheckResult(futures[f].name, TIMEOUT, f"no result within {deadline}s") for f in pending]
+    order = {chk.name: i for i, chk in enumerate(checks)}
+    return sorted(results, key=lambda r: order[r.name])
+
+
+def exit_code(results):
+    return max((EXIT_CODES[r.status] for r in results), default=0)
+
+
+def _acquire_lock(path):
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+_ICONS = {OK: "✅", WARN: "⚠️", FAIL: "❌", SKIP: "➖", TIMEOUT: "⏱️", ERROR: "💥"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    parser.add_argument("--only", action="append", default=[], metavar="CHECK",
+                        choices=[c.name for c in CHECKS], help="run only these checks")
+    parser.add_argument("--snapshots", metavar="URI", help="daily snapshot source to check freshness")
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--lock-file", default=DEFAULT_LOCK_FILE)
+    args = parser.parse_args(argv)
+
+    checks = [c for c in CHECKS if not args.only or c.name in args.only]
+    lock = _acquire_lock(args.lock_file)
+    if lock is None:
+        print("previous audit still running", file=sys.stderr)
+        return 3
+
+    from heys_data.fleet_restore import BoundedPool
+
+    started = time.monotonic()
+    try:
+        with BoundedPool(args.pool_size, **db.connect_kwargs()) as pool:
+            results = run_checks(checks, pool, args, args.pool_size + 1)
+    except Exception as err:
+        print(f"audit could not run: {err}", file=sys.stderr)
+        return 3
+    finally:
+        os.close(lock)
+
+    code = exit_code(results)
+    if args.json:
+        json.dump({
+            "status": {0: OK, 1: WARN}.get(code, FAIL),
+            "exit_code": code,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "checks": [r.as_dict() for r in results],
+        }, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        titles = {c.name: c.title for c in CHECKS}
+        print("🔐 HEYS DATA PROTECTION AUDIT")
+        for r in results:
+            print(f"{_ICONS[r.status]} {titles[r.name]}: {r.message} ({r.duration_ms} ms)")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
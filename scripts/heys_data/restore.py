@@ -0,0 +1,335 @@
+"""
+Day restore primitives shared by the restore scripts.
+
+A restore is a stream of :class:`DayRow` (from a hand-exported backup or a
+daily snapshot) written to ``client_kv_store`` in batched upserts — one
+round trip per ``batch_size`` days instead of UPDATE-then-INSERT per day.
+Encrypted snapshot entries are written back as ciphertext (``v = '{}'``,
+``v_encrypted``, ``key_version``), exactly as the server stored them.
+
+Unchanged days are not rewritten: the server hashes what it holds
+(``md5(v::text)``, or ``md5(v_encrypted)`` for ciphertext) in one query per
+client, each row is hashed locally in the same ``jsonb::text`` rendering
+(:mod:`heys_data.jsonb`), and only differing days reach the upsert — no
+trigger work, no ``updated_at`` bump, no re-sync on devices for them.
+
+:func:`write_days_protected` is the safe write path: plaintext rows go
+through ``write_client_kv_values()`` (data-loss protection, health-key
+encryption, non-client key rejection) one batch per call.
+"""
+import base64
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from heys_data import backup_stream, db, snapshots
+from heys_data.days import DAY_KEY_LIKE, day_date, day_key
+from heys_data.jsonb import jsonb_md5, jsonb_text
+
+BATCH_SIZE = 200
+
+UPSERT_DAYS_SQL = """
+    INSERT INTO client_kv_store (client_id, k, v, v_encrypted, key_version, updated_at)
+    VALUES %s
+    ON CONFLICT (client_id, k) DO UPDATE SET
+      v = EXCLUDED.v,
+      v_encrypted = EXCLUDED.v_encrypted,
+      key_version = EXCLUDED.key_version,
+      updated_at = NOW()
+    RETURNING (xmax = 0) AS inserted
+"""
+UPSERT_DAYS_TEMPLATE = "(%s, %s, %s::jsonb, %s, %s, NOW())"
+
+WRITE_VALUES_SQL = "SELECT k, status FROM write_client_kv_values(%s, %s::jsonb)"
+
+DAY_HASHES_SQL = """
+    SELECT k, CASE WHEN v_encrypted IS NOT NULL THEN md5(v_encrypted) ELSE md5(v::text) END
+    FROM client_kv_store
+    WHERE client_id = %(client_id)s
+      AND k LIKE %(like)s
+      AND k >= %(k_from)s AND k <= %(k_to)s
+"""
+
+# "Touch": bump v.updatedAt server-side so client merge logic prefers the
+# row, without shipping the document. One statement for any number of
+# (client, key) pairs; encrypted rows (v = '{}') cannot be edited in place
+# and are reported instead. {touched} is the UPDATE, or for a dry run the
+# same row selection without writing.
+_TOUCH_ELIGIBLE = "s.v_encrypted IS NULL AND jsonb_typeof(s.v) = 'object'"
+_TOUCH_UPDATE = f"""
+    UPDATE client_kv_store s
+    SET v = jsonb_set(s.v, '{{updatedAt}}', to_jsonb(%(updated_at)s::bigint)),
+        updated_at = NOW()
+    FROM t
+    WHERE s.client_id = t.client_id AND s.k = t.k AND {_TOUCH_ELIGIBLE}
+    RETURNING s.client_id, s.k
+"""
+_TOUCH_PREVIEW = f"""
+    SELECT s.client_id, s.k
+    FROM client_kv_store s
+    JOIN t ON s.client_id = t.client_id AND s.k = t.k
+    WHERE {_TOUCH_ELIGIBLE}
+"""
+TOUCH_DAYS_SQL = """
+    WITH t AS (
+      SELECT * FROM unnest(%(client_ids)s::uuid[], %(keys)s::text[]) AS t(client_id, k)
+    ),
+    touched AS ({touched})
+    SELECT t.client_id::text, t.k,
+           CASE WHEN touched.k IS NOT NULL THEN 'touched'
+                WHEN s.k IS NULL THEN 'missing'
+                WHEN s.v_encrypted IS NOT NULL THEN 'encrypted'
+                ELSE 'not_object' END,
+           s.v->>'updatedAt'
+    FROM t
+    LEFT JOIN touched ON touched.client_id = t.client_id AND touched.k = t.k
+    LEFT JOIN client_kv_store s ON s.client_id = t.client_id AND s.k = t.k
+    ORDER BY t.client_id, t.k
+"""
+
+
+@dataclass(frozen=True)
+class DayRow:
+    """One day to restore; ``value`` is None for encrypted rows."""
+
+    date: str
+    value: object = None
+    v_encrypted: bytes = None
+    key_version: int = None
+
+    @property
+    def key(self):
+        return day_key(self.date)
+
+    @property
+    def encrypted(self):
+        return self.v_encrypted is not None
+
+    @property
+    def meals(self):
+        if self.encrypted or not isinstance(self.value, dict):
+            return None
+        meals = self.value.get("meals")
+        return len(meals) if isinstance(meals, list) else 0
+
+    def payload(self):
+        return "{}" if self.encrypted else jsonb_text(self.value)
+
+    @property
+    def content_hash(self):
+        """Same value as the server side of :data:`DAY_HASHES_SQL`."""
+        if self.encrypted:
+            return hashlib.md5(self.v_encrypted).hexdigest()
+        return jsonb_md5(self.value)
+
+
+@dataclass
+class RestoreResult:
+    client_id: str
+    source: str = ""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    unchanged: int = 0
+    blocked: int = 0
+    dry_run: bool = False
+    duration_sec: float = 0.0
+
+    @property
+    def written(self):
+        return self.inserted + self.updated
+
+    def as_dict(self):
+        return {
+            "client_id": self.client_id,
+            "source": self.source,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "unchanged": self.unchanged,
+            "blocked": self.blocked,
+            "dry_run": self.dry_run,
+            "duration_sec": self.duration_sec,
+        }
+
+
+@dataclass
+class TouchResult:
+    """Outcome per (client, key); ``previous`` is the old ``v.updatedAt``."""
+
+    updated_at: int
+    dry_run: bool = False
+    touched: list = field(default_factory=list)  # (client_id, key, previous)
+    missing: list = field(default_factory=list)
+    encrypted: list = field(default_factory=list)
+    not_object: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            "updated_at": self.updated_at,
+            "dry_run": self.dry_run,
+            "touched": len(self.touched),
+            "missing": [list(p) for p in self.missing],
+            "encrypted": [list(p) for p in self.encrypted],
+            "not_object": [list(p) for p in self.not_object],
+        }
+
+
+# Numbers are parsed as Decimal so they are written (and hashed) with the
+# digits the backup has — float round-trips would turn 1.50 into 1.5 and make
+# every such day look changed.
+def rows_from_backup(path, since=None, until=None):
+    """Stream :class:`DayRow` from a hand-exported ``heys-backup-*.json[.gz]``."""
+    for date, day in backup_stream.iter_days(path, since, until, parse_float=Decimal):
+        yield DayRow(date, value=day)
+
+
+def rows_from_snapshot(source, business_date, client_id, since=None, until=None):
+    """Stream :class:`DayRow` from a daily snapshot, ciphertext included."""
+    with snapshots.open_snapshot(source, business_date, client_id) as fp:
+        for date, entry in snapshots.iter_day_entries(fp, since, until, parse_float=Decimal):
+            row = entry_row(date, entry)
+            if row is not None:
+                yield row
+
+
+def entry_row(date, entry):
+    """:class:`DayRow` for a snapshot entry; None for an entry without content."""
+    if entry.encrypted:
+        return DayRow(
+            date,
+            v_encrypted=base64.b64decode(entry.v_encrypted_b64),
+            key_version=entry.key_version,
+        )
+    if entry.value is not None:
+        return DayRow(date, value=entry.value)
+    return None
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fetch_day_hashes(cur, client_id, since=None, until=None):
+    """``{key: md5}`` of the client's stored days — hashes only, not values."""
+    k_from = day_key(since or "0000-00-00")
+    k_to = day_key(until or "9999-99-99")
+    cur.execute(DAY_HASHES_SQL, {
+        "client_id": client_id, "like": DAY_KEY_LIKE, "k_from": k_from, "k_to": k_to,
+    })
+    return dict(cur.fetchall())
+
+
+def changed_rows(rows, server_hashes, result):
+    """Drop rows whose content the server already holds; counts them as unchanged."""
+    for row in rows:
+        if server_hashes.get(row.key) == row.content_hash:
+            result.unchanged += 1
+        else:
+            yield row
+
+
+def upsert_days(cur, client_id, rows, result=None, batch_size=BATCH_SIZE, server_hashes=None):
+    """
+    Upsert ``rows`` for one client in batches; the caller owns the transaction.
+
+    With ``server_hashes`` (see :func:`fetch_day_hashes`) rows identical to
+    the stored ones are skipped. Returns a :class:`RestoreResult` with
+    inserted/updated counts (from ``xmax = 0``, i.e. whether the row version
+    is a fresh insert) and the number of unchanged days.
+    """
+    from psycopg2.extras import execute_values
+
+    result = result or RestoreResult(client_id)
+    if server_hashes is not None:
+        rows = changed_rows(rows, server_hashes, result)
+    for batch in batched(rows, batch_size):
+        values = [
+            (client_id, row.key, row.payload(), row.v_encrypted, row.key_version)
+            for row in batch
+        ]
+        flags = execute_values(
+            cur, UPSERT_DAYS_SQL, values, template=UPSERT_DAYS_TEMPLATE,
+            page_size=batch_size, fetch=True,
+        )
+        inserted = sum(1 for (flag,) in flags if flag)
+        result.inserted += inserted
+        result.updated += len(flags) - inserted
+    return result
+
+
+def _items_json(rows):
+    # payload() is already JSON text — splice it instead of re-encoding.
+    return "[" + ",".join(
+        '{"k":%s,"v":%s}' % (json.dumps(row.key), row.payload()) for row in rows
+    ) + "]"
+
+
+def write_days_protected(cur, client_id, rows, result=None, batch_size=BATCH_SIZE,
+                         server_hashes=None):
+    """
+    Write ``rows`` through ``write_client_kv_values()``, one call per batch.
+
+    Plaintext rows get the same protection as single-key writes: a day with
+    meals is not emptied (counted in ``blocked``), health keys are encrypted
+    when HEYS_ENCRYPTION_KEY is set. Encrypted snapshot rows are already
+    ciphertext and go through :func:`upsert_days` as is.
+    """
+    result = result or RestoreResult(client_id)
+    if server_hashes is not None:
+        rows = changed_rows(rows, server_hashes, result)
+    db.set_encryption_key(cur)
+    ciphertext = []
+    for batch in batched(rows, batch_size):
+        plain = [row for row in batch if not row.encrypted]
+        ciphertext += [row for row in batch if row.encrypted]
+        if not plain:
+            continue
+        cur.execute(WRITE_VALUES_SQL, (client_id, _items_json(plain)))
+        for _, status in cur.fetchall():
+            if status == "inserted":
+                result.inserted += 1
+            elif status == "updated":
+                result.updated += 1
+            else:
+                result.blocked += 1
+    if ciphertext:
+        upsert_days(cur, client_id, ciphertext, result, batch_size)
+    return result
+
+
+def touch_days(cur, pairs, updated_at=None, dry_run=False):
+    """
+    Set ``v.updatedAt`` (ms) for ``(client_id, date_or_key)`` pairs in one
+    statement; the caller owns the transaction. ``dry_run`` runs the same
+    selection without the UPDATE. Returns a :class:`TouchResult`.
+    """
+    updated_at = updated_at or int(time.time() * 1000)
+    keys = {}
+    for client_id, date_or_key in pairs:
+        date = day_date(date_or_key)
+        keys[(client_id.lower(), day_key(date) if date else date_or_key)] = None
+    result = TouchResult(updated_at, dry_run)
+    if not keys:
+        return result
+    sql = TOUCH_DAYS_SQL.format(touched=_TOUCH_PREVIEW if dry_run else _TOUCH_UPDATE)
+    cur.execute(sql, {
+        "client_ids": [c for c, _ in keys],
+        "keys": [k for _, k in keys],
+        "updated_at": updated_at,
+    })
+    for client_id, key, status, previous in cur.fetchall():
+        if status == "touched":
+            result.touched.append((client_id, key, previous))
+        else:
+            getattr(result, status).append((client_id, key))
+    return result
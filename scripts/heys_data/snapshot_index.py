@@ -0,0 +1,259 @@
+"""
+History index over a client's daily snapshot series.
+
+The daily backup keeps up to 365 snapshots per client, and "which snapshot
+still had 5 meals on 2026-01-17" used to mean opening them one by one. The
+index scans the series once and keeps, per day key, only the points where the
+day's content changed:
+
+    {"2026-01-17": [["2026-01-18", "<md5>", 5],    # first seen
+                    ["2026-01-25", "<md5>", 0],    # overwritten
+                    ["2026-02-02", null, null]]}   # gone from snapshots
+
+Hashes are the same ``md5`` as :attr:`restore.DayRow.content_hash`, so they
+can be compared with the DB directly. Point-in-time questions are answered
+from the index alone; only the snapshots actually restored from are opened.
+Updating is incremental — only snapshots newer than the last indexed one are
+scanned.
+
+    cd scripts
+    python3 -m heys_data.snapshot_index s3://heys-backups/client-daily <clientId> build
+    python3 -m heys_data.snapshot_index <source> <clientId> history 2026-01-17
+    python3 -m heys_data.snapshot_index <source> <clientId> at 2026-01-17 2026-01-20
+    python3 -m heys_data.snapshot_index <source> <clientId> last 2026-01-17 --meals 5
+
+Restore a day as it was at some point: ``fleet_restore --as-of`` (see there).
+"""
+import argparse
+import bisect
+import gzip
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from heys_data import restore, snapshots
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIR = "snapshot-index"
+
+DayVersion = namedtuple("DayVersion", "snapshot_date content_hash meals")
+
+
+class SnapshotIndex:
+    """Change points of every day key across one client's snapshots."""
+
+    def __init__(self, client_id, snapshot_dates=None, days=None):
+        self.client_id = client_id
+        self.snapshot_dates = list(snapshot_dates or [])
+        self.days = days or {}  # date -> [[snapshot_date, hash, meals], ...]
+
+    def add_snapshot(self, snapshot_date, versions):
+        """
+        Record one snapshot; ``versions`` maps date -> (hash, meals).
+
+        Snapshots must be added in date order.
+        """
+        if self.snapshot_dates and snapshot_date <= self.snapshot_dates[-1]:
+            raise ValueError(f"snapshot {snapshot_date} is not newer than {self.snapshot_dates[-1]}")
+        self.snapshot_dates.append(snapshot_date)
+        for date, (content_hash, meals) in versions.items():
+            history = self.days.setdefault(date, [])
+            if not history or history[-1][1] != content_hash:
+                history.append([snapshot_date, content_hash, meals])
+        for date, history in self.days.items():
+            if date not in versions and history[-1][1] is not None:
+                history.append([snapshot_date, None, None])
+
+    def history(self, date):
+        """Change points of ``date`` as :class:`DayVersion` (deletions included)."""
+        return [DayVersion(*point) for point in self.days.get(date, [])]
+
+    def at(self, date, as_of=None):
+        """
+        Version of ``date`` in the latest snapshot on or before ``as_of``.
+
+        ``snapshot_date`` of the result is that snapshot; None if the day
+        was not in it.
+        """
+        snapshot_date = self._snapshot_on_or_before(as_of)
+        history = self.days.get(date)
+        if snapshot_date is None or not history:
+            return None
+        i = bisect.bisect_right([point[0] for point in history], snapshot_date) - 1
+        if i < 0 or history[i][1] is None:
+            return None
+        return DayVersion(snapshot_date, history[i][1], history[i][2])
+
+    def last_where(self, date, predicate, as_of=None):
+        """
+        Latest snapshot (on or before ``as_of``) whose version of ``date``
+        satisfies ``predicate(DayVersion)``, e.g. ``lambda v: v.meals == 5``.
+        """
+        history = self.days.get(date, [])
+        for i in range(len(history) - 1, -1, -1):
+            start, content_hash, meals = history[i]
+            if content_hash is None or (as_of and start > as_of):
+                continue
+            # The version holds until the next change point; its last snapshot
+            # is the one just before that (capped at as_of).
+            end = history[i + 1][0] if i + 1 < len(history) else None
+            last = self._last_snapshot_before(end, as_of)
+            version = DayVersion(last, content_hash, meals)
+            if predicate(version):
+                return version
+        return None
+
+    def _snapshot_on_or_before(self, as_of):
+        if as_of is None:
+            return self.snapshot_dates[-1] if self.snapshot_dates else None
+        i = bisect.bisect_right(self.snapshot_dates, as_of)
+        return self.snapshot_dates[i - 1] if i else None
+
+    def _last_snapshot_before(self, end, as_of):
+        i = bisect.bisect_left(self.snapshot_dates, end) if end else len(self.snapshot_dates)
+        if as_of:
+            i = min(i, bisect.bisect_right(self.snapshot_dates, as_of))
+        return self.snapshot_dates[i - 1]
+
+    def as_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "clientId": self.client_id,
+            "snapshots": self.snapshot_dates,
+            "days": self.days,
+        }
+
+    def save(self, path):
+        """Write gzipped JSON atomically (tmp file + rename)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported snapshot index version in {path}")
+        return cls(data["clientId"], data["snapshots"], data["days"])
+
+
+def index_path(index_dir, client_id):
+    return os.path.join(index_dir, client_id + ".json.gz")
+
+
+def scan_snapshot(source, snapshot_date, client_id):
+    """``{date: (hash, meals)}`` for every day key of one snapshot."""
+    versions = {}
+    with snapshots.open_snapshot(source, snapshot_date, client_id) as fp:
+        for date, entry in snapshots.iter_day_entries(fp, parse_float=Decimal):
+            row = restore.entry_row(date, entry)
+            if row is not None:
+                versions[date] = (row.content_hash, row.meals)
+    return versions
+
+
+def update_index(index, source, workers=4):
+    """Scan snapshots newer than the last indexed one; returns how many were added."""
+    last = index.snapshot_dates[-1] if index.snapshot_dates else ""
+    pending = [d for d in source.list_dates(index.client_id) if d > last]
+    # Downloads and gunzip overlap in threads; map() keeps snapshot order.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        scanned = executor.map(lambda d: scan_snapshot(source, d, index.client_id), pending)
+        for snapshot_date, versions in zip(pending, scanned):
+            index.add_snapshot(snapshot_date, versions)
+    return len(pending)
+
+
+def load_or_build(source, client_id, index_dir=DEFAULT_INDEX_DIR, workers=4):
+    """Load the client's index from ``index_dir``, bring it up to date, save it."""
+    path = index_path(index_dir, client_id)
+    index = SnapshotIndex.load(path) if os.path.exists(path) else SnapshotIndex(client_id)
+    if update_index(index, source, workers):
+        index.save(path)
+    return index
+
+
+def rows_as_of(source, index, since=None, until=None, as_of=None, nonempty=False):
+    """
+    Stream :class:`restore.DayRow` for each day in ``[since, until]`` as it
+    was at ``as_of`` — or, with ``nonempty``, the last version that still had
+    meals. Each needed snapshot is opened once, whatever the number of days.
+    """
+    plan = {}
+    for date in sorted(index.days):
+        if (since and date < since) or (until and date > until):
+            continue
+        if nonempty:
+            version = index.last_where(date, lambda v: v.meals, as_of)
+        else:
+            version = index.at(date, as_of)
+        if version is not None:
+            plan.setdefault(version.snapshot_date, set()).add(date)
+
+    for snapshot_date in sorted(plan):
+        wanted = plan[snapshot_date]
+        with snapshots.open_snapshot(source, snapshot_date, index.client_id) as fp:
+            entries = snapshots.iter_day_entries(fp, min(wanted), max(wanted), parse_float=Decimal)
+            for date, entry in entries:
+                if date in wanted:
+                    row = restore.entry_row(date, entry)
+                    if row is not None:
+                        yield row
+
+
+def _print_version(version, label=""):
+    if version is None:
+        print(f"{label}not found")
+    else:
+        meals = "encrypted" if version.meals is None else f"{version.meals} meals"
+        print(f"{label}{version.snapshot_date}  {meals}  {version.content_hash}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Point-in-time index over daily snapshots")
+    parser.add_argument("source", help="local mirror dir or s3://bucket/prefix")
+    parser.add_argument("client_id")
+    parser.add_argument("command", choices=["build", "history", "at", "last"])
+    parser.add_argument("date", nargs="?", help="day (YYYY-MM-DD)")
+    parser.add_argument("as_of", nargs="?", help="point in time for 'at' / upper bound for 'last'")
+    parser.add_argument("--meals", type=int, help="'last': version with exactly this many meals "
+                                                  "(default: any non-empty version)")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+    if args.command != "build" and not args.date:
+        parser.error(f"{args.command} needs a day")
+
+    source = snapshots.source_from_uri(args.source)
+    index = load_or_build(source, args.client_id, args.index_dir, args.workers)
+    if args.command == "build":
+        print(f"{len(index.snapshot_dates)} snapshot(s), {len(index.days)} day(s) -> "
+              f"{index_path(args.index_dir, args.client_id)}")
+    elif args.command == "history":
+        history = index.history(args.date)
+        for version in history:
+            if version.content_hash is None:
+                print(f"{version.snapshot_date}  removed")
+            else:
+                _print_version(version)
+        if not history:
+            print("not found")
+    elif args.command == "at":
+        _print_version(index.at(args.date, args.as_of))
+    else:
+        if args.meals is None:
+            predicate = lambda v: v.meals  # noqa: E731
+        else:
+            predicate = lambda v: v.meals == args.meals  # noqa: E731
+        _print_version(index.last_where(args.date, predicate, args.as_of))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""
+Content-addressed, deduplicated store for daily client snapshots.
+
+Consecutive snapshots of a client differ in a handful of keys, yet every one
+is a full gzipped JSON. Compaction splits each snapshot into per-key blobs
+named by content hash — a blob that is already stored is not written again —
+plus a small manifest that lists, in order, which blob goes where:
+
+    <store>/blobs/ab/ab12…ef.gz                       one kvSnapshot entry / accountData
+    <store>/manifests/<businessDate>/<clientId>.json.gz
+
+Blobs hold the entry re-serialised exactly as ``JSON.stringify`` in
+heys-client-daily-backup wrote it, so reassembly is byte-identical to the
+original snapshot and the embedded ``checksum`` verifies it. Reading back is
+a streaming reassembly: the store is a snapshot source like a local mirror or
+S3 (:func:`snapshots.source_from_uri` detects it), so ``compare_backup_db``,
+``fleet_restore`` and ``snapshot_index`` read it unchanged.
+
+    cd scripts
+    python3 -m heys_data.snapshot_store ./store compact s3://heys-backups/client-daily --since 2026-01-01
+    python3 -m heys_data.snapshot_store ./store cat <clientId> 2026-03-29 > snapshot.json
+    python3 -m heys_data.snapshot_store ./store stats
+    python3 -m heys_data.snapshot_store ./store gc          # after removing old manifests
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+from decimal import Decimal
+
+from heys_data import backup_stream, snapshots
+
+MANIFEST_FORMAT = 1
+MANIFEST_SUFFIX = ".json.gz"
+BLOB_SUFFIX = ".gz"
+
+_JS_ESCAPES = {'"': '\\"', "\\": "\\\\", "\b": "\\b", "\f": "\\f", "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_JS_NEEDS_ESCAPE = re.compile('["\\\\\x00-\x1f\ud800-\udfff]')
+_CHECKSUM_TAIL = re.compile(r',"checksum":"([0-9a-f]{64})"\}$')
+_CHECKSUM_TAIL_LEN = len(',"checksum":"') + 64 + 2
+
+
+class StoreError(Exception):
+    """Raised for missing blobs or a reassembly that fails its checksum."""
+
+
+# --- JSON.stringify-compatible serialisation ------------------------------
+
+def _js_escape(match):
+    char = match.group()
+    return _JS_ESCAPES.get(char) or "\\u%04x" % ord(char)
+
+
+def _js_string(value):
+    return '"' + _JS_NEEDS_ESCAPE.sub(_js_escape, value) + '"'
+
+
+def _js_number(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value) or math.isinf(value):
+        return "null"
+    if value == 0:
+        return "0"
+    # Number::toString: shortest round-trip digits (same as repr), laid out
+    # with an exponent only below 1e-6 or from 1e21 up.
+    sign, digits, exponent = Decimal(repr(value)).normalize().as_tuple()
+    s = "".join(map(str, digits))
+    k = len(s)
+    n = exponent + k
+    if k <= n <= 21:
+        text = s + "0" * (n - k)
+    elif 0 < n <= 21:
+        text = s[:n] + "." + s[n:]
+    elif -6 < n <= 0:
+        text = "0." + "0" * -n + s
+    else:
+        e = n - 1
+        text = s[0] + ("." + s[1:] if k > 1 else "") + "e" + ("+" if e > 0 else "-") + str(abs(e))
+    return ("-" if sign else "") + text
+
+
+def js_json(value):
+    """Serialise like ``JSON.stringify(value)`` (no indentation)."""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return _js_string(value)
+    if isinstance(value, (int, float)):
+        return _js_number(value)
+    if isinstance(value, dict):
+        return "{" + ",".join(_js_string(k) + ":" + js_json(v) for k, v in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + ",".join(js_json(v) for v in value) + "]"
+    raise TypeError(f"not JSON-serialisable: {type(value).__name__}")
+
+
+# --- store -----------------------------------------------------------------
+
+class SnapshotStore:
+    """A store directory; also a snapshot source (``list_dates`` / ``open_text``)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def __repr__(self):
+        return f"SnapshotStore({self.root!r})"
+
+    @staticmethod
+    def blob_hash(text):
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _blob_path(self, blob_hash):
+        return os.path.join(self.root, "blobs", blob_hash[:2], blob_hash + BLOB_SUFFIX)
+
+    def _manifest_path(self, business_date, client_id):
+        return os.path.join(self.root, "manifests", business_date, client_id + MANIFEST_SUFFIX)
+
+    def put_blob(self, text):
+        """Store ``text`` once; returns ``(hash, newly_written_bytes)``."""
+        blob_hash = self.blob_hash(text)
+        path = self._blob_path(blob_hash)
+        if os.path.exists(path):
+            return blob_hash, 0
+        _write_atomic(path, gzip.compress(text.encode("utf-8"), 6))
+        return blob_hash, os.path.getsize(path)
+
+    def get_blob(self, blob_hash):
+        try:
+            with open(self._blob_path(blob_hash), "rb") as f:
+                return gzip.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise StoreError(f"missing blob {blob_hash} in {self.root}") from None
+
+    def has_manifest(self, business_date, client_id):
+        return os.path.exists(self._manifest_path(business_date, client_id))
+
+    def put_manifest(self, business_date, client_id, sections):
+        manifest = {"format": MANIFEST_FORMAT, "sections": sections}
+        data = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        path = self._manifest_path(business_date, client_id)
+        _write_atomic(path, gzip.compress(data, 9))
+        return os.path.getsize(path)
+
+    def get_manifest(self, business_date, client_id):
+        with gzip.open(self._manifest_path(business_date, client_id), "rt", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise StoreError(f"unsupported manifest format for {client_id} {business_date}")
+        return manifest["sections"]
+
+    def iter_manifests(self):
+        """Yield ``(business_date, client_id)`` of every stored snapshot."""
+        base = os.path.join(self.root, "manifests")
+        for business_date in sorted(_listdir(base)):
+            for name in sorted(_listdir(os.path.join(base, business_date))):
+                if name.endswith(MANIFEST_SUFFIX):
+                    yield business_date, name[:-len(MANIFEST_SUFFIX)]
+
+    # snapshot source interface
+
+    def list_dates(self, client_id):
+        name = client_id + MANIFEST_SUFFIX
+        base = os.path.join(self.root, "manifests")
+        return sorted(d for d in _listdir(base) if os.path.isfile(os.path.join(base, d, name)))
+
+    def open_text(self, business_date, client_id):
+        """Reassembled snapshot JSON as a text stream; blobs are read as consumed."""
+        sections = self.get_manifest(business_date, client_id)
+        return _ChunkReader(self._reassemble(sections))
+
+    def _reassemble(self, sections):
+        yield "{"
+        for i, (name, kind, payload) in enumerate(sections):
+            yield ("," if i else "") + _js_string(name) + ":"
+            if kind == "inline":
+                yield payload
+            elif kind == "blob":
+                yield self.get_blob(payload)
+            else:  # "kv": [[key, hash], ...]
+                yield "{"
+                for j, (key, blob_hash) in enumerate(payload):
+                    yield ("," if j else "") + _js_string(key) + ":" + self.get_blob(blob_hash)
+                yield "}"
+        yield "}"
+
+
+class _ChunkReader(io.TextIOBase):
+    """Read-only text stream over a generator of string chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buf) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        if size is None or size < 0:
+            size = len(self._buf)
+        data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# --- compaction ------------------------------------------------------------
+
+def compact_snapshot(store, source, business_date, client_id, verify=True):
+    """
+    Split one snapshot into blobs + manifest. Returns a stats dict.
+
+    With ``verify`` the snapshot is reassembled from the store and checked
+    against its embedded ``checksum`` before the manifest is kept.
+    """
+    sections = []
+    stats = {"keys": 0, "new_blobs": 0, "new_bytes": 0}
+    with snapshots.open_snapshot(source, business_date, client_id) as fp:
+        for name, value in backup_stream.stream_object(fp):
+            if name == "kvSnapshot":
+                keys = []
+                for key, entry in value.members():
+                    blob_hash, written = store.put_blob(js_json(entry.load()))
+                    keys.append([key, blob_hash])
+                    stats["new_blobs"] += 1 if written else 0
+                    stats["new_bytes"] += written
+                sections.append([name, "kv", keys])
+                stats["keys"] = len(keys)
+            elif name == "accountData":
+                blob_hash, written = store.put_blob(js_json(value.load()))
+                sections.append([name, "blob", blob_hash])
+                stats["new_blobs"] += 1 if written else 0
+                stats["new_bytes"] += written
+            else:
+                sections.append([name, "inline", js_json(value.load())])
+    stats["manifest_bytes"] = store.put_manifest(business_date, client_id, sections)
+    if verify:
+        try:
+            verify_snapshot(store, business_date, client_id)
+        except StoreError:
+            os.remove(store._manifest_path(business_date, client_id))
+            raise
+    return stats
+
+
+def verify_snapshot(store, business_date, client_id):
+    """
+    Check a reassembled snapshot against its ``checksum`` (sha256 of the JSON
+    without the checksum member, as computed by the backup function).
+    Returns False if the snapshot carries no checksum.
+    """
+    digest = hashlib.sha256()
+    tail = ""
+    with store.open_text(business_date, client_id) as fp:
+        # Hash as we go, holding back enough for the checksum member at the end.
+        for chunk in iter(lambda: fp.read(backup_stream.CHUNK_SIZE), ""):
+            tail += chunk
+            if len(tail) > _CHECKSUM_TAIL_LEN:
+                digest.update(tail[:-_CHECKSUM_TAIL_LEN].encode("utf-8"))
+                tail = tail[-_CHECKSUM_TAIL_LEN:]
+    match = _CHECKSUM_TAIL.search(tail)
+    if not match:
+        return False
+    digest.update((tail[:match.start()] + "}").encode("utf-8"))
+    if digest.hexdigest() != match.group(1):
+        raise StoreError(f"checksum mismatch for {client_id} {business_date}")
+    return True
+
+
+def _source_snapshots(source, since=None, until=None, clients=None):
+    """``(business_date, client_id)`` pairs available in a mirror / S3 source."""
+    for business_date in source.list_business_dates():
+        if (since and business_date < since) or (until and business_date > until):
+            continue
+        for client_id in source.list_clients(business_date):
+            if not clients or client_id in clients:
+                yield business_date, client_id
+
+
+def gc(store):
+    """Delete blobs no manifest references; returns ``(blobs, bytes)`` freed."""
+    live = set()
+    for business_date, client_id in store.iter_manifests():
+        for _, kind, payload in store.get_manifest(business_date, client_id):
+            if kind == "blob":
+                live.add(payload)
+            elif kind == "kv":
+                live.update(blob_hash for _, blob_hash in payload)
+    freed = freed_bytes = 0
+    blobs_dir = os.path.join(store.root, "blobs")
+    for shard in _listdir(blobs_dir):
+        for name in _listdir(os.path.join(blobs_dir, shard)):
+            if name.endswith(BLOB_SUFFIX) and name[:-len(BLOB_SUFFIX)] not in live:
+                path = os.path.join(blobs_dir, shard, name)
+                freed_bytes += os.path.getsize(path)
+                os.remove(path)
+                freed += 1
+    return freed, freed_bytes
+
+
+def _dir_size(path):
+    total = count = 0
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            total += os.path.getsize(os.path.join(dirpath, name))
+            count += 1
+    return count, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicated daily-snapshot store")
+    parser.add_argument("store", help="store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="import snapshots from a mirror or S3")
+    compact.add_argument("source", help="local mirror dir or s3://bucket/prefix")
+    compact.add_argument("--client", action="append", default=[], help="only these clients")
+    compact.add_argument("--since", help="first businessDate")
+    compact.add_argument("--until", help="last businessDate")
+    compact.add_argument("--no-verify", action="store_true", help="skip checksum verification")
+    cat = sub.add_parser("cat", help="write a reassembled snapshot to stdout")
+    cat.add_argument("client_id")
+    cat.add_argument("business_date")
+    sub.add_parser("stats", help="manifest / blob counts and sizes")
+    sub.add_parser("gc", help="delete unreferenced blobs")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.store)
+    if args.command == "compact":
+        source = snapshots.source_from_uri(args.source)
+        clients = {c.lower() for c in args.client}
+        done = skipped = failed = new_bytes = 0
+        for business_date, client_id in _source_snapshots(source, args.since, args.until, clients):
+            if store.has_manifest(business_date, client_id):
+                skipped += 1
+                continue
+            try:
+                stats = compact_snapshot(store, source, business_date, client_id, not args.no_verify)
+            except (StoreError, backup_stream.BackupFormatError, OSError) as err:
+                failed += 1
+                print(f"  {business_date}/{client_id}: FAILED — {err}", file=sys.stderr)
+                continue
+            done += 1
+            new_bytes += stats["new_bytes"] + stats["manifest_bytes"]
+            print(f"  {business_date}/{client_id}: {stats['keys']} keys, "
+                  f"{stats['new_blobs']} new blob(s), {stats['new_bytes'] + stats['manifest_bytes']} B")
+        print(f"Compacted {done}, already stored {skipped}, failed {failed}; {new_bytes} B written")
+        return 1 if failed else 0
+    if args.command == "cat":
+        with store.open_text(args.business_date, args.client_id) as fp:
+            for chunk in iter(lambda: fp.read(backup_stream.CHUNK_SIZE), ""):
+                sys.stdout.write(chunk)
+        return 0
+    if args.command == "stats":
+        manifests, manifest_bytes = _dir_size(os.path.join(store.root, "manifests"))
+        blobs, blob_bytes = _dir_size(os.path.join(store.root, "blobs"))
+        print(json.dumps({
+            "manifests": manifests, "manifest_bytes": manifest_bytes,
+            "blobs": blobs, "blob_bytes": blob_bytes,
+        }, indent=2))
+        return 0
+    freed, freed_bytes = gc(store)
+    print(f"Removed {freed} unreferenced blob(s), {freed_bytes} B")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Reader for heys-client-daily-backup snapshots.
+
+The daily backup function writes ``<prefix>/<businessDate>/<clientId>.json.gz``
+(gzip level 9, schema v2, see yandex-cloud-functions/heys-client-daily-backup).
+This module reads them straight from
+
+* a local mirror directory (``aws s3 sync s3://heys-backups/client-daily ./mirror``), or
+* any S3-compatible endpoint — Yandex Object Storage, or MinIO for drills,
+
+and decompresses them as a stream: ``kvSnapshot`` entries are handed out one
+at a time via :mod:`heys_data.backup_stream`, the full JSON is never built.
+
+Sources are addressed by URI:
+
+    /var/backups/heys/client-daily            local mirror
+    /var/backups/heys/store                   deduplicated store (heys_data.snapshot_store)
+    s3://heys-backups/client-daily            S3 (S3_ENDPOINT / S3_ACCESS_KEY_ID /
+                                              S3_SECRET_ACCESS_KEY from env, as in
+                                              the cloud function)
+
+CLI (replaces the manual ``aws s3 cp`` + ``gunzip | jq`` step):
+
+    python3 -m heys_data.snapshots <source> list <clientId>
+    python3 -m heys_data.snapshots <source> show <clientId> [--date D]
+    python3 -m heys_data.snapshots <source> days <clientId> [--date D] > backup.json
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+from heys_data import backup_stream
+from heys_data.days import day_date
+
+SNAPSHOT_SUFFIX = ".json.gz"
+
+
+@dataclass(frozen=True)
+class SnapshotEntry:
+    """One ``kvSnapshot`` entry. Encrypted keys carry ciphertext only."""
+
+    key: str
+    value: object = None
+    v_encrypted_b64: str = None
+    key_version: int = None
+    updated_at: str = None
+
+    @property
+    def encrypted(self):
+        return self.v_encrypted_b64 is not None
+
+
+class LocalMirror:
+    """Snapshots mirrored to a local directory (same layout as the bucket)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def __repr__(self):
+        return f"LocalMirror({self.root!r})"
+
+    def list_dates(self, client_id):
+        name = client_id + SNAPSHOT_SUFFIX
+        try:
+            entries = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(d for d in entries if os.path.isfile(os.path.join(self.root, d, name)))
+
+    def list_business_dates(self):
+        try:
+            return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+        except FileNotFoundError:
+            return []
+
+    def list_clients(self, business_date):
+        try:
+            names = os.listdir(os.path.join(self.root, business_date))
+        except FileNotFoundError:
+            return []
+        return sorted(n[:-len(SNAPSHOT_SUFFIX)] for n in names if n.endswith(SNAPSHOT_SUFFIX))
+
+    def open_raw(self, business_date, client_id):
+        return open(os.path.join(self.root, business_date, client_id + SNAPSHOT_SUFFIX), "rb")
+
+
+class S3Source:
+    """Snapshots in an S3-compatible bucket; boto3 is imported on first use."""
+
+    def __init__(self, bucket, prefix="client-daily", endpoint_url=None, client=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url or os.environ.get(
+            "S3_ENDPOINT", "https://storage.yandexcloud.net"
+        )
+        self._client = client
+
+    def __repr__(self):
+        return f"S3Source(s3://{self.bucket}/{self.prefix})"
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=self.endpoint_url,
+                region_name="ru-central1",
+                aws_access_key_id=os.environ.get("S3_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.environ.get("S3_SECRET_ACCESS_KEY"),
+            )
+        return self._client
+
+    def _key(self, business_date, client_id):
+        return f"{self.prefix}/{business_date}/{client_id}{SNAPSHOT_SUFFIX}"
+
+    def list_dates(self, client_id):
+        name = "/" + client_id + SNAPSHOT_SUFFIX
+        dates = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + "/"):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith(name):
+                    dates.append(obj["Key"][len(self.prefix) + 1:-len(name)])
+        return sorted(dates)
+
+    def _list_level(self, prefix):
+        """One "directory" level: ``(subdirs, object names)`` under ``prefix``."""
+        dirs, names = [], []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            dirs += [p["Prefix"][len(prefix):].rstrip("/") for p in page.get("CommonPrefixes", [])]
+            names += [obj["Key"][len(prefix):] for obj in page.get("Contents", [])]
+        return dirs, names
+
+    def list_business_dates(self):
+        return sorted(self._list_level(self.prefix + "/")[0])
+
+    def list_clients(self, business_date):
+        names = self._list_level(f"{self.prefix}/{business_date}/")[1]
+        return sorted(n[:-len(SNAPSHOT_SUFFIX)] for n in names if n.endswith(SNAPSHOT_SUFFIX))
+
+    def open_raw(self, business_date, client_id):
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(business_date, client_id))
+        return response["Body"]
+
+
+def source_from_uri(uri):
+    """Build a snapshot source from a local path or ``s3://bucket/prefix`` URI."""
+    if uri.startswith("s3://"):
+        bucket, _, prefix = uri[len("s3://"):].partition("/")
+        return S3Source(bucket, prefix or "client-daily")
+    if os.path.isdir(os.path.join(uri, "manifests")):
+        from heys_data.snapshot_store import SnapshotStore
+
+        return SnapshotStore(uri)
+    return LocalMirror(uri)
+
+
+def resolve_date(source, client_id, business_date=None, on_or_before=None):
+    """
+    Pick a snapshot date for ``client_id``.
+
+    An exact ``business_date`` is returned as is; otherwise the latest snapshot
+    (optionally the latest one on or before ``on_or_before``) is chosen.
+    """
+    if business_date:
+        return business_date
+    dates = source.list_dates(client_id)
+    if on_or_before:
+        dates = [d for d in dates if d <= on_or_before]
+    if not dates:
+        raise FileNotFoundError(f"no snapshot for client {client_id} in {source!r}")
+    return dates[-1]
+
+
+def open_snapshot(source, business_date, client_id):
+    """Text stream over the decompressed snapshot JSON (decompressed lazily)."""
+    if hasattr(source, "open_text"):  # SnapshotStore reassembles text itself
+        return source.open_text(business_date, client_id)
+    raw = source.open_raw(business_date, client_id)
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode="rb"), encoding="utf-8")
+
+
+def _entry(key, raw):
+    return SnapshotEntry(
+        key=key,
+        value=raw.get("v"),
+        v_encrypted_b64=raw.get("v_encrypted_b64"),
+        key_version=raw.get("key_version"),
+        updated_at=raw.get("updated_at"),
+    )
+
+
+def iter_entries(fp, key_prefix=None, parse_float=None):
+    """Yield :class:`SnapshotEntry` for ``kvSnapshot`` keys (optionally by prefix)."""
+    for section, value in backup_stream.stream_object(fp, parse_float=parse_float):
+        if section != "kvSnapshot":
+            continue
+        for key, raw in value.members():
+            if key_prefix is None or key.startswith(key_prefix):
+                yield _entry(key, raw.load())
+        return
+
+
+def iter_day_entries(fp, since=None, until=None, parse_float=None):
+    """Yield ``(date, SnapshotEntry)`` for day keys, encrypted ones included."""
+    for section, value in backup_stream.stream_object(fp, parse_float=parse_float):
+        if section != "kvSnapshot":
+            continue
+        for key, raw in value.members():
+            date = day_date(key)
+            if date is None or (since and date < since) or (until and date > until):
+                continue
+            yield date, _entry(key, raw.load())
+        return
+
+
+def iter_days(fp, since=None, until=None, parse_float=None):
+    """
+    ``(date, day_data)`` pairs — same shape as :func:`backup_stream.iter_days`.
+
+    Encrypted days have no plaintext in the snapshot and are skipped here;
+    use :func:`iter_day_entries` to restore their ciphertext as is.
+    """
+    for date, entry in iter_day_entries(fp, since, until, parse_float):
+        if not entry.encrypted:
+            yield date, entry.value
+
+
+def load_header(fp):
+    """Snapshot metadata (everything except ``kvSnapshot`` / ``accountData``)."""
+    header = {}
+    for section, value in backup_stream.stream_object(fp):
+        if section not in ("kvSnapshot", "accountData"):
+            header[section] = value.load()
+    return header
+
+
+def _write_days_export(fp, client_id, out):
+    """Stream snapshot days out in the hand-export shape restore scripts read."""
+    out.write('{"clientId": %s, "days": {' % json.dumps(client_id))
+    skipped = 0
+    first = True
+    for date, entry in iter_day_entries(fp):
+        if entry.encrypted:
+            skipped += 1
+            continue
+        out.write(("" if first else ",") + "\n  %s: %s" % (json.dumps(date), json.dumps(entry.value, ensure_ascii=False)))
+        first = False
+    out.write("\n}}\n")
+    return skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect heys-client-daily-backup snapshots")
+    parser.add_argument("source", help="local mirror dir or s3://bucket/prefix")
+    parser.add_argument("command", choices=["list", "show", "days"])
+    parser.add_argument("client_id")
+    parser.add_argument("--date", help="businessDate (default: latest)")
+    parser.add_argument("--on-or-before", help="latest snapshot on or before this date")
+    args = parser.parse_args(argv)
+
+    source = source_from_uri(args.source)
+    if args.command == "list":
+        for business_date in source.list_dates(args.client_id):
+            print(business_date)
+        return 0
+
+    business_date = resolve_date(source, args.client_id, args.date, args.on_or_before)
+    with open_snapshot(source, business_date, args.client_id) as fp:
+        if args.command == "show":
+            header = {}
+            keys = []
+            for section, value in backup_stream.stream_object(fp):
+                if section == "kvSnapshot":
+                    keys = [key for key, _ in value.members()]
+                elif section != "accountData":
+                    header[section] = value.load()
+            header["keys"] = keys
+            json.dump(header, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        else:
+            skipped = _write_days_export(fp, args.client_id, sys.stdout)
+            if skipped:
+                print(f"{skipped} encrypted day(s) skipped", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
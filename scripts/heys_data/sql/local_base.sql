@@ -0,0 +1,94 @@
+-- Minimal production-shaped base for a scratch local Postgres (heys_data.localpg).
+--
+-- Only what the KV write migrations in localpg.KV_MIGRATIONS expect to exist
+-- before they run: roles they GRANT to, pgcrypto, the tables they touch and the
+-- helpers defined outside database/ (is_health_key) or in migrations that need
+-- the full app schema (get_effective_subscription_status, revision trigger).
+-- Everything else is applied from the real migration files on top.
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'heys_admin') THEN CREATE ROLE heys_admin; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'heys_rpc') THEN CREATE ROLE heys_rpc; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'heys_rest') THEN CREATE ROLE heys_rest; END IF;
+END
+$$;
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+CREATE TABLE IF NOT EXISTS public.clients (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  name TEXT,
+  subscription_status TEXT NOT NULL DEFAULT 'active',
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.client_sessions (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  client_id UUID NOT NULL REFERENCES public.clients(id) ON DELETE CASCADE,
+  token_hash BYTEA NOT NULL UNIQUE,
+  expires_at TIMESTAMPTZ NOT NULL,
+  revoked_at TIMESTAMPTZ,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE SEQUENCE IF NOT EXISTS public.client_kv_revision_seq AS bigint;
+
+CREATE TABLE IF NOT EXISTS public.client_kv_store (
+  client_id UUID NOT NULL,
+  k TEXT NOT NULL,
+  v JSONB NOT NULL DEFAULT '{}'::jsonb,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  user_id UUID,
+  revision BIGINT NOT NULL DEFAULT nextval('public.client_kv_revision_seq'),
+  PRIMARY KEY (client_id, k)
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_kv_store_client_revision
+  ON public.client_kv_store (client_id, revision DESC);
+
+-- Status lives on clients here; production derives it from subscriptions.
+CREATE OR REPLACE FUNCTION public.get_effective_subscription_status(p_client_id uuid)
+RETURNS text
+LANGUAGE sql
+STABLE
+AS $function$
+  SELECT subscription_status FROM public.clients WHERE id = p_client_id;
+$function$;
+
+-- Stand-in for the production helper (not in database/): day documents and profile
+-- data count as health keys, so encryption paths are exercised when a key is set.
+CREATE OR REPLACE FUNCTION public.is_health_key(p_key text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE
+AS $function$
+  SELECT regexp_replace(coalesce(p_key, ''), '^heys_[0-9a-f-]{36}_', 'heys_', 'i')
+    ~ '^heys_(dayv2_[0-9]{4}-[0-9]{2}-[0-9]{2}|profile|hr_zones)$';
+$function$;
+
+-- Content-change revision bump, as 2026-06-03_kv_server_revision_L1.sql (without change
+-- markers). key_version / v_encrypted come from 2026-01-24_encryption_phase2.sql.
+CREATE OR REPLACE FUNCTION public.bump_client_kv_revision()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $function$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    NEW.revision := nextval('public.client_kv_revision_seq');
+  ELSIF NEW.v IS DISTINCT FROM OLD.v
+     OR NEW.user_id IS DISTINCT FROM OLD.user_id
+     OR NEW.key_version IS DISTINCT FROM OLD.key_version
+     OR NEW.v_encrypted IS DISTINCT FROM OLD.v_encrypted THEN
+    NEW.revision := nextval('public.client_kv_revision_seq');
+  ELSE
+    NEW.revision := OLD.revision;
+  END IF;
+  RETURN NEW;
+END;
+$function$;
+
+DROP TRIGGER IF EXISTS trg_bump_client_kv_revision ON public.client_kv_store;
+CREATE TRIGGER trg_bump_client_kv_revision
+BEFORE INSERT OR UPDATE ON public.client_kv_store
+FOR EACH ROW EXECUTE FUNCTION public.bump_client_kv_revision();
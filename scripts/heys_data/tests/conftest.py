@@ -0,0 +1,84 @@
+"""
+Local Postgres fixtures (see heys_data.localpg).
+
+``pg`` is a connection to a fresh database cloned from a template that was
+provisioned once per test process with the real KV migrations and a small
+fixture. Cloning takes milliseconds, so every test gets its own database and
+the suite runs in parallel (``pytest -n auto`` with pytest-xdist). Tests
+using it are skipped without psycopg2 or HEYS_PG_DSN.
+"""
+import itertools
+import json
+import os
+
+import pytest
+
+from heys_data import localpg
+
+ACTIVE_CLIENT = "ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a"
+ACTIVE_TOKEN = "test-session-active"
+INACTIVE_CLIENT = "4545ee50-0000-4000-8000-000000000001"
+INACTIVE_TOKEN = "test-session-inactive"
+DAY_KEY = "heys_dayv2_2026-01-17"
+DAY_UPDATED_MS = 1769300000000
+
+FIXTURE_SQL = """
+    INSERT INTO clients (id, name, subscription_status) VALUES
+      (%(active)s, 'Active client', 'active'),
+      (%(inactive)s, 'No subscription', 'none');
+    INSERT INTO client_sessions (client_id, token_hash, expires_at) VALUES
+      (%(active)s, digest(%(active_token)s, 'sha256'), 'infinity'),
+      (%(inactive)s, digest(%(inactive_token)s, 'sha256'), 'infinity');
+    INSERT INTO client_kv_store (client_id, k, v) VALUES
+      (%(active)s, %(day_key)s, %(day)s::jsonb);
+"""
+
+_databases = itertools.count()
+
+
+def _process_tag():
+    return f"{os.environ.get('PYTEST_XDIST_WORKER', 'main')}_{os.getpid()}"
+
+
+@pytest.fixture(scope="session")
+def pg_template():
+    """Name of this process's pre-migrated template database."""
+    psycopg2 = pytest.importorskip("psycopg2")
+    if not os.environ.get("HEYS_PG_DSN"):
+        pytest.skip("HEYS_PG_DSN (local Postgres) not set")
+
+    name = f"heys_test_tpl_{_process_tag()}"
+    conn = psycopg2.connect(localpg.provision(name))
+    try:
+        with conn.cursor() as cur:
+            cur.execute(FIXTURE_SQL, {
+                "active": ACTIVE_CLIENT, "inactive": INACTIVE_CLIENT,
+                "active_token": ACTIVE_TOKEN, "inactive_token": INACTIVE_TOKEN,
+                "day_key": DAY_KEY,
+                "day": json.dumps(localpg.day_document("2026-01-17", 3, updated_ms=DAY_UPDATED_MS)),
+            })
+        conn.commit()
+    finally:
+        conn.close()  # a template must have no connections to be cloned
+    yield name
+    localpg.drop_database(name)
+
+
+@pytest.fixture(scope="session")
+def _clone_strategy(pg_template):
+    return "FILE_COPY" if localpg.server_version() >= 150000 else None
+
+
+@pytest.fixture
+def pg(pg_template, _clone_strategy):
+    """psycopg2 connection to a private clone of the template; dropped afterwards."""
+    import psycopg2
+
+    name = f"heys_test_{_process_tag()}_{next(_databases)}"
+    localpg.create_database(name, template=pg_template, strategy=_clone_strategy)
+    conn = psycopg2.connect(localpg.dsn_for(name))
+    try:
+        yield conn
+    finally:
+        conn.close()
+        localpg.drop_database(name)
@@ -0,0 +1,16 @@
+"""Shared product fixtures for the catalog tests; each test file keeps its own default rows."""
+import datetime
+
+from heys_data import catalog, catalog_matrix
+
+EXPORT_DATE = datetime.date(2026, 10, 19)
+
+
+def pid(n):
+    return f"00000000-0000-0000-0000-{n:012d}"
+
+
+def catalog_matrix_of(products, fields):
+    """In-memory :class:`~heys_data.catalog_matrix.CatalogMatrix` of ``products`` (dicts) over ``fields``."""
+    meta = catalog.make_meta(len(products), fields, EXPORT_DATE)
+    return catalog_matrix.CatalogMatrix(catalog_matrix.pack(meta, iter(products), len(products), fields))
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+from heys_data import audit_rollups
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params):
+        self.conn.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.conn.results.pop(0)
+
+    def fetchall(self):
+        return self.conn.results.pop(0)
+
+
+class FakeConn:
+    def __init__(self, results):
+        self.results = results
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_refresh_loops_until_a_partial_batch():
+    conn = FakeConn([(3, 103), (3, 106), (1, 107)])
+
+    assert audit_rollups.refresh(conn, batch=3) == (7, 107)
+    assert conn.commits == 3
+
+
+def test_summary_reads_rollups_only():
+    at = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+    conn = FakeConn([[("aaaaaaaa-0000-0000-0000-000000000001", 4, 1, ["overwrite_blocked"], at)]])
+
+    (row,) = audit_rollups.summary(conn.cursor(), hours=6)
+
+    assert row == {
+        "client_id": "aaaaaaaa-0000-0000-0000-000000000001", "blocked": 4, "allowed": 1,
+        "actions": ["overwrite_blocked"], "last_event_at": "2026-10-19T12:00:00+00:00",
+    }
+    assert "data_loss_audit " not in conn.executed[0][0] and conn.executed[0][1] == (6,)
+
+
+def test_client_hourly_adds_the_unrolled_tail_without_refreshing():
+    at = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+    conn = FakeConn([[(at, "overwrite_blocked", False, 3)]])
+
+    rows = audit_rollups.client_hourly(conn.cursor(), "aaaaaaaa-0000-0000-0000-000000000001")
+
+    assert rows == [(at, "overwrite_blocked", False, 3)]
+    sql, params = conn.executed[0]
+    assert "a.id > " in sql and "refresh_data_loss_audit_rollups" not in sql
+    assert params == {"client_id": "aaaaaaaa-0000-0000-0000-000000000001", "hours": 24}
+    assert conn.commits == 0
@@ -0,0 +1,86 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from heys_data import backup_stream
+
+BACKUP = {
+    "schemaVersion": 3,
+    "clientId": "ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a",
+    "overlayProducts": [{"name": "Сыр {\"x\"} ]", "kcal": 350.5}, {"name": "a\\\\"}],
+    "days": {
+        "2026-01-08": {"meals": [{"items": [{"grams": 120}]}], "updatedAt": 1769356000000},
+        "heys_dayv2_2026-01-09": {"meals": [], "note": "} ] \" {"},
+        "heys_dayv2_2026-02-01": {"meals": [{}, {}]},
+    },
+    "kv": {"heys_profile": {"weight": 81.25, "flags": [True, False, None]}},
+    "stats": None,
+}
+
+
+def _fp(data=BACKUP, **kwargs):
+    return io.StringIO(json.dumps(data, ensure_ascii=False, **kwargs))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_stream_object_matches_json_load(chunk_size):
+    loaded = {}
+    for key, value in backup_stream.stream_object(_fp(indent=2), chunk_size=chunk_size):
+        if key == "days":
+            loaded[key] = {k: v.load() for k, v in value.members()}
+        elif key == "overlayProducts":
+            loaded[key] = [item.load() for item in value.elements()]
+        else:
+            loaded[key] = value.load()
+    assert loaded == BACKUP
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_untouched_values_are_skipped(chunk_size):
+    keys = [key for key, _ in backup_stream.stream_object(_fp(), chunk_size=chunk_size)]
+    assert keys == list(BACKUP)
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 41))
+def test_numbers_split_at_the_window_edge(chunk_size):
+    floats = {"w": 72.4, "e": 1.5e-07, "n": -3, "t": True}
+    loaded = {k: v.load() for k, v in backup_stream.stream_object(_fp(floats), chunk_size=chunk_size)}
+    assert loaded == floats
+    keys = [key for key, _ in backup_stream.stream_object(_fp(floats), chunk_size=chunk_size)]
+    assert keys == list(floats)
+
+
+def test_partially_iterated_members_are_drained():
+    stream = backup_stream.stream_object(_fp(), chunk_size=3)
+    seen = []
+    for key, value in stream:
+        seen.append(key)
+        if key == "days":
+            first_key, _ = next(value.members())
+            assert first_key == "2026-01-08"
+    assert seen == list(BACKUP)
+
+
+def test_iter_days_normalises_keys_and_filters_range():
+    days = list(backup_stream.iter_days(_fp(), until="2026-01-31"))
+    assert [d for d, _ in days] == ["2026-01-08", "2026-01-09"]
+    assert days[0][1]["updatedAt"] == 1769356000000
+
+
+def test_open_backup_gunzips(tmp_path):
+    path = tmp_path / "heys-backup-ccfe6ea3.json.gz"
+    path.write_bytes(gzip.compress(json.dumps(BACKUP).encode("utf-8")))
+    assert backup_stream.load_sections(str(path), ["clientId", "stats"]) == {
+        "clientId": BACKUP["clientId"],
+        "stats": None,
+    }
+
+
+def test_consumed_value_cannot_be_read_twice():
+    for key, value in backup_stream.stream_object(_fp()):
+        value.load()
+        with pytest.raises(backup_stream.BackupFormatError):
+            value.load()
+        break
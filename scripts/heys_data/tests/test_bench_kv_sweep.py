@@ -0,0 +1,130 @@
+import csv
+import os
+
+from heys_data import bench_kv_sweep as sweep
+from heys_data import bench_kv_writes as bench
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        self.sql = sql
+        self.conn.executed.append(sql)
+
+    def fetchone(self):
+        if self.sql == sweep.PROBE_SQL:
+            return self.conn.samples.pop(0) if self.conn.samples else (0, 0)
+        if self.sql == sweep.DEADLOCKS_SQL:
+            return (self.conn.deadlocks.pop(0),)
+        if self.sql == "SELECT pg_backend_pid()":
+            return (1000 + self.conn.number,)
+        return ({"success": True, "saved": 2, "rejected": 0},)
+
+
+class FakeConn:
+    count = 0
+
+    def __init__(self, samples=(), deadlocks=(0, 0)):
+        FakeConn.count += 1
+        self.number = FakeConn.count
+        self.samples = list(samples)
+        self.deadlocks = list(deadlocks)
+        self.executed = []
+        self.autocommit = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def row(batch, items_per_sec, p95, payload=3, sessions=4, **extra):
+    return {"batch": batch, "payload": payload, "sessions": sessions, "items_per_sec": items_per_sec,
+            "p95_ms": p95, "errors": 0, "failed": 0, "calls_per_sec": items_per_sec / batch,
+            "mean_ms": p95 / 2, **extra}
+
+
+def test_proc_cpu_seconds_reads_own_process():
+    assert sweep.proc_cpu_seconds(os.getpid()) >= 0
+    assert sweep.proc_cpu_seconds(2 ** 30) is None
+
+
+def test_server_probe_reports_lock_waits_cpu_and_deadlocks():
+    cpu = {11: [1.0, 3.0], 12: [2.0, 2.5]}
+    probe = sweep.ServerProbe("dsn", interval=0.001,
+                              connect=lambda dsn: FakeConn(samples=[(2, 4), (0, 4), (1, 3)], deadlocks=[5, 6]),
+                              cpu_reader=lambda pid: cpu[pid].pop(0))
+    probe.start([11, 12])
+    while len(probe.samples) < 3:
+        pass
+    stats = probe.stop()
+    assert stats["lock_waits_max"] == 2
+    assert stats["lock_wait_ratio"] <= 1
+    assert stats["deadlocks"] == 1
+    assert stats["server_cpu_sec"] == 2.5
+    assert probe.conn.closed
+    probe.close()  # idempotent after stop()
+
+
+def test_server_probe_close_before_start_frees_the_connection():
+    probe = sweep.ServerProbe("dsn", connect=lambda dsn: FakeConn(samples=[], deadlocks=[0]))
+    probe.close()
+    assert probe.conn.closed
+
+
+def test_pooled_run_load_shares_fewer_connections():
+    conns = []
+
+    def connect(dsn):
+        conns.append(FakeConn())
+        return conns[-1]
+
+    class Probe:
+        def start(self, pids):
+            self.pids = pids
+
+        def stop(self):
+            return {"lock_waits_mean": 0.0}
+
+    probe = Probe()
+    workloads = [bench.Workload(["c1", "c2"], ["2026-10-01", "2026-10-02"], batch=2, seed_value=n) for n in range(5)]
+    result = bench.run_load("dsn", "batch", workloads, duration=0.05, warmup=0.01,
+                            connect=connect, pool_size=2, probe=probe)
+    assert len(conns) == 2 and all(c.closed for c in conns)
+    assert probe.pids == [1000 + c.number for c in conns]
+    assert result["calls"] > 0 and result["items"] == 2 * result["calls"]
+    assert result["acquire_p95_ms"] is not None and result["lock_waits_mean"] == 0.0
+
+
+def test_series_best_and_pool_hint():
+    rows = [row(10, 900.0, 80.0), row(1, 100.0, 10.0), row(50, 1500.0, 900.0), row(10, 400.0, 20.0, sessions=1)]
+    charts = sweep.series(rows)
+    assert [c["name"] for c in charts] == ["payload=3 sessions=1", "payload=3 sessions=4"]
+    assert charts[1]["batch"] == [1, 10, 50]
+    assert charts[1]["items_per_sec"] == [100.0, 900.0, 1500.0]
+
+    best = sweep.best_cell(rows, 500)
+    assert (best["batch"], best["sessions"]) == (10, 4)
+    assert sweep.best_cell([row(1, 1.0, 600.0)], 500) is None
+    # 90 calls/s x 40 ms = 3.6 busy connections, +20% -> 5
+    assert sweep.pool_hint(best) == {"calls_per_sec": 90.0, "mean_ms": 40.0, "connections_busy": 3.6, "pool_size": 5}
+
+
+def test_grid_and_csv(tmp_path):
+    assert sweep.grid([1, 10], [3], [1, 4]) == [(1, 3, 1), (10, 3, 1), (1, 3, 4), (10, 3, 4)]
+    path = tmp_path / "sweep.csv"
+    sweep.write_csv(path, [row(10, 900.0, 80.0, pool_size=3, junk="x")])
+    with open(path, newline="", encoding="utf-8") as f:
+        (written,) = list(csv.DictReader(f))
+    assert list(written) == sweep.CSV_FIELDS
+    assert written["batch"] == "10" and written["pool_size"] == "3"
@@ -0,0 +1,104 @@
+import json
+
+from heys_data import bench_kv_writes as bench
+from heys_data import localpg
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        self.conn.calls.append((sql, params))
+        self.last = sql
+
+    def fetchone(self):
+        if self.last == bench.SESSION_SQL:
+            return ({"success": True, "revision": 1},)
+        return (None,)
+
+
+class FakeConn:
+    def __init__(self):
+        self.calls = []
+        self.autocommit = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert bench.percentile(values, 50) == 50
+    assert bench.percentile(values, 95) == 95
+    assert bench.percentile(values, 99) == 99
+    assert bench.percentile([7], 99) == 7
+    assert bench.percentile([], 50) is None
+
+
+def test_outcome_counts_written_skipped_failed():
+    assert bench.outcome("session", {"success": True}) == (1, 0, 0)
+    assert bench.outcome("session", {"success": False, "error": "write_skipped"}) == (0, 1, 0)
+    assert bench.outcome("session", {"success": False, "error": "subscription_required"}) == (0, 0, 1)
+    batch = {"saved": 8, "rejected": 2,
+             "rejected_items": [{"k": "a", "reason": "write_skipped"}, {"k": "b", "reason": "non_client_data"}]}
+    assert bench.outcome("batch", batch) == (8, 1, 1)
+    assert bench.outcome("batch", {"success": False, "error": "invalid_or_expired_session"}) == (0, 0, 1)
+
+
+def test_workload_batches_distinct_days_with_stale_empties():
+    dates = localpg.day_dates(30)
+    workload = bench.Workload(["c1", "c2"], dates, batch=5, empty_ratio=1.0, seed_value=1)
+    items = workload.items()
+    assert 1 <= len(items) <= 5
+    assert len({item["k"] for item in items}) == len(items)
+    for item in items:
+        assert item["v"]["meals"] == []
+        assert item["k"] == "heys_dayv2_" + item["v"]["date"]
+
+
+def test_run_load_measures_each_worker_on_its_own_connection():
+    conns = []
+
+    def connect(dsn):
+        conns.append(FakeConn())
+        return conns[-1]
+
+    workloads = [bench.Workload(["c1"], ["2026-10-01"], seed_value=n) for n in range(3)]
+    result = bench.run_load("dsn", "session", workloads, duration=0.05, warmup=0.01,
+                            encryption_key="ab" * 16, connect=connect)
+    assert len(conns) == 3 and all(c.closed and c.autocommit for c in conns)
+    assert all("heys.encryption_key" in c.calls[0][0] for c in conns)
+    assert result["calls"] > 0 and result["items"] == result["calls"]
+    assert result["p50_ms"] <= result["p99_ms"] <= result["max_ms"]
+    sql, params = conns[0].calls[-1]
+    assert sql == bench.SESSION_SQL
+    assert params[0] == localpg.session_token(0)
+    assert json.loads(params[2])["date"] == "2026-10-01"
+
+
+def test_overhead_compares_on_to_off():
+    results = [
+        {"target": "session", "protection": "off", "calls": 100, "p50_ms": 1.0, "p95_ms": 2.0, "items_per_sec": 1000.0},
+        {"target": "session", "protection": "on", "calls": 100, "p50_ms": 1.2, "p95_ms": 3.0, "items_per_sec": 800.0},
+        {"target": "writer", "protection": "inline", "calls": 100, "p50_ms": 1.5, "p95_ms": 2.5, "items_per_sec": 700.0},
+    ]
+    assert bench.overhead(results) == {"session": {"p50_pct": 20.0, "p95_pct": 50.0, "throughput_pct": -20.0}}
+
+
+def test_day_document_shape():
+    doc = localpg.day_document("2026-10-01", 3, items_per_meal=2, updated_ms=5)
+    assert doc["date"] == "2026-10-01" and doc["updatedAt"] == 5
+    assert [len(meal["items"]) for meal in doc["meals"]] == [2, 2, 2]
+    assert localpg.day_dates(3, end=__import__("datetime").date(2026, 10, 2)) == [
+        "2026-09-30", "2026-10-01", "2026-10-02"]
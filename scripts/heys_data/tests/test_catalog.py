@@ -0,0 +1,132 @@
+import datetime
+import decimal
+import gzip
+import io
+import json
+import uuid
+
+import pytest
+
+from heys_data import catalog
+
+PRODUCTS = [
+    {"id": "0b7f", "name": "Творог 5%", "protein100": 17, "badFat100": 3.2,
+     "portions": [{"name": "1 уп", "grams": 180}], "is_raw": False},
+    {"id": "1c2a", "name": "Гречка", "protein100": 12.6, "badFat100": None,
+     "portions": None, "is_raw": True},
+]
+FIELDS = ("id", "name", "protein100", "badFat100", "portions", "is_raw")
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return (len(self.rows),)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+        self.names = []
+
+    def cursor(self, name=None):
+        self.names.append(name)
+        return self.cur
+
+
+def meta(total=2, fields=FIELDS):
+    return catalog.make_meta(total, fields, datetime.date(2026, 10, 19))
+
+
+@pytest.mark.parametrize("products", [PRODUCTS, []])
+def test_write_json_matches_single_dump(products):
+    out = io.StringIO()
+    assert catalog.write_json(out, meta(), iter(products)) == len(products)
+    expected = json.dumps({"_meta": meta(), "products": products}, ensure_ascii=False, indent=2)
+    assert out.getvalue() == expected
+
+
+def test_write_json_compact_parses():
+    out = io.StringIO()
+    catalog.write_json(out, meta(), iter(PRODUCTS), indent=0)
+    assert json.loads(out.getvalue()) == {"_meta": meta(), "products": PRODUCTS}
+
+
+def test_write_jsonl_meta_first_then_one_product_per_line():
+    out = io.StringIO()
+    assert catalog.write_jsonl(out, meta(), iter(PRODUCTS)) == 2
+    lines = out.getvalue().splitlines()
+    assert json.loads(lines[0]) == {"_meta": meta()}
+    assert [json.loads(line) for line in lines[1:]] == PRODUCTS
+
+
+def test_postgres_types_are_serialized():
+    out = io.StringIO()
+    product = {
+        "id": uuid.UUID(int=1),
+        "protein100": decimal.Decimal("12.60"),
+        "nova_group": decimal.Decimal("4"),
+        "updated_at": datetime.datetime(2026, 10, 19, 8, 30),
+    }
+    catalog.write_jsonl(out, meta(), [product])
+    assert json.loads(out.getvalue().splitlines()[1]) == {
+        "id": "00000000-0000-0000-0000-000000000001",
+        "protein100": 12.6,
+        "nova_group": 4,
+        "updated_at": "2026-10-19T08:30:00",
+    }
+
+
+def test_iter_products_streams_named_cursor_in_field_order():
+    rows = [tuple(p[f] for f in FIELDS) for p in PRODUCTS]
+    conn = FakeConn(rows)
+    assert catalog.begin_snapshot(conn) == 2
+    assert list(catalog.iter_products(conn, FIELDS, itersize=50)) == PRODUCTS
+    assert conn.names[-1] == "heys_catalog_export"
+    assert conn.cur.itersize == 50
+    assert "REPEATABLE READ, READ ONLY" in conn.cur.executed[0]
+
+
+def test_select_sql_aliases_camel_case_fields():
+    sql = catalog.select_sql(("id", "badFat100", "nova_group"))
+    assert sql == 'SELECT id, badfat100 AS "badFat100", nova_group FROM shared_products ORDER BY id'
+
+
+def test_parse_fields():
+    assert catalog.parse_fields(None) == catalog.DEFAULT_FIELDS
+    assert catalog.parse_fields("name,protein100") == ("id", "name", "protein100")
+    assert catalog.parse_fields("name,id") == ("id", "name")
+    assert catalog.parse_fields("+updated_at") == (*catalog.DEFAULT_FIELDS, "updated_at")
+    with pytest.raises(ValueError, match="kcal100"):
+        catalog.parse_fields("id,kcal100")
+
+
+def test_describe_covers_every_column():
+    assert list(catalog.describe(catalog.COLUMNS)) == list(catalog.COLUMNS)
+
+
+def test_gzip_output_round_trips(tmp_path):
+    path = tmp_path / "catalog.jsonl.gz"
+    with catalog.open_output(path, gz=True) as fp:
+        catalog.write_jsonl(fp, meta(), PRODUCTS)
+    with gzip.open(path, "rt", encoding="utf-8") as fp:
+        assert [json.loads(line) for line in fp][1:] == PRODUCTS
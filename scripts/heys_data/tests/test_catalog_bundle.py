@@ -0,0 +1,128 @@
+import datetime
+import decimal
+import gzip
+import json
+import uuid
+
+import pytest
+
+from heys_data import catalog, catalog_bundle
+
+FIELDS = ("id", "name", "protein100", "sodium100", "gi", "category", "portions", "nova_group", "is_organic")
+META = catalog.make_meta(3, FIELDS, datetime.date(2026, 10, 19))
+
+
+def pid(n):
+    return f"00000000-0000-4000-8000-{n:012d}"
+
+
+def product(n, **overrides):
+    row = {"id": pid(n), "name": f"Продукт {n}", "protein100": 12.34, "sodium100": 40, "gi": 35,
+           "category": "Молочные", "portions": [{"name": "1 шт", "grams": 50}], "nova_group": 1,
+           "is_organic": False}
+    row.update(overrides)
+    return row
+
+
+PRODUCTS = [
+    product(3, protein100=decimal.Decimal("3.25"), sodium100=40000),
+    product(1, name=None, protein100=None, portions=None, nova_group=None, is_organic=None, category=None),
+    product(2),
+]
+
+
+def test_round_trip_quantized_in_id_order():
+    bundle = catalog_bundle.decode(catalog_bundle.encode(META, FIELDS, PRODUCTS))
+    rows = list(bundle.rows())
+    assert bundle.ids == [pid(1), pid(2), pid(3)]
+    assert bundle.meta == {"format": "heys-catalog-bundle", "version": 1, "export_date": "2026-10-19",
+                           "total_products": 3}
+    assert rows[0] == {"id": pid(1), "name": None, "protein100": None, "sodium100": 40, "gi": 35,
+                       "category": None, "portions": None, "nova_group": None, "is_organic": None}
+    assert rows[1]["protein100"] == 12.3
+    assert rows[1]["portions"] == [{"grams": 50, "name": "1 шт"}]
+    assert rows[2]["protein100"] == 3.2  # round half to even, like the encoder
+    assert rows[2]["sodium100"] == 40000
+
+
+def test_column_widths_and_string_table():
+    data = catalog_bundle.encode(META, FIELDS, PRODUCTS)
+    _, _, fields, count, strings, _ = catalog_bundle.HEADER.unpack_from(data)
+    assert (fields, count) == (len(FIELDS), 3)
+    # meta, 9 field names, 2 names, one category, one portions JSON
+    assert strings == 1 + len(FIELDS) + 2 + 1 + 1
+    bundle = catalog_bundle.decode(data)
+    assert bundle.kinds == ["id", "text", "fixed", "fixed", "fixed", "text", "json", "nova", "flag"]
+    assert bundle.decimals[FIELDS.index("protein100")] == 1
+    assert bundle.decimals[FIELDS.index("sodium100")] == 0
+
+
+def test_ids_are_a_fixed_16_byte_column():
+    products = [product(n) for n in range(1, 1001)]
+    data = catalog_bundle.encode(META, ("id",), products)
+    ids = sorted(uuid.UUID(p["id"]).bytes for p in products)
+    assert data[-16 * len(ids):] == b"".join(ids)  # last section when there are no other columns
+    assert catalog_bundle.decode(data).ids == [str(uuid.UUID(bytes=b)) for b in ids]
+
+
+def test_bundle_is_smaller_than_json():
+    products = [product(n, name=f"Продукт {n % 50}", protein100=n % 300 / 10) for n in range(1, 2001)]
+    data = catalog_bundle.encode(META, FIELDS, products)
+    text = json.dumps({"_meta": META, "products": products}, ensure_ascii=False).encode("utf-8")
+    assert len(data) * 3 < len(text)
+    assert len(gzip.compress(data)) < len(gzip.compress(text))
+    assert catalog_bundle.decode(gzip.compress(data)).ids == sorted(p["id"] for p in products)
+
+
+def test_patch_rebuilds_the_target_exactly():
+    base = catalog_bundle.encode(META, FIELDS, PRODUCTS)
+    changed = [product(2, gi=40), product(3, protein100=3.25, sodium100=40000), product(4, category="Мясо")]
+    target = catalog_bundle.encode(dict(META, export_date="2026-10-20"), FIELDS, changed)
+    patch = catalog_bundle.make_patch(base, target)
+    assert catalog_bundle.patch_counts(patch) == (1, 2)  # 1 removed; 2 changed and 4 added
+    assert catalog_bundle.apply_patch(base, patch) == target
+
+
+def test_small_change_small_patch():
+    products = [product(n, name=f"Продукт {n}") for n in range(1, 2001)]
+    base = catalog_bundle.encode(META, FIELDS, products)
+    products[10:20] = [product(n, name=f"Продукт {n}", gi=70) for n in range(11, 21)]
+    target = catalog_bundle.encode(META, FIELDS, products)
+    patch = catalog_bundle.make_patch(base, target)
+    assert len(patch) * 20 < len(target)
+    assert catalog_bundle.apply_patch(base, patch) == target
+
+
+def test_patch_refuses_other_bases_and_field_changes():
+    base = catalog_bundle.encode(META, FIELDS, PRODUCTS)
+    target = catalog_bundle.encode(META, FIELDS, PRODUCTS[:2])
+    other = catalog_bundle.encode(META, FIELDS, PRODUCTS[1:])
+    with pytest.raises(ValueError, match="base bundle differs"):
+        catalog_bundle.apply_patch(other, catalog_bundle.make_patch(base, target))
+    narrower = catalog_bundle.encode(META, FIELDS[:3], PRODUCTS)
+    with pytest.raises(ValueError, match="full bundle"):
+        catalog_bundle.make_patch(base, narrower)
+
+
+def test_rejects_time_fields_and_foreign_files():
+    with pytest.raises(ValueError, match="not bundled"):
+        catalog_bundle.encode(META, ("id", "updated_at"), PRODUCTS)
+    with pytest.raises(ValueError, match="HEYSBNDL"):
+        catalog_bundle.decode(b"\0" * 64)
+
+
+def test_cli_build_diff_apply(tmp_path, capsys):
+    export = tmp_path / "export.json"
+    with catalog.open_output(export) as fp:
+        catalog.write_json(fp, META, iter(PRODUCTS))
+    old, new = tmp_path / "old.bundle", tmp_path / "new.bundle.gz"
+    assert catalog_bundle.main(["build", str(export), "-o", str(old)]) == 0
+    with catalog.open_output(export) as fp:
+        catalog.write_json(fp, META, iter(PRODUCTS[:2]))
+    assert catalog_bundle.main(["build", str(export), "-o", str(new)]) == 0
+    patch, rebuilt = tmp_path / "p.patch", tmp_path / "rebuilt.bundle"
+    assert catalog_bundle.main(["diff", str(old), str(new), "-o", str(patch)]) == 0
+    assert catalog_bundle.main(["apply", str(old), str(patch), "-o", str(rebuilt)]) == 0
+    assert rebuilt.read_bytes() == gzip.decompress(new.read_bytes())
+    assert catalog_bundle.main(["apply", str(rebuilt), str(patch), "-o", str(tmp_path / "x")]) == 2
+    assert "1 removed, 0 added/changed" in capsys.readouterr().out
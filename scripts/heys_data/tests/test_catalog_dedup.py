@@ -0,0 +1,92 @@
+import datetime
+import json
+
+import pytest
+
+from heys_data import catalog, catalog_dedup, catalog_matrix
+from heys_data.tests.factories import catalog_matrix_of, pid
+
+np = pytest.importorskip("numpy")
+
+FIELDS = ("id", "name", *catalog_dedup.NUTRIENT_FIELDS, "brand", "created_at")
+
+
+def product(n, name, **overrides):
+    row = {"id": pid(n), "name": name, "protein100": 11, "simple100": 1, "complex100": 28,
+           "badFat100": 7, "goodFat100": 5, "trans100": 0, "fiber100": 1, "brand": None,
+           "created_at": datetime.datetime(2026, 1, 1) + datetime.timedelta(days=n)}
+    row.update(overrides)
+    return row
+
+
+
+FILLER = ["Молоко 3,2%", "Кефир 1%", "Гречка ядрица", "Яблоко зелёное", "Сыр российский",
+          "Куриная грудка", "Овсяные хлопья", "Банан", "Рис басмати", "Хлеб бородинский"]
+
+
+def catalog_with(*products):
+    filler = [product(100 + n, name, protein100=n, complex100=50 - n) for n, name in enumerate(FILLER)]
+    return catalog_matrix_of([*products, *filler], FIELDS)
+
+
+def test_word_order_and_spelling_variants_cluster():
+    m = catalog_with(
+        product(1, "Пельмени с маслом классические"),
+        product(2, "пельмени классические с маслом", fiber100=None),
+        product(3, "Пельмени классические, с маслом!"),
+    )
+    clusters, stats = catalog_dedup.find_duplicates(m)
+    assert len(clusters) == 1
+    ids = m.decode("id")
+    assert ids[clusters[0].keep] == pid(1)  # complete and oldest
+    assert [ids[d] for d in clusters[0].merge] == [pid(2), pid(3)]
+    assert stats["products"] == 13
+
+
+def test_different_macros_or_brands_do_not_merge():
+    m = catalog_with(
+        product(1, "Творог 5%"),
+        product(2, "творог 5%", badFat100=30, goodFat100=20),
+        product(3, "Йогурт греческий", brand="Агуша"),
+        product(4, "йогурт греческий", brand="Простоквашино"),
+    )
+    clusters, stats = catalog_dedup.find_duplicates(m)
+    assert clusters == []
+    assert stats["candidates"] >= 2
+
+
+def test_keep_prefers_filled_fields():
+    m = catalog_with(
+        product(1, "Сметана 20%", fiber100=None, trans100=None),
+        product(2, "сметана 20%"),
+    )
+    clusters, _ = catalog_dedup.find_duplicates(m)
+    assert m.decode("id")[clusters[0].keep] == pid(2)
+
+
+def test_signatures_estimate_jaccard():
+    names = ["творог обезжиренный мягкий", "творог мягкий обезжиренный", "кефир"]
+    keys, docs = catalog_dedup.shingles(names)
+    sig, has = catalog_dedup.signatures(keys, docs, len(names), num_perm=256)
+    assert has.all()
+    assert (sig[0] == sig[1]).all()
+    assert (sig[0] == sig[2]).mean() < 0.1
+
+
+def test_oversized_buckets_are_skipped():
+    m = catalog_matrix_of([product(n, "Яблоко") for n in range(1, 6)], FIELDS)
+    clusters, stats = catalog_dedup.find_duplicates(m, max_bucket=3)
+    assert clusters == []
+    assert stats["oversized_buckets"] == catalog_dedup.BANDS
+
+
+def test_cli_writes_suggestions(tmp_path, capsys):
+    products = [product(1, "Гречка ядрица"), product(2, "ядрица гречка")]
+    path = tmp_path / "catalog.npz"
+    catalog_matrix.write_npz(path, catalog.make_meta(2, FIELDS), iter(products), 2, FIELDS)
+    out = tmp_path / "merge.json"
+    assert catalog_dedup.main([str(path), "--json", str(out)]) == 0
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert data["suggestions"][0]["keep"]["id"] == pid(1)
+    assert data["suggestions"][0]["merge"] == [{"id": pid(2), "name": "ядрица гречка", "brand": None}]
+    assert "merge " + pid(2) in capsys.readouterr().out
@@ -0,0 +1,188 @@
+import datetime
+import gzip
+import io
+import json
+
+import pytest
+
+from heys_data import catalog_delta
+from heys_data.tests.factories import pid
+
+UTC = datetime.timezone.utc
+FIELDS = ("id", "name", "protein100")
+
+
+class FakeDB:
+    """shared_products + blocklist, answering the queries catalog_delta sends."""
+
+    def __init__(self, now):
+        self.now = now
+        self.rows = {}
+        self.blocked = set()
+
+    def put(self, n, name, protein, updated_at=None):
+        self.rows[pid(n)] = {"id": pid(n), "name": name, "protein100": protein,
+                             "updated_at": updated_at or self.now}
+
+    def visible(self, params):
+        rows = sorted(self.rows.values(), key=lambda r: r["id"])
+        if params and params.get("curator"):
+            rows = [r for r in rows if r["id"] not in self.blocked]
+        if params and "since" in params:
+            rows = [r for r in rows if r["updated_at"] > params["since"] or r["id"] in params["added"]]
+        return rows
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.itersize = None
+        self.result = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SET TRANSACTION"):
+            return
+        if "count(*)" in sql:
+            self.result = [(len(self.db.rows),)]
+        elif "now()" in sql:
+            self.result = [(self.db.now,)]
+        elif self.name == "heys_catalog_ids":
+            self.result = [(r["id"],) for r in self.db.visible(params)]
+        else:
+            self.result = [tuple(r[f] for f in FIELDS) for r in self.db.visible(params)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+
+def current(db, curator=None):
+    return [{f: r[f] for f in FIELDS} for r in db.visible({"curator": curator})]
+
+
+def materialized(directory, name=None):
+    meta, products = catalog_delta.materialize(directory, name)
+    return meta, list(products)
+
+
+@pytest.fixture
+def db():
+    db = FakeDB(datetime.datetime(2026, 10, 18, 2, 0, tzinfo=UTC))
+    for n in range(1, 6):
+        db.put(n, f"Продукт {n}", n * 1.5, db.now - datetime.timedelta(days=30))
+    return db
+
+
+def test_diff_ids_merges_sorted_streams():
+    out = io.StringIO()
+    added, removed, total = catalog_delta.diff_ids(["a", "b", "d", "f"], ["b", "c", "d", "e"], out)
+    assert (added, removed, total) == (["c", "e"], ["a", "f"], 4)
+    assert out.getvalue() == "b\nc\nd\ne\n"
+
+
+def test_merge_replaces_inserts_and_drops_in_id_order():
+    base = [{"id": "b", "v": 1}, {"id": "d", "v": 1}, {"id": "f", "v": 1}]
+    overrides = {"a": {"id": "a", "v": 2}, "d": {"id": "d", "v": 2}, "f": None, "g": {"id": "g", "v": 2}}
+    assert [(p["id"], p["v"]) for p in catalog_delta.merge(base, overrides)] == [
+        ("a", 2), ("b", 1), ("d", 2), ("g", 2)
+    ]
+
+
+def test_first_export_is_full_then_deltas_chain(tmp_path, db):
+    full = catalog_delta.export(db, tmp_path, FIELDS)
+    assert (full["kind"], full["products"], full["total_products"]) == ("full", 5, 5)
+    assert catalog_delta.latest(tmp_path) == full["name"] == "full-20261018T020000Z"
+
+    db.now += datetime.timedelta(days=1)
+    db.put(2, "Продукт 2 (исправлен)", 9.0)
+    db.put(7, "Новый", 1.0)
+    del db.rows[pid(4)]
+    delta = catalog_delta.export(db, tmp_path)
+    assert delta["kind"] == "delta"
+    assert (delta["base"], delta["root"], delta["sequence"]) == (full["name"], full["name"], 1)
+    assert (delta["products"], delta["tombstones"], delta["total_products"]) == (2, 1, 5)
+    assert delta["fields"] == list(FIELDS)
+    assert delta["since"] == "2026-10-18T01:50:00+00:00"  # watermark minus the overlap
+
+    with gzip.open(tmp_path / delta["data"], "rt", encoding="utf-8") as fp:
+        lines = [json.loads(line) for line in fp]
+    assert lines[0]["_meta"]["chain"]["base"] == full["name"]
+    assert lines[-1] == {"_deleted": pid(4)}
+
+    meta, products = materialized(tmp_path)
+    assert products == current(db)
+    assert meta["total_products"] == 5
+    assert meta["export_date"] == "2026-10-19"
+
+    _, as_of_base = materialized(tmp_path, full["name"])
+    assert [p["id"] for p in as_of_base] == [pid(n) for n in range(1, 6)]
+
+
+def test_reappearing_id_with_old_updated_at_is_exported(tmp_path, db):
+    catalog_delta.export(db, tmp_path, FIELDS)
+    old = db.rows.pop(pid(3))
+    db.now += datetime.timedelta(days=1)
+    catalog_delta.export(db, tmp_path)
+    db.rows[pid(3)] = old
+    db.now += datetime.timedelta(days=1)
+    delta = catalog_delta.export(db, tmp_path)
+    assert (delta["products"], delta["tombstones"]) == (1, 0)
+    assert materialized(tmp_path)[1] == current(db)
+
+
+def test_curator_scope_tombstones_blocklisted_products(tmp_path, db):
+    curator = "11111111-1111-1111-1111-111111111111"
+    catalog_delta.export(db, tmp_path, FIELDS, curator=curator)
+    db.blocked.add(pid(5))
+    db.now += datetime.timedelta(days=1)
+    delta = catalog_delta.export(db, tmp_path, curator=curator)
+    assert (delta["products"], delta["tombstones"]) == (0, 1)
+    assert materialized(tmp_path)[1] == current(db, curator)
+
+    with pytest.raises(catalog_delta.ChainError, match="curator"):
+        catalog_delta.export(db, tmp_path)
+
+
+def test_delta_must_keep_the_base_fields(tmp_path, db):
+    catalog_delta.export(db, tmp_path, FIELDS)
+    db.now += datetime.timedelta(days=1)
+    with pytest.raises(catalog_delta.ChainError, match="--full"):
+        catalog_delta.export(db, tmp_path, ("id", "name"))
+    rebased = catalog_delta.export(db, tmp_path, FIELDS, full=True)
+    assert rebased["kind"] == "full"
+    assert catalog_delta.chain(tmp_path) == [rebased]
+
+
+def test_materialize_rejects_tampered_data(tmp_path, db):
+    full = catalog_delta.export(db, tmp_path, FIELDS)
+    with gzip.open(tmp_path / full["data"], "at", encoding="utf-8") as fp:
+        fp.write(json.dumps({"id": pid(9), "name": "x", "protein100": 0}) + "\n")
+    with pytest.raises(catalog_delta.ChainError, match="sha256"):
+        catalog_delta.materialize(tmp_path)
+
+
+def test_materialize_cli_writes_json(tmp_path, db, capsys):
+    catalog_delta.export(db, tmp_path, FIELDS)
+    out = tmp_path / "catalog.json"
+    assert catalog_delta.main([str(tmp_path), "materialize", "-o", str(out)]) == 0
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert data["products"] == current(db)
+    assert catalog_delta.main([str(tmp_path / "missing"), "log"]) == 2
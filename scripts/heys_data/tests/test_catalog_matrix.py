@@ -0,0 +1,89 @@
+import datetime
+import decimal
+import uuid
+
+import pytest
+
+from heys_data import catalog, catalog_matrix
+
+np = pytest.importorskip("numpy")
+
+FIELDS = ("id", "name", "protein100", "badFat100", "category", "portions", "nova_group", "is_raw", "updated_at")
+PRODUCTS = [
+    {"id": uuid.UUID(int=1), "name": "Творог 5%", "protein100": decimal.Decimal("17.2"),
+     "badFat100": decimal.Decimal("3.2"), "category": "Молочные",
+     "portions": [{"name": "1 уп", "grams": 180}], "nova_group": 1, "is_raw": False,
+     "updated_at": datetime.datetime(2026, 10, 19, 8, 30, tzinfo=datetime.timezone.utc)},
+    {"id": uuid.UUID(int=2), "name": "Гречка", "protein100": decimal.Decimal("12.6"),
+     "badFat100": None, "category": None, "portions": None, "nova_group": None, "is_raw": None,
+     "updated_at": None},
+    {"id": uuid.UUID(int=3), "name": "Кефир 1%", "protein100": decimal.Decimal("3"),
+     "badFat100": decimal.Decimal("0.6"), "category": "Молочные",
+     "portions": [{"grams": 250, "name": "стакан"}], "nova_group": 2, "is_raw": True,
+     "updated_at": datetime.datetime(2026, 10, 18, 23, 0)},
+]
+
+
+def export(tmp_path, products=PRODUCTS, total=None, compressed=False):
+    path = tmp_path / "catalog.npz"
+    meta = catalog.make_meta(len(products), FIELDS, datetime.date(2026, 10, 19))
+    count = catalog_matrix.write_npz(path, meta, iter(products), total or len(products), FIELDS, compressed)
+    assert count == len(products)
+    return catalog_matrix.load(path)
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_round_trip_typed_columns(tmp_path, compressed):
+    m = export(tmp_path, compressed=compressed)
+    assert len(m) == 3
+    assert m["protein100"].dtype == np.float32
+    assert m["nova_group"].tolist() == [1, catalog_matrix.NULL_NOVA, 2]
+    assert m["is_raw"].tolist() == [0, catalog_matrix.NULL_FLAG, 1]
+    assert np.isnan(m["badFat100"][1])
+    assert m.decode("id")[2] == str(uuid.UUID(int=3))
+    assert m.decode("nova_group") == [1, None, 2]
+    assert m.decode("is_raw") == [False, None, True]
+    assert m.decode("updated_at") == [
+        datetime.datetime(2026, 10, 19, 8, 30), None, datetime.datetime(2026, 10, 18, 23, 0)
+    ]
+    assert m.meta["field_descriptions"]["badFat100"] == catalog.FIELD_DESCRIPTIONS["badFat100"]
+
+
+def test_text_and_jsonb_are_dictionary_encoded(tmp_path):
+    m = export(tmp_path)
+    assert m["category"].tolist() == [0, catalog_matrix.NULL_CODE, 0]
+    assert m.dictionary("category") == ["Молочные"]
+    assert m.decode("name") == ["Творог 5%", "Гречка", "Кефир 1%"]
+    assert m.decode("portions") == [[{"name": "1 уп", "grams": 180}], None, [{"name": "стакан", "grams": 250}]]
+
+
+def test_matrix_stacks_float_fields(tmp_path):
+    m = export(tmp_path)
+    assert m.float_fields() == ["protein100", "badFat100"]
+    matrix = m.matrix()
+    assert matrix.shape == (3, 2)
+    np.testing.assert_allclose(matrix[:, 0], [17.2, 12.6, 3.0], rtol=1e-6)
+    assert m.row_index()[str(uuid.UUID(int=2))] == 1
+
+
+def test_fewer_rows_than_counted_are_trimmed(tmp_path):
+    assert len(export(tmp_path, PRODUCTS[:2], total=5)) == 2
+
+
+def test_more_rows_than_counted_fail():
+    with pytest.raises(ValueError, match="more than 1"):
+        catalog_matrix.build(iter(PRODUCTS), 1, FIELDS)
+
+
+def test_empty_catalog(tmp_path):
+    m = export(tmp_path, [], total=1)
+    assert len(m) == 0
+    assert m.dictionary("name") == []
+    assert m.matrix().shape == (0, 2)
+
+
+def test_rejects_other_npz(tmp_path):
+    path = tmp_path / "other.npz"
+    np.savez(path, _meta=np.frombuffer(b'{"format": "x"}', dtype=np.uint8))
+    with pytest.raises(ValueError, match="heys-catalog-npz"):
+        catalog_matrix.load(path)
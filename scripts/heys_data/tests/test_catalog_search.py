@@ -0,0 +1,86 @@
+import datetime
+import uuid
+
+import pytest
+
+from heys_data import catalog, catalog_matrix, catalog_search
+
+pytest.importorskip("numpy")
+
+NAMES = ["Творог 5%", "Сыр творожный", "Пельмени с маслом классические",
+         "пельмени классические с маслом", "Молоко 3,2%", "Ёжики из творога"]
+IDS = [str(uuid.UUID(int=n)) for n in range(1, len(NAMES) + 1)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "products.trgm"
+    assert catalog_search.build(path, IDS, NAMES) == len(NAMES)
+    with catalog_search.TrigramIndex.open(path) as index:
+        yield index
+
+
+def test_fold_and_trigrams_follow_pg_trgm():
+    assert catalog_search.fold("  Ёжики,  из ТВОРОГА! ") == "ежики из творога"
+    keys = catalog_search.trigrams("сыр")
+    assert len(keys) == 4  # "  с", " сы", "сыр", "ыр "
+
+
+def test_prefix_then_substring_then_similarity(index):
+    matches = index.search("твор", limit=5)
+    assert [m.name for m in matches] == ["творог 5%", "сыр творожный", "ежики из творога"]
+    assert matches[0].prefix and matches[0].substring
+    assert not matches[1].prefix and matches[1].substring
+    assert matches[0].id == IDS[0]
+
+
+def test_word_order_variants_score_the_same(index):
+    matches = index.search("пельмени классические с маслом", limit=2)
+    assert {m.id for m in matches} == {IDS[2], IDS[3]}
+    assert matches[0].id == IDS[3]  # the exact name is the prefix hit
+    assert matches[0].score == 1.0
+
+
+def test_short_queries_match_word_starts(index):
+    assert [m.name for m in index.search("мо", limit=1)] == ["молоко 3 2%"]
+    assert index.search("ежики")[0].id == IDS[5]
+
+
+def test_no_match_and_min_similarity(index):
+    assert index.search("zzz") == []
+    assert index.search("") == []
+    assert all(m.score >= 0.5 for m in index.search("творог", min_similarity=0.5))
+
+
+def test_whole_name_prefix_lookup(index):
+    docs = index.prefix("Пельмени")
+    assert [index.name(d) for d in docs] == ["пельмени классические с маслом", "пельмени с маслом классические"]
+    assert index.prefix("пельмени", limit=1) == docs[:1]
+    assert index.prefix("я") == []
+
+
+def test_empty_index(tmp_path):
+    path = tmp_path / "empty.trgm"
+    catalog_search.build(path, [], [])
+    with catalog_search.TrigramIndex.open(path) as index:
+        assert len(index) == 0
+        assert index.search("сыр") == []
+        assert index.prefix("с") == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * catalog_search.HEADER.size)
+    with pytest.raises(ValueError, match="HEYSTRGM"):
+        catalog_search.TrigramIndex.open(path)
+
+
+def test_cli_builds_from_npz_export(tmp_path, capsys):
+    fields = ("id", "name")
+    npz = tmp_path / "catalog.npz"
+    meta = catalog.make_meta(len(NAMES), fields, datetime.date(2026, 10, 19))
+    catalog_matrix.write_npz(npz, meta, iter(dict(id=i, name=n) for i, n in zip(IDS, NAMES)), len(NAMES), fields)
+    out = tmp_path / "products.trgm"
+    assert catalog_search.main(["build", str(npz), "-o", str(out)]) == 0
+    assert catalog_search.main(["query", str(out), "сыр"]) == 0
+    assert IDS[1] in capsys.readouterr().out
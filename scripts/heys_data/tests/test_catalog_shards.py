@@ -0,0 +1,154 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from heys_data import catalog, catalog_shards
+from heys_data.tests.factories import pid
+
+FIELDS = ("id", "name", "protein100", "portions")
+
+
+class FakeDB:
+    """shared_products answering the queries of catalog_shards; records snapshot use."""
+
+    def __init__(self, count):
+        self.rows = [{"id": pid(n), "name": f"Продукт {n}", "protein100": n / 10,
+                      "portions": [{"name": "1 шт", "grams": n}] if n % 2 else None}
+                     for n in range(1, count + 1)]
+        self.joined = []
+
+    def connect(self):
+        return FakeConn(self)
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+        self.rolled_back = 0
+
+    def cursor(self, name=None):
+        return FakeCursor(self.db)
+
+    def rollback(self):
+        self.rolled_back += 1
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.itersize = None
+        self.result = []
+
+    def execute(self, sql, params=None):
+        rows = self.db.rows
+        if sql.startswith("SET TRANSACTION SNAPSHOT"):
+            self.db.joined.append(params[0])
+        elif sql.startswith("SET TRANSACTION"):
+            pass
+        elif "count(*)" in sql:
+            self.result = [(len(rows),)]
+        elif "pg_export_snapshot" in sql:
+            self.result = [("00000003-0000001B-1",)]
+        elif "OFFSET" in sql:
+            self.result = [(rows[params[0]]["id"],)] if params[0] < len(rows) else []
+        else:
+            lo, hi = params["from"], params["to"]
+            assert ("id >= " in sql) == (lo is not None) and ("id < " in sql) == (hi is not None)
+            self.result = [tuple(r[f] for f in FIELDS) for r in rows
+                           if (lo is None or r["id"] >= lo) and (hi is None or r["id"] < hi)]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+
+def in_process(db):
+    return lambda tasks: [catalog_shards.write_shard(db.connect(), task) for task in tasks]
+
+
+def single(db, fmt, indent=2):
+    meta = catalog.make_meta(len(db.rows), FIELDS)
+    fp = io.StringIO()
+    products = (dict(zip(FIELDS, (r[f] for f in FIELDS))) for r in db.rows)
+    if fmt == "jsonl":
+        catalog.write_jsonl(fp, meta, products)
+    else:
+        catalog.write_json(fp, meta, products, indent)
+    return fp.getvalue()
+
+
+def test_id_ranges_split_rows_evenly():
+    db = FakeDB(10)
+    ranges = catalog_shards.id_ranges(db.connect(), 10, 3)
+    assert ranges == [(None, pid(4)), (pid(4), pid(7)), (pid(7), None)]
+    assert catalog_shards.id_ranges(db.connect(), 1, 4) == [(None, None)]
+
+
+@pytest.mark.parametrize("fmt,indent", [("json", 2), ("json", 0), ("jsonl", 2)])
+@pytest.mark.parametrize("count", [0, 1, 7])
+def test_concatenated_output_matches_single_process(tmp_path, fmt, indent, count):
+    db = FakeDB(count)
+    out = tmp_path / f"catalog.{fmt}"
+    written, manifest = catalog_shards.export(db.connect(), str(out), FIELDS, fmt, 3, indent=indent,
+                                              run=in_process(db))
+    assert (written, manifest) == (count, None)
+    assert out.read_text(encoding="utf-8") == single(db, fmt, indent)
+    assert [p.name for p in tmp_path.iterdir()] == [out.name]  # fragments removed
+    assert set(db.joined) == {"00000003-0000001B-1"}
+
+
+def test_gzip_members_concatenate(tmp_path):
+    db = FakeDB(9)
+    out = tmp_path / "catalog.json.gz"
+    catalog_shards.export(db.connect(), str(out), FIELDS, "json", 4, gz=True, run=in_process(db))
+    assert gzip.decompress(out.read_bytes()).decode("utf-8") == single(db, "json")
+
+
+def test_shards_and_manifest(tmp_path):
+    db = FakeDB(7)
+    out = tmp_path / "catalog.jsonl.gz"
+    written, manifest = catalog_shards.export(db.connect(), str(out), FIELDS, "jsonl", 3, shards=True, gz=True,
+                                              run=in_process(db))
+    assert written == 7
+    data = json.loads(open(manifest, encoding="utf-8").read())
+    assert manifest.endswith("catalog.shards.json")
+    assert [s["file"] for s in data["shards"]] == [f"catalog.shard-{n}-of-3.jsonl.gz" for n in (1, 2, 3)]
+    assert [s["products"] for s in data["shards"]] == [2, 2, 3]
+    assert data["shards"][0]["from"] is None and data["shards"][0]["to"] == data["shards"][1]["from"]
+    ids = []
+    for shard in data["shards"]:
+        with gzip.open(tmp_path / shard["file"], "rt", encoding="utf-8") as fp:
+            lines = [json.loads(line) for line in fp]
+        assert lines[0]["_meta"]["total_products"] == 7
+        ids += [p["id"] for p in lines[1:]]
+    assert ids == [pid(n) for n in range(1, 8)]
+
+
+def test_failed_worker_leaves_no_fragments(tmp_path):
+    db = FakeDB(5)
+
+    def run(tasks):
+        catalog_shards.write_shard(db.connect(), tasks[0])
+        raise RuntimeError("worker died")
+
+    with pytest.raises(RuntimeError):
+        catalog_shards.export(db.connect(), str(tmp_path / "catalog.json"), FIELDS, "json", 2, run=run)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_split_name():
+    assert catalog_shards.split_name("dir/catalog.v2.jsonl.gz") == ("dir/catalog.v2", ".jsonl.gz")
+    assert catalog_shards.split_name("catalog.json") == ("catalog", ".json")
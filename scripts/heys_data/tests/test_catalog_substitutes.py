@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from heys_data import catalog, catalog_matrix, catalog_substitutes
+from heys_data.tests.factories import catalog_matrix_of, pid
+
+np = pytest.importorskip("numpy")
+
+FIELDS = ("id", "name", "category", "harm", *catalog_substitutes.MACRO_FIELDS, "sodium100")
+
+
+def product(n, category="Молочные", harm=5.0, protein100=10.0, badFat100=5.0, **overrides):
+    row = {"id": pid(n), "name": f"Продукт {n}", "category": category, "harm": harm,
+           "protein100": protein100, "simple100": 4.0, "complex100": 1.0, "badFat100": badFat100,
+           "goodFat100": 2.0, "trans100": 0.0, "fiber100": 0.0, "sodium100": 50.0}
+    row.update(overrides)
+    return row
+
+
+
+PRODUCTS = [
+    product(1, harm=6, protein100=17, badFat100=5),    # творог 9%
+    product(2, harm=3, protein100=18, badFat100=1),    # творог 2% — closest healthier
+    product(3, harm=2.5, protein100=3, badFat100=1),   # молоко — healthier, further
+    product(4, harm=5.5, protein100=17, badFat100=4),  # not enough gain
+    product(5, category="Мясо", harm=1, protein100=17, badFat100=5),  # other category
+    product(6, category=None, harm=1),
+    product(7, harm=None),
+]
+
+
+def test_substitutes_are_same_category_lower_harm_nearest_first():
+    arrays = catalog_substitutes.build(catalog_matrix_of(PRODUCTS, FIELDS), k=3)
+    table = catalog_substitutes.SubstituteTable(arrays)
+    subs = table.lookup(pid(1))
+    assert [s.id for s in subs] == [pid(2), pid(3)]
+    assert subs[0].distance < subs[1].distance
+    assert subs[0].harm_gain == 3.0
+
+
+def test_products_without_category_or_harm_are_left_out():
+    table = catalog_substitutes.SubstituteTable(catalog_substitutes.build(catalog_matrix_of(PRODUCTS, FIELDS), k=3))
+    assert table.lookup(pid(5)) == []
+    assert table.lookup(pid(6)) == []
+    for n in range(1, 8):
+        assert pid(6) not in {s.id for s in table.lookup(pid(n))}
+        assert pid(7) not in {s.id for s in table.lookup(pid(n))}
+    assert table.lookup("no-such-id") == []
+    assert table.meta["with_substitutes"] == 2  # 1 and 4 (-> 2, 3)
+
+
+def test_min_gain_and_max_distance():
+    m = catalog_matrix_of(PRODUCTS, FIELDS)
+    table = catalog_substitutes.SubstituteTable(catalog_substitutes.build(m, k=3, min_gain=0.5))
+    assert pid(4) in {s.id for s in table.lookup(pid(1))}
+    near = catalog_substitutes.SubstituteTable(catalog_substitutes.build(m, k=3, max_distance=2.0))
+    assert [s.id for s in near.lookup(pid(1))] == [pid(2)]
+
+
+def test_blocked_search_matches_full():
+    rng = np.random.default_rng(7)
+    x = rng.normal(size=(300, 6)).astype(np.float32)
+    harm = rng.uniform(0, 10, size=300)
+    full = catalog_substitutes.nearest(x, harm, k=4)
+    old = catalog_substitutes.BLOCK_CELLS
+    catalog_substitutes.BLOCK_CELLS = 1000
+    try:
+        blocked = catalog_substitutes.nearest(x, harm, k=4)
+    finally:
+        catalog_substitutes.BLOCK_CELLS = old
+    assert (full[0] == blocked[0]).all()
+    d = ((x[:, None] - x[None]) ** 2).sum(axis=2)
+    d[harm[None, :] > harm[:, None] - catalog_substitutes.MIN_GAIN] = np.inf
+    assert (full[0][:, 0] == np.where(np.isinf(d.min(axis=1)), -1, d.argmin(axis=1))).all()
+
+
+def test_cli_build_query_and_json(tmp_path, capsys):
+    npz = tmp_path / "catalog.npz"
+    catalog_matrix.write_npz(npz, catalog.make_meta(len(PRODUCTS), FIELDS), iter(PRODUCTS), len(PRODUCTS), FIELDS)
+    table = tmp_path / "substitutes.npz"
+    assert catalog_substitutes.main(["build", str(npz), "-o", str(table), "-k", "2"]) == 0
+    assert catalog_substitutes.main(["query", str(table), pid(1)]) == 0
+    assert pid(2) in capsys.readouterr().out
+    assert catalog_substitutes.main(["query", str(table), pid(99)]) == 1
+    out = tmp_path / "substitutes.json"
+    assert catalog_substitutes.main(["build", str(npz), "-o", str(out)]) == 0
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert data["substitutes"] == {pid(1): [pid(2), pid(3)], pid(4): [pid(2), pid(3)]}
+    assert data["_meta"]["format"] == catalog_substitutes.FORMAT
@@ -0,0 +1,100 @@
+
+import pytest
+
+from heys_data import catalog, catalog_matrix, catalog_validate
+from heys_data.tests.factories import catalog_matrix_of, pid
+
+np = pytest.importorskip("numpy")
+
+FIELDS = ("id", "name", *catalog_validate.MACRO_FIELDS, "gi", "harm", "category", "sodium100",
+          "nova_group", "vitamin_c", "calcium", "additives", "kcal100_legacy")
+
+
+def product(n, **overrides):
+    row = {"id": pid(n), "name": f"Продукт {n}", "protein100": 10, "simple100": 5, "complex100": 20,
+           "badFat100": 2, "goodFat100": 3, "trans100": 0, "gi": 40, "harm": 3, "category": "Крупы",
+           "sodium100": 10, "nova_group": 1, "vitamin_c": 0, "calcium": 4 + n % 3, "additives": [],
+           "kcal100_legacy": 10 * 3 + 25 * 4 + 5 * 9}
+    row.update(overrides)
+    return row
+
+
+
+def by_rule(issues):
+    found = {}
+    for issue in issues:
+        found.setdefault(issue.rule, []).append(issue.id)
+    return found
+
+
+def test_clean_catalog_has_no_issues():
+    issues, counts, skipped = catalog_validate.validate(catalog_matrix_of([product(n) for n in range(1, 21)], FIELDS))
+    assert issues == []
+    assert skipped == []
+    assert set(counts) == {r.name for r in catalog_validate.RULES}
+
+
+def test_each_rule_flags_its_row():
+    products = [product(n) for n in range(1, 21)]
+    products[0] = product(1, protein100=60, complex100=45, kcal100_legacy=60 * 3 + 50 * 4 + 5 * 9)
+    products[1] = product(2, sodium100=40000)
+    products[2] = product(3, kcal100_legacy=500)
+    products[3] = product(4, gi=140, harm=-1)
+    products[4] = product(5, calcium=90)
+    products[5] = product(6, additives=["E621", "E250"])
+    products[6] = product(7, nova_group=None, additives=["E300"])
+    issues, counts, _ = catalog_validate.validate(catalog_matrix_of(products, FIELDS))
+    found = by_rule(issues)
+    assert found["macro_sum"] == [pid(1)]
+    assert found["sodium_above_salt"] == [pid(2)]
+    assert found["kcal_mismatch"] == [pid(3)]
+    assert sorted(found["out_of_range"]) == [pid(4), pid(4)]
+    assert found["negative_values"] == [pid(4)]
+    assert found["dv_outliers"] == [pid(5)]
+    assert sorted(found["nova_vs_additives"]) == [pid(6), pid(7)]
+    assert counts["nova_vs_additives"] == 2
+    info = [i for i in issues if i.id == pid(7)]
+    assert info[0].severity == catalog_validate.INFO
+    assert "3-4 likely" in info[0].message
+
+
+def test_issues_ranked_by_severity_then_score():
+    products = [product(n) for n in range(1, 21)]
+    products[0] = product(1, complex100=85)                     # 105 g
+    products[1] = product(2, complex100=95)                     # 115 g
+    products[2] = product(3, gi=120, kcal100_legacy=None)       # warn
+    issues, _, _ = catalog_validate.validate(catalog_matrix_of(products, FIELDS))
+    ranked = [(i.severity, i.id) for i in issues if i.rule != "kcal_mismatch"]
+    assert ranked == [("error", pid(2)), ("error", pid(1)), ("warn", pid(3))]
+    assert issues[0].message == "macros 115.0 g per 100 g"
+
+
+def test_zero_mad_falls_back_to_mean_deviation():
+    products = [product(n, calcium=0) for n in range(1, 21)]
+    products[0] = product(1, calcium=80)
+    found = by_rule(catalog_validate.validate(catalog_matrix_of(products, FIELDS))[0])
+    assert found["dv_outliers"] == [pid(1)]
+
+
+def test_small_categories_are_not_scored():
+    products = [product(n, category="Редкое") for n in range(1, catalog_validate.MIN_GROUP)]
+    products[0] = product(1, category="Редкое", calcium=500)
+    assert "dv_outliers" not in by_rule(catalog_validate.validate(catalog_matrix_of(products, FIELDS))[0])
+
+
+def test_rules_without_their_fields_are_skipped():
+    fields = ("id", "name", *catalog_validate.MACRO_FIELDS)
+    _, counts, skipped = catalog_validate.validate(catalog_matrix_of([product(1)], fields))
+    assert {"kcal_mismatch", "nova_vs_additives", "dv_outliers", "sodium_above_salt"} <= set(skipped)
+    assert "macro_sum" in counts
+
+
+def test_cli_fail_on_threshold(tmp_path, capsys):
+    products = [product(n) for n in range(1, 21)]
+    products[3] = product(4, gi=140)
+    path = tmp_path / "catalog.npz"
+    meta = catalog.make_meta(len(products), FIELDS)
+    catalog_matrix.write_npz(path, meta, iter(products), len(products), FIELDS)
+    assert catalog_validate.main([str(path)]) == 0
+    assert catalog_validate.main([str(path), "--fail-on", "warn", "--json", str(tmp_path / "i.json")]) == 1
+    assert "out_of_range" in capsys.readouterr().out
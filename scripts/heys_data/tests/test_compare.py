@@ -0,0 +1,69 @@
+from heys_data import compare
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append(params)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+
+    def cursor(self, name=None):
+        return self.cursor_obj
+
+
+def test_backup_meal_counts_accepts_dates_and_full_keys():
+    days = [
+        ("2026-01-08", {"meals": [{}, {}]}),
+        ("heys_dayv2_2026-01-09", {"meals": []}),
+        ("heys_dayv2_2026-02-01", {"meals": [{}]}),
+        ("heys_profile", {}),
+    ]
+    counts = compare.backup_meal_counts(days, since="2026-01-01", until="2026-01-31")
+    assert counts == {"2026-01-08": 2, "2026-01-09": 0}
+
+
+def test_diff_reports_both_directions():
+    diff = compare.diff_meal_counts(
+        "c1",
+        {"2026-01-08": 3, "2026-01-09": 2, "2026-01-10": 0, "2026-01-11": 4},
+        {"2026-01-08": 3, "2026-01-09": 0, "2026-01-10": 0, "2026-01-12": 1},
+    )
+    assert diff.matched == ["2026-01-08"]
+    assert diff.empty == ["2026-01-10"]
+    assert diff.mismatched == [("2026-01-09", 2, 0)]
+    assert diff.missing_in_db == ["2026-01-11"]
+    assert diff.missing_in_backup == ["2026-01-12"]
+    assert diff.dates_to_fix == ["2026-01-09", "2026-01-11"]
+    assert not diff.ok
+
+
+def test_compare_clients_merge_joins_streamed_rows():
+    conn = FakeConn([
+        ("a", "heys_dayv2_2026-01-08", 2),
+        ("c", "heys_dayv2_2026-01-08", 1),
+        ("c", "heys_dayv2_2026-01-09", 5),
+    ])
+    backups = {"c": {"2026-01-08": 1, "2026-01-09": 5}, "b": {"2026-01-08": 2}}
+
+    diffs = list(compare.compare_clients(conn, backups, since="2026-01-01"))
+
+    assert [d.client_id for d in diffs] == ["b", "c"]
+    assert diffs[0].missing_in_db == ["2026-01-08"]
+    assert diffs[1].ok
+    params = conn.cursor_obj.executed[0]
+    assert params["client_ids"] == ["b", "c"]
+    assert params["k_from"] == "heys_dayv2_2026-01-01"
@@ -0,0 +1,206 @@
+import csv
+import math
+
+import pytest
+
+from heys_data import catalog, catalog_matrix, day_columns
+from heys_data.tests.factories import catalog_matrix_of, pid
+
+np = pytest.importorskip("numpy")
+
+FIELDS = ("id", "name", *day_columns.CATALOG_FIELDS, "sodium100")
+CLIENT_A = "00000000-0000-4000-8000-00000000000a"
+CLIENT_B = "00000000-0000-4000-8000-00000000000b"
+
+
+def product(n, protein100=10.0, simple100=5.0, complex100=15.0, badFat100=2.0, goodFat100=3.0, **overrides):
+    row = {"id": pid(n), "name": f"Продукт {n}", "protein100": protein100, "simple100": simple100,
+           "complex100": complex100, "badFat100": badFat100, "goodFat100": goodFat100, "trans100": 0.0,
+           "fiber100": 1.0, "sodium100": 100.0}
+    row.update(overrides)
+    return row
+
+
+PRODUCTS = [product(1), product(2, protein100=20.0, simple100=0.0, complex100=0.0, badFat100=None,
+                                goodFat100=None, trans100=None, sodium100=None)]
+
+
+
+def day(*items, **fields):
+    return {"meals": [{"id": "m1", "items": list(items)}], **fields}
+
+
+def columns(*docs):
+    builder = day_columns.Builder()
+    for client_id, key, doc in docs:
+        builder.add_document(client_id, key, doc)
+    return day_columns.DayColumns(day_columns.pack(builder.arrays()))
+
+
+DOCS = [
+    (CLIENT_A, "heys_dayv2_2026-10-01", day(
+        {"product_id": pid(1), "grams": 200, "kcal100": 999},            # catalog wins over the snapshot
+        {"product_id": "own_1", "shared_origin_id": pid(2), "grams": 50, "fat100": 4},
+        {"productId": 17, "grams": 100, "kcal100": 250, "protein100": 5, "carbs100": 40},
+        {"product_id": "gone", "grams": 30},
+        weightMorning="72,4", steps=8000, sleepStart="23:30", sleepEnd="07:00", sleepHours=6,
+        trainings=[{"z": [10, 20, 5, 0]}, {"duration": 15},
+                   {"z": [30, 0, 0, 0], "plan": {"status": "assigned"}}], waterMl=1500)),
+    (CLIENT_A, "heys_dayv2_2026-10-02", {"meals": [], "weightMorning": 72.0}),
+    (CLIENT_B, "heys_dayv2_2026-10-01", day({"product_id": pid(1), "grams": 100}, sleepHours=8)),
+    (CLIENT_B, "not_a_day", day({"product_id": pid(1), "grams": 100})),
+]
+
+
+def test_sleep_and_trainings_follow_the_app():
+    # totalSleepHours(day) ?? day.sleepHours: night span plus nap first.
+    assert day_columns.sleep_hours(6.8, "0:15", "07:00", 40) == 7.5  # 6.8 h night + 40 min
+    assert day_columns.sleep_hours(6.8, "23:00", "23:00") == 0.0
+    assert day_columns.sleep_hours("6,5", None, "07:00", 40) == 6.5
+    assert math.isnan(day_columns.sleep_hours(None))
+    # normalizeTime rejects anything but H:MM / HH:MM within a day -> sleepHours.
+    assert day_columns.sleep_hours(7, "23:30", "25:00") == 7.0
+    assert day_columns.sleep_hours(7, "23:30", "7:5") == 7.0
+    assert day_columns.sleep_hours(7, "23:60", "07:00") == 7.0
+    assert day_columns.sleep_hours(7, " 23:30", "7:00 ") == 7.5
+    # Curator plans the client has not performed are not trainings yet.
+    trainings = [{"z": [10, 0, 0, 0], "plan": {"status": "assigned"}},
+                 {"z": [0, 5, 0, 0], "plan": {"status": "skipped"}},
+                 {"z": [30, 0, 0, 0], "plan": {"status": "moved"}},
+                 {"z": [20, 0, 0, 0], "plan": {"status": "done"}}, "junk"]
+    assert day_columns.training_minutes(trainings) == (1, 20.0)
+
+
+def test_documents_flatten_into_day_and_item_columns():
+    c = columns(*DOCS)
+    assert len(c) == 3
+    assert c["clients"].tolist() == [CLIENT_A.encode(), CLIENT_B.encode()]
+    assert c["client"].tolist() == [0, 0, 1]
+    assert c["date"].astype(str).tolist() == ["2026-10-01", "2026-10-02", "2026-10-01"]
+    assert c["meals"].tolist() == [1, 0, 1]
+    assert c["weight"][0] == pytest.approx(72.4) and c["weight"][1] == 72.0
+    assert c["sleep_hours"].tolist() == [7.5, pytest.approx(math.nan, nan_ok=True), 8.0]
+    assert (c["trainings"][0], c["training_min"][0]) == (2, 50.0)
+    assert c["item_day"].tolist() == [0, 0, 0, 0, 2]
+    products = c["products"].tolist()
+    assert [products[i] for i in c["item_product"]] == [pid(1), "own_1", "17", "gone", pid(1)]
+    assert c["item_origin"].tolist()[1] == products.index(pid(2))
+    assert c["item_origin"].tolist()[0] == -1
+    inline = c["item_inline"]
+    assert inline.shape == (5, len(day_columns.INLINE_FIELDS))
+    assert inline[2, day_columns.INLINE_FIELDS.index("carbs100")] == 40.0
+    assert np.isnan(inline[3]).all()
+
+
+def test_join_prefers_catalog_then_origin_then_snapshot():
+    c = columns(*DOCS)
+    values, source = day_columns.join(c, catalog_matrix_of(PRODUCTS, FIELDS))
+    C, I, N = day_columns.SOURCE_CATALOG, day_columns.SOURCE_INLINE, day_columns.SOURCE_NONE
+    assert source.tolist() == [C, C, I, N, C]
+    kcal = values[:, day_columns.NUTRIENTS.index("kcal")]
+    fat = values[:, day_columns.NUTRIENTS.index("fat")]
+    assert kcal[0] == 3 * 10 + 4 * 20 + 9 * 5  # TEF from the catalog, not the item's kcal100
+    assert fat[1] == 4.0  # NULL fats in the catalog fall back to the item's snapshot
+    assert kcal[1] == 3 * 20 + 4 * 0 + 9 * 4
+    assert kcal[2] == 250.0
+    sodium = values[:, day_columns.NUTRIENTS.index("sodium")]
+    assert sodium[0] == 100.0 and np.isnan(sodium[1])
+
+
+def test_day_totals_and_fleet_daily():
+    c = columns(*DOCS)
+    totals, counts = day_columns.day_totals(c, catalog_matrix_of(PRODUCTS, FIELDS))
+    kcal = day_columns.NUTRIENTS.index("kcal")
+    assert totals[0, kcal] == pytest.approx(155 * 2 + 96 * 0.5 + 250)
+    assert totals[1].tolist() == [0.0] * len(day_columns.NUTRIENTS)
+    assert totals[2, kcal] == pytest.approx(155)
+    assert counts["items"].tolist() == [4, 0, 1]
+    assert counts["unmatched"].tolist() == [1, 0, 0]
+    rows = day_columns.daily(c, totals, counts)
+    assert [r["date"] for r in rows] == ["2026-10-01"]  # 10-02 has no items
+    assert rows[0]["days"] == 2 and rows[0]["items"] == 5
+    assert rows[0]["catalog_share"] == 0.6
+    assert rows[0]["kcal_mean"] == round((608 + 155) / 2, 1)
+    assert rows[0]["weight_mean"] == 72.4
+    assert rows[0]["sleep_hours_mean"] == 7.8
+
+
+def test_concat_recodes_partitions():
+    parts = []
+    for docs in (DOCS[:2], DOCS[2:]):
+        builder = day_columns.Builder()
+        for doc in docs:
+            builder.add_document(*doc)
+        parts.append(builder.arrays())
+    merged = day_columns.DayColumns(day_columns.pack(day_columns.concat(parts)))
+    whole = columns(*DOCS)
+    for name in ("client", "item_day", "item_product", "item_origin", "item_grams"):
+        assert merged[name].tolist() == whole[name].tolist()
+    assert merged["products"].tolist() == whole["products"].tolist()
+    assert len(day_columns.concat([])["date"]) == 0
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+        self.params = None
+
+    def execute(self, sql, params=None):
+        assert "jsonb_path_query_array" in sql and "decrypt_health_data" in sql
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+
+    def cursor(self, name=None):
+        return self.cur
+
+
+def test_extract_partition_reads_projected_rows():
+    items = [{"product_id": pid(1), "grams": 120}]
+    conn = FakeConn([
+        (CLIENT_A, "heys_dayv2_2026-10-01", 2, items, [{"z": [5, 5, 0, 0]}], "70", 5000, None, "23:00", "06:00",
+         None, 30, False),
+        (CLIENT_A, "heys_dayv2_2026-10-02", 0, [], None, None, None, None, None, None, None, None, True),
+    ])
+    builder = day_columns.extract_partition(conn, CLIENT_A, CLIENT_B, since="2026-10-01", decrypt=True)
+    assert conn.cur.params["k_from"] == "heys_dayv2_2026-10-01"
+    assert conn.cur.params["k_to"] == "heys_dayv2_9999-99-99"
+    assert builder.hidden == 1
+    arrays = builder.arrays()
+    assert arrays["meals"].tolist() == [2]
+    assert arrays["sleep_hours"].tolist() == [7.5]
+    assert arrays["training_min"].tolist() == [10.0]
+    assert arrays["item_grams"].tolist() == [120.0]
+
+
+def test_cli_totals(tmp_path, capsys):
+    days = tmp_path / "days.npz"
+    builder = day_columns.Builder()
+    for doc in DOCS:
+        builder.add_document(*doc)
+    np.savez(days, **day_columns.pack(builder.arrays()))
+    npz = tmp_path / "catalog.npz"
+    catalog_matrix.write_npz(npz, catalog.make_meta(len(PRODUCTS), FIELDS), iter(PRODUCTS), len(PRODUCTS), FIELDS)
+    out, daily = tmp_path / "totals.npz", tmp_path / "daily.csv"
+    assert day_columns.main(["totals", str(days), "--catalog", str(npz), "-o", str(out), "--daily", str(daily)]) == 0
+    assert "3 days, 5 items: 3 catalog, 1 inline, 1 unmatched" in capsys.readouterr().out
+    with np.load(out) as totals:
+        assert totals["kcal"].tolist() == pytest.approx([608, 0, 155])
+        assert totals["clients"].tolist() == [CLIENT_A.encode(), CLIENT_B.encode()]
+    with open(daily, encoding="utf-8") as f:
+        assert [row["date"] for row in csv.DictReader(f)] == ["2026-10-01"]
+    with pytest.raises(SystemExit):
+        day_columns.main(["totals", str(days)])
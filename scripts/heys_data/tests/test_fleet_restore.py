@@ -0,0 +1,50 @@
+import gzip
+import json
+
+from heys_data import fleet_restore, restore
+
+CLIENT_A = "aaaaaaaa-0000-0000-0000-000000000001"
+CLIENT_B = "bbbbbbbb-0000-0000-0000-000000000002"
+
+
+def _write_backup(path, client_id, days):
+    path.write_text(json.dumps({"clientId": client_id, "days": days}), encoding="utf-8")
+    return str(path)
+
+
+def test_rows_from_snapshot_keeps_ciphertext(tmp_path):
+    (tmp_path / "2026-03-29").mkdir()
+    snapshot = {"kvSnapshot": {
+        "heys_dayv2_2026-03-28": {"v": {"meals": [{}]}},
+        "heys_dayv2_2026-03-29": {"v_encrypted_b64": "AAEC", "key_version": 1},
+    }}
+    (tmp_path / "2026-03-29" / f"{CLIENT_A}.json.gz").write_bytes(
+        gzip.compress(json.dumps(snapshot).encode("utf-8"))
+    )
+    source = fleet_restore.snapshots.LocalMirror(str(tmp_path))
+
+    rows = list(restore.rows_from_snapshot(source, "2026-03-29", CLIENT_A))
+
+    assert [(r.key, r.meals) for r in rows] == [
+        ("heys_dayv2_2026-03-28", 1),
+        ("heys_dayv2_2026-03-29", None),
+    ]
+    assert rows[1].v_encrypted == b"\x00\x01\x02" and rows[1].payload() == "{}"
+
+
+def test_dry_run_isolates_failing_client(tmp_path, capsys):
+    good = _write_backup(tmp_path / "a.json", CLIENT_A, {"2026-03-01": {"meals": []}, "2026-03-02": {}})
+    report_path = tmp_path / "report.json"
+
+    code = fleet_restore.main([
+        "--backup", f"{CLIENT_A}={good}",
+        "--backup", f"{CLIENT_B}={tmp_path / 'missing.json'}",
+        "--dry-run", "--workers", "2", "--report", str(report_path),
+    ])
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert code == 1
+    assert report["succeeded"] == 1 and report["failed"] == 1
+    assert report["results"][0]["skipped"] == 2
+    assert report["failures"][0]["client_id"] == CLIENT_B
+    assert "FAILED" in capsys.readouterr().out
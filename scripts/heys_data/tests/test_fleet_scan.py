@@ -0,0 +1,92 @@
+import uuid
+
+from heys_data import fleet_scan
+
+CLIENT = "aaaaaaaa-0000-0000-0000-000000000001"
+DAY_MS = 24 * 3600 * 1000
+
+
+def _day(date, meals, updated_ms=1000, row_updated_ms=1000, hidden=False):
+    return (date, meals, updated_ms, row_updated_ms, hidden)
+
+
+def test_analyze_client_flags_holes_drops_and_stale_writes():
+    days = [
+        _day("2026-03-01", 4),
+        _day("2026-03-02", 0),                                   # hole between full days
+        _day("2026-03-03", 4),
+        _day("2026-03-04", 1),                                   # drop: 1 * 2 < min(4, 5)
+        _day("2026-03-05", 5, updated_ms=0, row_updated_ms=2 * DAY_MS),  # stale overwrite
+        _day("2026-03-06", 0, hidden=True),                      # encrypted, not visible
+        _day("2026-03-07", 0),                                   # trailing empty day: not a hole
+    ]
+
+    signals = fleet_scan.analyze_client(CLIENT, days)
+
+    assert signals.counts == {"empty_between_full": 1, "updated_at_regression": 1, "meal_drop": 1}
+    assert signals.examples["empty_between_full"] == ["2026-03-02"]
+    assert signals.score == 3 + 1  # the stale write is not scored
+    assert signals.rank == (4, 1)
+    assert (signals.days, signals.encrypted_hidden) == (7, 1)
+
+
+def test_stale_writes_alone_rank_below_any_data_loss():
+    restored = fleet_scan.analyze_client(CLIENT, [
+        _day(f"2026-03-{d:02d}", 4, updated_ms=0, row_updated_ms=2 * DAY_MS) for d in range(1, 11)
+    ])
+    dropped = fleet_scan.analyze_client("b", [_day("2026-03-01", 4), _day("2026-03-02", 1), _day("2026-03-03", 4)])
+
+    assert restored.score == 0 and restored.as_dict()["severity"] == "low"
+    assert dropped.as_dict()["severity"] == "data_loss"
+    assert sorted([restored.rank, dropped.rank], reverse=True)[0] == dropped.rank
+
+
+def test_partitions_cover_uuid_space_without_gaps():
+    ranges = fleet_scan.partitions(3)
+
+    assert ranges[0][0] == str(uuid.UUID(int=0))
+    assert ranges[-1][1] == "ffffffff-ffff-ffff-ffff-ffffffffffff"
+    for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+        assert uuid.UUID(hi).int + 1 == uuid.UUID(lo).int
+
+
+class NamedCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params):
+        self.sql, self.params = sql, params
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cur = NamedCursor(rows)
+
+    def cursor(self, name=None):
+        return self.cur
+
+
+def test_scan_partition_groups_rows_by_client():
+    other = "bbbbbbbb-0000-0000-0000-000000000002"
+    conn = FakeConn([
+        (CLIENT, "heys_dayv2_2026-03-01", 3, None, 0, False),
+        (CLIENT, "heys_dayv2_2026-03-02", 0, None, 0, False),
+        (CLIENT, "heys_dayv2_2026-03-03", 3, None, 0, False),
+        (other, "heys_dayv2_2026-03-01", 2, None, 0, False),
+    ])
+
+    results = list(fleet_scan.scan_partition(conn, *fleet_scan.partitions(1)[0], since="2026-03-01"))
+
+    assert [(r.client_id, r.score) for r in results] == [(CLIENT, 3), (other, 0)]
+    assert conn.cur.params["k_from"] == "heys_dayv2_2026-03-01"
+    assert "decrypt_health_data" not in conn.cur.sql
@@ -0,0 +1,45 @@
+import hashlib
+import json
+from decimal import Decimal
+
+from heys_data import restore
+from heys_data.jsonb import jsonb_md5, jsonb_text
+
+CLIENT = "aaaaaaaa-0000-0000-0000-000000000001"
+
+
+def test_jsonb_text_matches_postgres_rendering():
+    # SELECT '{"b": 1, "aa": [1.50, 1e3, -0.0, 2.5e-3, "é\n\u0001/"], "a": null, "b": true}'::jsonb::text
+    raw = '{"b": 1, "aa": [1.50, 1e3, -0.0, 2.5e-3, "é\\n\\u0001/"], "a": null, "b": true}'
+    value = json.loads(raw, parse_float=Decimal)
+
+    assert jsonb_text(value) == '{"a": null, "b": true, "aa": [1.50, 1000, 0.0, 0.0025, "é\\n\\u0001/"]}'
+
+
+def test_jsonb_text_key_order_is_byte_length_first():
+    assert jsonb_text({"я": 1, "zz": 2, "b": 3, "a": {}}) == '{"a": {}, "b": 3, "zz": 2, "я": 1}'
+
+
+def test_changed_rows_skips_identical_days():
+    same = restore.DayRow("2026-03-01", value={"meals": [{"kcal": Decimal("1.50")}]})
+    differs = restore.DayRow("2026-03-02", value={"meals": []})
+    cipher = restore.DayRow("2026-03-03", v_encrypted=b"\x00\x01", key_version=1)
+    server = {
+        same.key: jsonb_md5({"meals": [{"kcal": Decimal("1.50")}]}),
+        differs.key: jsonb_md5({"meals": [{}]}),
+        cipher.key: hashlib.md5(b"\x00\x01").hexdigest(),
+    }
+    result = restore.RestoreResult(CLIENT)
+
+    rows = list(restore.changed_rows([same, differs, cipher], server, result))
+
+    assert rows == [differs] and result.unchanged == 2
+
+
+def test_rows_from_backup_keep_number_digits(tmp_path):
+    path = tmp_path / "backup.json"
+    path.write_text('{"days": {"2026-03-01": {"w": 70.50}}}', encoding="utf-8")
+
+    (row,) = restore.rows_from_backup(str(path))
+
+    assert row.payload() == '{"w": 70.50}'
@@ -0,0 +1,138 @@
+import argparse
+from contextlib import contextmanager
+
+import pytest
+
+from heys_data import protection_audit as audit
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+
+    def fetchone(self):
+        return self.conn.results.pop(0)
+
+
+class FakeConn:
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.executed = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    def __init__(self):
+        self.conns = []
+
+    @contextmanager
+    def connection(self):
+        conn = FakeConn()
+        self.conns.append(conn)
+        yield conn
+
+
+def args(**kw):
+    return argparse.Namespace(snapshots=None, **kw)
+
+
+def test_protected_accepts_inline_check_or_protected_writer():
+    assert audit._protected(FakeCursor(FakeConn([("PERFORM check_day_overwrite_allowed(...)",)])), "f")[0] == audit.OK
+    assert audit._protected(FakeCursor(FakeConn([("PERFORM write_client_kv_value (...)",)])), "f",
+                            wrapper=True)[0] == audit.OK
+    # The writer itself must run the check; delegating only counts for wrappers.
+    assert audit._protected(FakeCursor(FakeConn([("PERFORM write_client_kv_value(...)",)])), "f")[0] == audit.FAIL
+    assert audit._protected(FakeCursor(FakeConn([("INSERT INTO client_kv_store ...",)])), "f")[0] == audit.FAIL
+    assert audit._protected(FakeCursor(FakeConn([None])), "f")[0] == audit.FAIL
+
+
+def test_protected_ignores_mentions_that_are_not_calls():
+    src = "IF p_key = ANY(write_client_kv_value_blacklist()) THEN RETURN; END IF; INSERT INTO client_kv_store ..."
+    assert audit._protected(FakeCursor(FakeConn([(src,)])), "write_client_kv_value")[0] == audit.FAIL
+    assert audit._protected(FakeCursor(FakeConn([(src,)])), "upsert_client_kv_by_session",
+                            wrapper=True)[0] == audit.FAIL
+
+
+def test_run_checks_isolates_failures_and_keeps_order():
+    def fine(cur, a):
+        return audit.OK, "fine", {"n": 1}
+
+    def broken(cur, a):
+        raise RuntimeError("boom")
+
+    def slow(cur, a):
+        raise RuntimeError("canceling statement due to statement timeout")
+
+    def no_db(cur, a):
+        assert cur is None
+        return audit.SKIP, "skipped"
+
+    checks = [
+        audit.Check("slow", slow, "Slow", timeout=0.5),
+        audit.Check("fine", fine, "Fine"),
+        audit.Check("broken", broken, "Broken"),
+        audit.Check("no_db", no_db, "No DB", needs_db=False),
+    ]
+    pool = FakePool()
+    results = audit.run_checks(checks, pool, args(), workers=4)
+
+    assert [(r.name, r.status) for r in results] == [
+        ("slow", audit.TIMEOUT), ("fine", audit.OK), ("broken", audit.ERROR), ("no_db", audit.SKIP),
+    ]
+    assert results[1].data == {"n": 1}
+    assert "boom" in results[2].message
+    assert all(r.duration_ms >= 0 for r in results)
+    # One connection per DB check, each read-only, time-limited and rolled back.
+    assert len(pool.conns) == 3
+    for conn in pool.conns:
+        assert conn.executed[0] == "SET TRANSACTION READ ONLY"
+        assert "statement_timeout" in conn.executed[1]
+        assert conn.rollbacks == 1
+    assert audit.exit_code(results) == 2
+
+
+def test_exit_code_is_worst_status():
+    make = lambda *statuses: [audit.CheckResult(str(i), s) for i, s in enumerate(statuses)]
+    assert audit.exit_code(make(audit.OK, audit.SKIP)) == 0
+    assert audit.exit_code(make(audit.OK, audit.WARN)) == 1
+    assert audit.exit_code(make(audit.WARN, audit.FAIL)) == 2
+
+
+def test_overlapping_run_exits_immediately(tmp_path):
+    lock = tmp_path / "audit.lock"
+    held = audit._acquire_lock(str(lock))
+    try:
+        assert audit._acquire_lock(str(lock)) is None
+        assert audit.main(["--lock-file", str(lock)]) == 3
+    finally:
+        audit.os.close(held)
+    second = audit._acquire_lock(str(lock))
+    assert second is not None
+    audit.os.close(second)
+
+
+def test_registry_names_are_unique():
+    names = [c.name for c in audit.CHECKS]
+    assert len(names) == len(set(names)) == 7
+
+
+def test_unknown_only_check_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        audit.main(["--only", "no_such_check", "--lock-file", str(tmp_path / "audit.lock")])
+    assert exc.value.code == 2
+    assert "invalid choice" in capsys.readouterr().err
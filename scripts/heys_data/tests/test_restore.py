@@ -0,0 +1,77 @@
+import json
+from decimal import Decimal
+
+from heys_data import db, restore
+
+CLIENT = "AAAAAAAA-0000-0000-0000-000000000001"
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_touch_days_is_one_statement_and_classifies_pairs():
+    cid = CLIENT.lower()
+    cur = FakeCursor([
+        (cid, "heys_dayv2_2026-01-08", "touched", "1700000000000"),
+        (cid, "heys_dayv2_2026-01-09", "encrypted", None),
+        (cid, "heys_dayv2_2026-01-10", "missing", None),
+    ])
+
+    result = restore.touch_days(
+        cur, [(CLIENT, "2026-01-08"), (CLIENT, "heys_dayv2_2026-01-08"),
+              (CLIENT, "2026-01-09"), (CLIENT, "2026-01-10")],
+        updated_at=1800000000000,
+    )
+
+    ((sql, params),) = cur.executed
+    assert "UPDATE client_kv_store" in sql and "jsonb_set" in sql
+    assert params["keys"] == ["heys_dayv2_2026-01-08", "heys_dayv2_2026-01-09", "heys_dayv2_2026-01-10"]
+    assert params["client_ids"] == [cid] * 3
+    assert result.touched == [(cid, "heys_dayv2_2026-01-08", "1700000000000")]
+    assert result.encrypted == [(cid, "heys_dayv2_2026-01-09")]
+    assert result.missing == [(cid, "heys_dayv2_2026-01-10")]
+
+
+def test_touch_days_dry_run_does_not_update():
+    cur = FakeCursor([])
+
+    result = restore.touch_days(cur, [(CLIENT, "2026-01-08")], updated_at=1, dry_run=True)
+
+    assert "UPDATE" not in cur.executed[0][0]
+    assert result.dry_run and result.as_dict()["touched"] == 0
+
+
+class StatusCursor(FakeCursor):
+    def fetchall(self):
+        items = json.loads(self.executed[-1][1][1])
+        statuses = ["inserted", "updated", "blocked_data_loss"]
+        return [(item["k"], statuses[i % 3]) for i, item in enumerate(items)]
+
+
+def test_write_days_protected_batches_through_write_client_kv_values(monkeypatch):
+    monkeypatch.delenv("HEYS_ENCRYPTION_KEY", raising=False)
+    cur = StatusCursor([])
+    rows = [restore.DayRow(f"2026-01-0{d}", value={"meals": [], "w": Decimal("70.50")}) for d in range(1, 6)]
+
+    result = restore.write_days_protected(cur, CLIENT, rows, batch_size=3)
+
+    assert [sql for sql, _ in cur.executed] == [restore.WRITE_VALUES_SQL] * 2
+    first = json.loads(cur.executed[0][1][1], parse_float=Decimal)
+    assert first[0] == {"k": "heys_dayv2_2026-01-01", "v": {"w": Decimal("70.50"), "meals": []}}
+    assert (result.inserted, result.updated, result.blocked) == (2, 2, 1)
+
+
+def test_encryption_key_is_normalised_like_rpc(monkeypatch):
+    monkeypatch.setenv("HEYS_ENCRYPTION_KEY", "ab" * 16)
+    assert db.encryption_key() == "ab" * 16
+    monkeypatch.setenv("HEYS_ENCRYPTION_KEY", "short secret")
+    assert db.encryption_key() == b"short secret".hex()
@@ -0,0 +1,67 @@
+import gzip
+import json
+
+from heys_data import snapshot_index, snapshots
+
+CLIENT = "aaaaaaaa-0000-0000-0000-000000000001"
+
+
+def _day(meals):
+    return {"v": {"meals": [{"id": i} for i in range(meals)]}}
+
+
+def _snapshot(root, business_date, days):
+    (root / business_date).mkdir(parents=True)
+    kv = {f"heys_dayv2_{d}": entry for d, entry in days.items()}
+    (root / business_date / f"{CLIENT}.json.gz").write_bytes(
+        gzip.compress(json.dumps({"clientId": CLIENT, "kvSnapshot": kv}).encode("utf-8"))
+    )
+
+
+def _series(root):
+    _snapshot(root, "2026-01-18", {"2026-01-17": _day(5)})
+    _snapshot(root, "2026-01-19", {"2026-01-17": _day(5), "2026-01-18": _day(2)})
+    _snapshot(root, "2026-01-20", {"2026-01-17": _day(0), "2026-01-18": _day(2)})
+    _snapshot(root, "2026-01-21", {"2026-01-18": _day(3)})
+    return snapshots.LocalMirror(str(root))
+
+
+def test_index_keeps_change_points_only(tmp_path):
+    source = _series(tmp_path / "mirror")
+
+    index = snapshot_index.load_or_build(source, CLIENT, str(tmp_path / "idx"), workers=2)
+
+    assert [(v.snapshot_date, v.meals) for v in index.history("2026-01-17")] == [
+        ("2026-01-18", 5), ("2026-01-20", 0), ("2026-01-21", None),
+    ]
+    assert index.history("2026-01-17")[-1].content_hash is None
+    assert index.at("2026-01-17", "2026-01-19").meals == 5
+    assert index.at("2026-01-17") is None
+    assert index.last_where("2026-01-17", lambda v: v.meals == 5).snapshot_date == "2026-01-19"
+    assert index.last_where("2026-01-18", lambda v: v.meals == 2, as_of="2026-01-19").snapshot_date == "2026-01-19"
+
+
+def test_index_update_is_incremental(tmp_path):
+    root = tmp_path / "mirror"
+    source = _series(root)
+    index_dir = str(tmp_path / "idx")
+    snapshot_index.load_or_build(source, CLIENT, index_dir)
+    _snapshot(root, "2026-01-22", {"2026-01-18": _day(3)})
+
+    index = snapshot_index.load_or_build(source, CLIENT, index_dir)
+
+    assert index.snapshot_dates[-1] == "2026-01-22"
+    assert len(index.history("2026-01-18")) == 2
+
+
+def test_rows_as_of_last_nonempty_reads_each_snapshot_once(tmp_path):
+    source = _series(tmp_path / "mirror")
+    index = snapshot_index.load_or_build(source, CLIENT, str(tmp_path / "idx"))
+    opened = []
+    open_raw = source.open_raw
+    source.open_raw = lambda d, c: opened.append(d) or open_raw(d, c)
+
+    rows = list(snapshot_index.rows_as_of(source, index, nonempty=True))
+
+    assert sorted((r.date, r.meals) for r in rows) == [("2026-01-17", 5), ("2026-01-18", 3)]
+    assert sorted(opened) == ["2026-01-19", "2026-01-21"]
@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+
+from heys_data import restore, snapshot_store, snapshots
+
+CLIENT = "ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a"
+
+
+def _stringify(value):
+    # JSON.stringify for the values used here (no exotic floats).
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _snapshot_bytes(business_date, today_meals):
+    kv = {f"heys_dayv2_2026-03-{d:02d}": {"v": {"meals": [{"kcal": 120.5, "name": "Каша\n"}] * 2},
+                                          "updated_at": "2026-03-01T10:00:00.000Z"}
+          for d in range(1, 20)}
+    kv["heys_dayv2_" + business_date] = {"v": {"meals": [{}] * today_meals}, "updated_at": business_date}
+    kv["heys_dayv2_2026-03-25"] = {"updated_at": "2026-03-25", "v_encrypted_b64": "AAEC", "key_version": 1}
+    snapshot = {"schemaVersion": 2, "businessDate": business_date, "clientId": CLIENT,
+                "keyCount": len(kv), "kvSnapshot": kv, "accountData": {"client": {"id": CLIENT}}}
+    snapshot["checksum"] = hashlib.sha256(_stringify(snapshot).encode("utf-8")).hexdigest()
+    return _stringify(snapshot).encode("utf-8")
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    originals = {}
+    for business_date, meals in [("2026-03-27", 1), ("2026-03-28", 2), ("2026-03-29", 3)]:
+        (tmp_path / "mirror" / business_date).mkdir(parents=True)
+        originals[business_date] = _snapshot_bytes(business_date, meals)
+        (tmp_path / "mirror" / business_date / f"{CLIENT}.json.gz").write_bytes(
+            gzip.compress(originals[business_date], 9)
+        )
+    return snapshots.LocalMirror(str(tmp_path / "mirror")), originals
+
+
+@pytest.mark.parametrize("value, text", [
+    (0.1, "0.1"), (100.0, "100"), (1e21, "1e+21"), (1.5e20, "150000000000000000000"),
+    (1e-7, "1e-7"), (1.5e-6, "0.0000015"), (-2.5e-9, "-2.5e-9"), (123456789012345680000, "123456789012345680000"),
+])
+def test_js_json_numbers_match_json_stringify(value, text):
+    assert snapshot_store.js_json(value) == text
+
+
+def test_compact_dedups_and_reassembles_byte_identical(tmp_path, mirror, capsys):
+    source, originals = mirror
+    store_dir = str(tmp_path / "store")
+
+    assert snapshot_store.main([store_dir, "compact", source.root]) == 0
+
+    store = snapshot_store.SnapshotStore(store_dir)
+    blobs = sum(1 for _ in (tmp_path / "store" / "blobs").rglob("*.gz"))
+    assert blobs == 1 + 3 + 1 + 1  # 19 identical days + 3 "today" keys + encrypted + accountData
+    for business_date, original in originals.items():
+        with store.open_text(business_date, CLIENT) as fp:
+            assert fp.read().encode("utf-8") == original
+        assert snapshot_store.verify_snapshot(store, business_date, CLIENT)
+    assert "already stored 0" in capsys.readouterr().out
+
+
+def test_store_is_a_snapshot_source(tmp_path, mirror):
+    source, _ = mirror
+    snapshot_store.main([str(tmp_path / "store"), "compact", source.root])
+
+    store = snapshots.source_from_uri(str(tmp_path / "store"))
+    rows = list(restore.rows_from_snapshot(store, "2026-03-29", CLIENT, since="2026-03-25"))
+
+    assert isinstance(store, snapshot_store.SnapshotStore)
+    assert store.list_dates(CLIENT) == ["2026-03-27", "2026-03-28", "2026-03-29"]
+    assert [(r.date, r.meals) for r in rows] == [("2026-03-29", 3), ("2026-03-25", None)]
+
+
+def test_gc_removes_blobs_of_dropped_manifests(tmp_path, mirror):
+    source, _ = mirror
+    store_dir = tmp_path / "store"
+    snapshot_store.main([str(store_dir), "compact", source.root])
+    (store_dir / "manifests" / "2026-03-27" / f"{CLIENT}.json.gz").unlink()
+
+    freed, _ = snapshot_store.gc(snapshot_store.SnapshotStore(str(store_dir)))
+
+    assert freed == 1  # only 2026-03-27's "today" entry was unique to it
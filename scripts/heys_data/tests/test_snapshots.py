@@ -0,0 +1,89 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from heys_data import snapshots
+
+CLIENT = "ccfe6ea3-54d9-4c83-902b-f10e6e8e6d9a"
+
+
+def _snapshot(business_date, meals):
+    return {
+        "schemaVersion": 2,
+        "businessDate": business_date,
+        "clientId": CLIENT,
+        "keyCount": 3,
+        "kvSnapshot": {
+            "heys_dayv2_2026-03-28": {"v": {"meals": [{}] * meals}, "updated_at": "2026-03-28T18:00:00Z"},
+            "heys_dayv2_2026-03-29": {"v_encrypted_b64": "AAEC", "key_version": 1},
+            "heys_profile": {"v": {"firstName": "A"}},
+        },
+        "accountData": {"client": {"id": CLIENT}},
+        "checksum": "00",
+    }
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    for business_date, meals in [("2026-03-28", 2), ("2026-03-29", 3), ("2026-03-30", 4)]:
+        day_dir = tmp_path / business_date
+        day_dir.mkdir()
+        payload = json.dumps(_snapshot(business_date, meals)).encode("utf-8")
+        (day_dir / f"{CLIENT}.json.gz").write_bytes(gzip.compress(payload, 9))
+    return snapshots.LocalMirror(str(tmp_path))
+
+
+def test_resolve_date_latest_and_on_or_before(mirror):
+    assert mirror.list_dates(CLIENT) == ["2026-03-28", "2026-03-29", "2026-03-30"]
+    assert snapshots.resolve_date(mirror, CLIENT) == "2026-03-30"
+    assert snapshots.resolve_date(mirror, CLIENT, on_or_before="2026-03-29") == "2026-03-29"
+    with pytest.raises(FileNotFoundError):
+        snapshots.resolve_date(mirror, "unknown")
+
+
+def test_iter_days_skips_encrypted_but_entries_keep_ciphertext(mirror):
+    with snapshots.open_snapshot(mirror, "2026-03-29", CLIENT) as fp:
+        assert [(d, len(v["meals"])) for d, v in snapshots.iter_days(fp)] == [("2026-03-28", 3)]
+    with snapshots.open_snapshot(mirror, "2026-03-29", CLIENT) as fp:
+        entries = dict(snapshots.iter_day_entries(fp))
+    assert entries["2026-03-29"].encrypted
+    assert entries["2026-03-29"].key_version == 1
+
+
+def test_s3_source_streams_object_body():
+    body = gzip.compress(json.dumps(_snapshot("2026-03-30", 1)).encode("utf-8"))
+
+    class FakePaginator:
+        def paginate(self, Bucket, Prefix):
+            yield {"Contents": [
+                {"Key": f"client-daily/2026-03-30/{CLIENT}.json.gz"},
+                {"Key": "client-daily/2026-03-30/other.json.gz"},
+            ]}
+
+    class FakeS3:
+        def get_paginator(self, name):
+            return FakePaginator()
+
+        def get_object(self, Bucket, Key):
+            assert (Bucket, Key) == ("heys-backups", f"client-daily/2026-03-30/{CLIENT}.json.gz")
+            return {"Body": io.BytesIO(body)}
+
+    source = snapshots.S3Source("heys-backups", client=FakeS3())
+    assert source.list_dates(CLIENT) == ["2026-03-30"]
+    with snapshots.open_snapshot(source, "2026-03-30", CLIENT) as fp:
+        assert snapshots.load_header(fp)["businessDate"] == "2026-03-30"
+
+
+def test_source_from_uri():
+    source = snapshots.source_from_uri("s3://heys-backups/client-daily")
+    assert (source.bucket, source.prefix) == ("heys-backups", "client-daily")
+    assert isinstance(snapshots.source_from_uri("/tmp/mirror"), snapshots.LocalMirror)
+
+
+def test_days_export_is_valid_backup_json(mirror, capsys):
+    snapshots.main([mirror.root, "days", CLIENT, "--date", "2026-03-28"])
+    out = json.loads(capsys.readouterr().out)
+    assert out["clientId"] == CLIENT
+    assert list(out["days"]) == ["2026-03-28"]
@@ -0,0 +1,76 @@
+"""
+Bulk "touch": bump ``v.updatedAt`` server-side so clients re-sync those days.
+
+    cd scripts
+    python3 -m heys_data.touch_days --client <clientId> --date 2026-01-08 --date 2026-01-09 --dry-run
+    python3 -m heys_data.touch_days --pairs-file days.txt          # "<clientId> <date|key>" per line
+
+One ``jsonb_set`` statement for all pairs (see :func:`restore.touch_days`):
+a few KB on the wire instead of every day document. ``--dry-run`` shows what
+would be touched and the current ``updatedAt`` without writing.
+"""
+import argparse
+import json
+import sys
+
+from heys_data import db, restore
+
+
+def read_pairs(args):
+    pairs = [(args.client, d) for d in args.date] if args.client else []
+    if args.date and not args.client:
+        raise SystemExit("--date needs --client")
+    if args.pairs_file:
+        with open(args.pairs_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                client_id, _, key = line.replace(",", " ").partition(" ")
+                pairs.append((client_id, key.strip()))
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--client", help="client id for --date")
+    parser.add_argument("--date", action="append", default=[], help="day or key to touch (repeatable)")
+    parser.add_argument("--pairs-file", help="file with '<clientId> <date|key>' per line")
+    parser.add_argument("--updated-at", type=int, help="updatedAt in ms (default: now)")
+    parser.add_argument("--dry-run", action="store_true", help="preview, write nothing")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    pairs = read_pairs(args)
+    if not pairs:
+        raise SystemExit("nothing to touch: pass --client/--date or --pairs-file")
+
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            result = restore.touch_days(cur, pairs, args.updated_at, args.dry_run)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    finally:
+        conn.close()
+
+    if args.json:
+        json.dump(result.as_dict(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        verb = "Would touch" if args.dry_run else "Touched"
+        for client_id, key, previous in result.touched:
+            print(f"  {client_id} {key}: updatedAt {previous} -> {result.updated_at}")
+        for status in ("missing", "encrypted", "not_object"):
+            for client_id, key in getattr(result, status):
+                print(f"  {client_id} {key}: skipped ({status})")
+        print(f"{verb} {len(result.touched)} of {len(pairs)} day(s), updatedAt = {result.updated_at}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())